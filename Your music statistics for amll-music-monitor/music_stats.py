@@ -4,128 +4,616 @@
 Your Music Statistics for amll-music-monitor
 日志格式：[时间] 作者 - 歌名 (第 N 次)
 仅统计“第 1 次”去重，用最后一次“第 M 次”作为真实累计
+
+增量统计：聚合结果连同已处理到的日志字节偏移保存在 stats/aggregates.json，
+每次运行只解析新追加的行，生成报告的耗时与日志总长度无关。
+也可以作为模块导入：StatsAggregator 负责聚合，render_report 负责出图和网页。
+matplotlib / jinja2 到出图时才导入，没有记录时不会加载。
+监控端写出的收听区间（listening_intervals.bin）存在时，用实际收听时长代替每首 4 分钟的估算，
+并统计跳过率与收听会话；区间同样按字节偏移增量读取。
 """
+import argparse
+import hashlib
+import json
+import os
 import re
+import struct
+import sys
 import datetime as dt
 from collections import Counter
 from pathlib import Path
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from jinja2 import Template
-
 # ---------- 配置 ----------
 PLAYBACK_LOG = Path(r"C:\Users\Administrator\Desktop\AMLL auxiliary adaptation ecosystem\amll-music-monitor\music_playback.log")
 STATS_DIR    = Path("stats")
+AGG_FILE     = STATS_DIR / "aggregates.json"
+RENDER_CACHE = ".render_cache.json"   # 位于 STATS_DIR 下：每张图输入的内容哈希
+FONT_CACHE   = ".font_cache.json"     # 位于 STATS_DIR 下：已解析的中文字体，字体目录变化时失效
+CHART_DPI    = 160
 TOP_N        = 10
 RECENT_DAYS  = 30
-# 中文字体
-for font in fm.findSystemFonts(fontpaths=None, fontext='ttf'):
-    if "SimHei" in font or "PingFang" in font or "NotoSansCJK" in font:
-        plt.rcParams["font.family"] = fm.FontProperties(fname=font).get_name()
-        break
-else:
-    plt.rcParams["font.family"] = "DejaVu Sans"
-plt.rcParams["axes.unicode_minus"] = False
+BACKEND      = "counter"   # 聚合后端："counter"（增量计数器）或 "numpy"（列式数组）
+LISTENING_LOG = PLAYBACK_LOG.with_name("listening_intervals.bin")   # 监控端写出的收听区间
+LISTENING_AGG = STATS_DIR / "listening.json"
+SKIP_SECONDS = 30          # 不足这么多秒就切到下一首，记为跳过
 
 # ---------- 解析日志（含作者） ----------
 LOG_RE = re.compile(r"\[(?P<time>.+?)\] (?P<artist>.+?) - (?P<title>.+?) \(第 (?P<count>\d+) 次\)")
-raw_lines = PLAYBACK_LOG.read_text(encoding="utf-8").splitlines()
-
-# 1. 同一首歌最后一次出现的“第 M 次”
-last_count = {}
-for line in raw_lines:
-    m = LOG_RE.search(line)
-    if not m:
-        continue
-    key = f"{m['artist']} - {m['title']}"  # 用“作者 - 歌名”做 key
-    last_count[key] = int(m["count"])      # 最后留下的就是最大次数
-
-# 2. 只取“第 1 次”作为去重记录，但用 M 作为权重
-records = []
-for line in raw_lines:
-    m = LOG_RE.search(line)
-    if not m:
-        continue
-    if int(m["count"]) != 1:      # 只拿第 1 次
-        continue
-    t      = dt.datetime.strptime(m["time"], "%Y-%m-%d %H:%M:%S")
-    artist = m["artist"].strip()
-    title  = m["title"].strip()
-    key    = f"{artist} - {title}"
-    real_count = last_count[key]  # 真实累计
-    records.append({"artist": artist, "title": title,
-                    "key": key, "count": real_count, "dt": t})
-
-if not records:
-    print("❌ 未解析到任何播放记录，请确认日志格式正确！")
-    exit(1)
-
-# ---------- 指标（按真实累计） ----------
-total_plays = sum(r["count"] for r in records)
-first_day   = min(r["dt"] for r in records).date()
-last_day    = max(r["dt"] for r in records).date()
-valid_days  = len({r["dt"].date() for r in records})
-total_duration = total_plays * 240 / 3600   # 估算小时
-
-# ---------- TOP 榜单（按真实累计） ----------
-artist_cnt = Counter()   # 歌手维度
-song_cnt   = Counter()   # 歌曲维度
-for r in records:
-    artist_cnt[r["artist"]] += r["count"]
-    song_cnt[r["key"]]      += r["count"]
-top_artists = artist_cnt.most_common(TOP_N)
-top_songs   = song_cnt.most_common(TOP_N)
-
-# ---------- 每日/24h 分布（权重=真实累计） ----------
-date_end   = last_day
-date_start = date_end - dt.timedelta(days=RECENT_DAYS - 1)
-daily = Counter()
-for r in records:
-    if date_start <= r["dt"].date() <= date_end:
-        daily[r["dt"].date()] += r["count"]
-daily_x = [date_start + dt.timedelta(days=i) for i in range(RECENT_DAYS)]
-daily_y = [daily[d] for d in daily_x]
-
-hour_cnt = Counter()
-for r in records:
-    hour_cnt[r["dt"].hour] += r["count"]
-hour_x = list(range(24))
-hour_y = [hour_cnt[h] for h in hour_x]
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+# 每次从磁盘读取的块大小，内存占用与日志总长度无关
+CHUNK_SIZE = 1 << 20
+# 用日志开头若干字节识别“还是不是同一个文件”，被替换或清空时整体重建
+HEAD_BYTES = 256
+
+
+def iter_line_batches(log_path: Path, offset: int = 0, chunk_size: int = CHUNK_SIZE):
+    """
+    从 offset 起按块流式读取，逐块产出 (完整行列表, 这些行之后的字节偏移)
+    末尾没有换行的半行不产出，留到下次运行
+    """
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        tail = b""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            data = tail + chunk
+            end = data.rfind(b"\n") + 1
+            if not end:
+                tail = data  # 超长行，继续攒
+                continue
+            tail = data[end:]
+            offset += end
+            yield data[:end].decode("utf-8", errors="replace").splitlines(), offset
+
+
+def parse_time(time_str: str) -> str:
+    """
+    规范化时间戳为 YYYY-MM-DD HH:MM:SS
+    固定格式走快速路径（C 实现的 fromisoformat 只做校验，原样返回），其余回退 strptime
+    """
+    if len(time_str) == 19 and time_str[10] == " ":
+        dt.datetime.fromisoformat(time_str)
+        return time_str
+    return dt.datetime.strptime(time_str, TIME_FMT).strftime(TIME_FMT)
+
+
+def _read_json(path: Path, default=None):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path: Path, obj, **dump_kwargs):
+    """临时文件 + 替换，中途退出不会留下半截文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, **dump_kwargs), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class StatsAggregator:
+    """
+    增量聚合器
+    - last_count：每首歌最后一次出现的“第 M 次”（真实累计）
+    - firsts：每首歌所有“第 1 次”记录的时间（去重记录，权重为真实累计）
+    - 歌手 / 歌曲 / 每日 / 24h 计数器随 M 的变化按差值更新，结果与全量重算一致
+    - 差值延迟结算：逐行只记录最新的 M，一批行处理完再对变化过的歌曲统一补差
+    - covered_plays：covered_since（收听区间开始记录的时间）之后的日志行数，与收听区间覆盖同一段时间
+    """
+
+    VERSION = 2
+
+    def __init__(self):
+        self.offset = 0
+        self.head_hash = None
+        self.last_count = {}
+        self.firsts = {}
+        self.artist_of = {}
+        self.artist_cnt = Counter()
+        self.song_cnt = Counter()
+        self.daily = Counter()
+        self.hour_cnt = Counter()
+        self.day_records = Counter()
+        self.total_plays = 0
+        self.covered_since = None
+        self.covered_plays = 0
+        self._applied = {}    # 有“第 1 次”记录的歌曲：当前计数器里记的权重
+        self._dirty = set()   # M 变化但尚未结算的歌曲
+
+    # ---------- 持久化 ----------
+    @classmethod
+    def load(cls, path: Path) -> "StatsAggregator":
+        agg = cls()
+        if not path.exists():
+            return agg
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+            if state.get("version") != cls.VERSION:
+                return agg
+            agg.offset = state["offset"]
+            agg.head_hash = state["head_hash"]
+            agg.last_count = state["last_count"]
+            agg.firsts = state["firsts"]
+            agg.artist_of = state["artist_of"]
+            agg.artist_cnt = Counter(state["artist_cnt"])
+            agg.song_cnt = Counter(state["song_cnt"])
+            agg.daily = Counter(state["daily"])
+            agg.hour_cnt = Counter({int(h): c for h, c in state["hour_cnt"].items()})
+            agg.day_records = Counter(state["day_records"])
+            agg.total_plays = state["total_plays"]
+            agg.covered_since = state["covered_since"]
+            agg.covered_plays = state["covered_plays"]
+            agg._applied = {key: agg.last_count[key] for key in agg.firsts}
+        except Exception as e:
+            print(f"⚠️ 聚合缓存损坏，将重新统计: {e}")
+            agg = cls()
+        return agg
+
+    def save(self, path: Path):
+        self._settle()
+        state = {
+            "version": self.VERSION,
+            "offset": self.offset,
+            "head_hash": self.head_hash,
+            "last_count": self.last_count,
+            "firsts": self.firsts,
+            "artist_of": self.artist_of,
+            "artist_cnt": self.artist_cnt,
+            "song_cnt": self.song_cnt,
+            "daily": self.daily,
+            "hour_cnt": self.hour_cnt,
+            "day_records": self.day_records,
+            "total_plays": self.total_plays,
+            "covered_since": self.covered_since,
+            "covered_plays": self.covered_plays,
+        }
+        _write_json(path, state, ensure_ascii=False)
+
+    # ---------- 增量消费 ----------
+    @staticmethod
+    def _head_hash(log_path: Path) -> str:
+        with open(log_path, "rb") as f:
+            return hashlib.sha1(f.read(HEAD_BYTES)).hexdigest()
+
+    def update(self, log_path: Path, chunk_size: int = CHUNK_SIZE, covered_since: str = None) -> int:
+        """
+        单遍流式解析 offset 之后新追加的完整行，返回本次处理的行数
+        covered_since：收听区间最早的开始时间（YYYY-MM-DD HH:MM:SS），统计此后的日志行数
+        """
+        size = log_path.stat().st_size
+        head = self._head_hash(log_path)
+        if size < self.offset or (self.offset >= HEAD_BYTES and head != self.head_hash):
+            print("📄 播放日志被替换或截断，重新统计...")
+            self.__init__()
+        elif covered_since != self.covered_since and self.offset:
+            # 收听区间的起点变了（开始记录或区间文件重建），已解析的行需要按新起点重数
+            print("📄 收听区间起点变化，重新统计...")
+            self.__init__()
+        self.covered_since = since = covered_since
+
+        # 热路径：add_play 内联，逐行只做一次正则匹配和两次字典写入
+        search = LOG_RE.search
+        last_count = self.last_count
+        mark_dirty = self._dirty.add
+        covered = 0
+        processed = 0
+        for lines, end in iter_line_batches(log_path, self.offset, chunk_size):
+            for line in lines:
+                m = search(line)
+                if not m:
+                    continue
+                time_str, artist, title, count = m.groups()
+                artist = artist.strip()
+                key = f"{artist} - {title.strip()}"
+                count = int(count)
+                if count == 1:
+                    self._add_first(key, artist, parse_time(time_str))
+                last_count[key] = count
+                mark_dirty(key)
+                if since is not None and (time_str if len(time_str) == 19 else parse_time(time_str)) >= since:
+                    covered += 1
+            processed += len(lines)
+            self.offset = end
+        self.covered_plays += covered
+        self._settle()
+        self.head_hash = head
+        return processed
+
+    def add_line(self, line: str):
+        m = LOG_RE.search(line)
+        if not m:
+            return
+        self.add_play(m["time"], m["artist"].strip(), m["title"].strip(), int(m["count"]))
+
+    def add_play(self, time_str: str, artist: str, title: str, count: int):
+        key = f"{artist} - {title}"   # 用“作者 - 歌名”做 key
+        if self.covered_since is not None and parse_time(time_str) >= self.covered_since:
+            self.covered_plays += 1
+        if count == 1:
+            self._add_first(key, artist, parse_time(time_str))
+        self.last_count[key] = count  # 最后留下的就是最大次数
+        self._dirty.add(key)
+
+    def _add_first(self, key: str, artist: str, t: str):
+        """只取“第 1 次”作为去重记录；同一首歌的所有记录始终共享同一权重"""
+        firsts = self.firsts.get(key)
+        if firsts is None:
+            firsts = self.firsts[key] = []
+            self._applied[key] = 0
+            self.artist_of[key] = artist
+        else:
+            self._settle_key(key)
+        firsts.append(t)
+        self.day_records[t[:10]] += 1
+        self._apply(key, t, self._applied[key])  # 权重为 0 时也要占位，保持榜单并列时的先后顺序
+
+    def _settle_key(self, key: str):
+        delta = self.last_count[key] - self._applied[key]
+        if delta:
+            for t in self.firsts[key]:
+                self._apply(key, t, delta)
+            self._applied[key] += delta
+
+    def _settle(self):
+        """把累计变化补到所有“第 1 次”记录上"""
+        for key in self._dirty:
+            if key in self._applied:
+                self._settle_key(key)
+        self._dirty.clear()
+
+    def _apply(self, key: str, t: str, delta: int):
+        self.artist_cnt[self.artist_of[key]] += delta
+        self.song_cnt[key] += delta
+        self.daily[t[:10]] += delta
+        self.hour_cnt[int(t[11:13])] += delta
+        self.total_plays += delta
+
+    # ---------- 指标 ----------
+    def iter_records(self):
+        """按首次出现的顺序产出全部去重记录 (时间, 歌手, 歌曲 key, 真实累计)"""
+        self._settle()
+        for key, firsts in self.firsts.items():
+            artist, count = self.artist_of[key], self.last_count[key]
+            for t in firsts:
+                yield t, artist, key, count
+
+    @property
+    def has_records(self) -> bool:
+        return bool(self.day_records)
+
+    def summary(self, top_n: int = TOP_N, recent_days: int = RECENT_DAYS) -> dict:
+        """报告所需的全部指标（按真实累计）"""
+        self._settle()
+        days = sorted(d for d, n in self.day_records.items() if n)
+        first_day = dt.date.fromisoformat(days[0])
+        last_day = dt.date.fromisoformat(days[-1])
+
+        date_end   = last_day
+        date_start = date_end - dt.timedelta(days=recent_days - 1)
+        daily_x = [date_start + dt.timedelta(days=i) for i in range(recent_days)]
+        daily_y = [self.daily.get(d.isoformat(), 0) for d in daily_x]
+        hour_x = list(range(24))
+        hour_y = [self.hour_cnt.get(h, 0) for h in hour_x]
+
+        return {
+            "total_plays": self.total_plays,
+            "valid_days": len(days),
+            "total_duration": self.total_plays * 240 / 3600,   # 估算小时
+            "first_day": first_day,
+            "last_day": last_day,
+            "top_artists": self.artist_cnt.most_common(top_n),
+            "top_songs": self.song_cnt.most_common(top_n),
+            "artist_cnt": self.artist_cnt,
+            "daily_x": daily_x,
+            "daily_y": daily_y,
+            "hour_x": hour_x,
+            "hour_y": hour_y,
+            "recent_days": recent_days,
+        }
+
+
+# ---------- 收听区间 ----------
+# 与 amll-music-monitor/listening.py 的记录格式一致：开始时间、收听秒数、收听会话编号、标志位
+INTERVAL = struct.Struct("<dfIB3x")
+FLAG_RESUMED = 1   # 暂停后恢复的续播片段，不算一次新的播放
+FLAG_NEXT = 4      # 因切到下一首而结束
+
+
+class ListeningAggregator:
+    """
+    收听区间的增量聚合：定长记录按字节偏移续读，只累加几个标量
+    - 总时长 = 各区间时长之和；跳过 = 因切歌而结束且不足 skip_seconds 的播放
+    - 会话编号单调递增，编号变化即新会话，同时维护当前会话的累计时长以求最长会话
+    """
+
+    VERSION = 2
+    FIELDS = ("offset", "first_start", "plays", "seconds", "skips", "sessions", "session",
+              "session_seconds", "longest_session")
+
+    def __init__(self, skip_seconds: float = SKIP_SECONDS):
+        self.skip_seconds = skip_seconds
+        self.offset = 0
+        self.first_start = None
+        self.plays = 0
+        self.seconds = 0.0
+        self.skips = 0
+        self.sessions = 0
+        self.session = None
+        self.session_seconds = 0.0
+        self.longest_session = 0.0
+
+    @classmethod
+    def load(cls, path: Path, skip_seconds: float = SKIP_SECONDS) -> "ListeningAggregator":
+        agg = cls(skip_seconds)
+        state = _read_json(path)
+        # 跳过阈值变了，已累加的跳过数不再适用，整体重算
+        if not state or state.get("version") != cls.VERSION or state.get("skip_seconds") != skip_seconds:
+            return agg
+        for name in cls.FIELDS:
+            setattr(agg, name, state[name])
+        return agg
+
+    def save(self, path: Path):
+        state = {name: getattr(self, name) for name in self.FIELDS}
+        state.update(version=self.VERSION, skip_seconds=self.skip_seconds)
+        _write_json(path, state)
+
+    def update(self, path: Path, chunk_records: int = 1 << 16) -> int:
+        """读取 offset 之后新追加的完整记录，返回本次处理的条数"""
+        if not path.exists():
+            return 0
+        if path.stat().st_size < self.offset:
+            print("📄 收听区间文件被替换或截断，重新统计...")
+            self.__init__(self.skip_seconds)
+        processed = 0
+        with open(path, "rb") as f:
+            while True:
+                # 每轮都从 offset 读：末尾不完整的半条记录不消费，下一轮（或下次调用）从它的开头重读
+                f.seek(self.offset)
+                data = f.read(INTERVAL.size * chunk_records)
+                usable = len(data) - len(data) % INTERVAL.size
+                if not usable:
+                    break
+                if self.first_start is None:
+                    self.first_start = INTERVAL.unpack_from(data)[0]
+                for _, dwell, session, flags in INTERVAL.iter_unpack(data[:usable]):
+                    self.add(dwell, session, flags)
+                processed += usable // INTERVAL.size
+                self.offset += usable
+        return processed
+
+    def add(self, dwell: float, session: int, flags: int):
+        self.seconds += dwell
+        if session != self.session:
+            self.sessions += 1
+            self.session = session
+            self.session_seconds = 0.0
+        self.session_seconds += dwell
+        self.longest_session = max(self.longest_session, self.session_seconds)
+        if flags & FLAG_RESUMED:
+            return
+        self.plays += 1
+        if flags & FLAG_NEXT and dwell < self.skip_seconds:
+            self.skips += 1
+
+    @property
+    def covered_since(self):
+        """最早一条区间的开始时间，格式与播放日志一致；没有区间时为 None"""
+        if self.first_start is None:
+            return None
+        return dt.datetime.fromtimestamp(self.first_start).strftime(TIME_FMT)
+
+    def summary(self) -> dict:
+        return {
+            "plays": self.plays,
+            "hours": self.seconds / 3600,
+            "skip_rate": self.skips / self.plays if self.plays else 0.0,
+            "skip_seconds": self.skip_seconds,
+            "sessions": self.sessions,
+            "avg_session_minutes": self.seconds / self.sessions / 60 if self.sessions else 0.0,
+            "longest_session_minutes": self.longest_session / 60,
+        }
+
+
+def summarize(agg: StatsAggregator, backend: str = BACKEND,
+              top_n: int = TOP_N, recent_days: int = RECENT_DAYS,
+              listening: "ListeningAggregator" = None) -> dict:
+    """按所选后端计算报告指标；numpy 不可用时回退到计数器"""
+    s = None
+    if backend == "numpy":
+        try:
+            from stats_numpy import PlayColumns
+        except ImportError:
+            print("⚠️ 未安装 numpy，改用计数器后端")
+        else:
+            s = PlayColumns.from_aggregator(agg).summary(top_n, recent_days)
+    if s is None:
+        s = agg.summary(top_n, recent_days)
+
+    s["listening"] = None
+    if listening is not None and listening.plays:
+        # 有收听区间的播放用实际时长，早于区间记录的播放仍按每首 4 分钟估算
+        # 两边都按播放日志里的计数算：区间里还有闸门没有计数的切歌，不能直接相减
+        s["listening"] = listening.summary()
+        uncovered = max(0, s["total_plays"] - agg.covered_plays)
+        s["total_duration"] = listening.seconds / 3600 + uncovered * 240 / 3600
+    return s
+
+
+# ---------- 中文字体 ----------
+CJK_FONT_KEYS = ("SimHei", "PingFang", "NotoSansCJK")
+
+
+def _pyplot():
+    """按需导入 matplotlib（首次导入需数百毫秒）"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _font_dirs():
+    """系统字体目录（与 matplotlib 扫描的位置一致，但不必导入 matplotlib）"""
+    if sys.platform == "win32":
+        return [os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+                os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts")]
+    if sys.platform == "darwin":
+        return ["/Library/Fonts", "/System/Library/Fonts", "/Network/Library/Fonts",
+                os.path.expanduser("~/Library/Fonts")]
+    return ["/usr/share/fonts", "/usr/local/share/fonts",
+            os.path.expanduser("~/.fonts"), os.path.expanduser("~/.local/share/fonts")]
+
+
+def _font_dirs_signature() -> dict:
+    """字体目录及其一级子目录的 mtime；安装或删除字体都会改变它"""
+    signature = {}
+    for root in _font_dirs():
+        try:
+            signature[root] = os.stat(root).st_mtime_ns
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        signature[entry.path] = entry.stat().st_mtime_ns
+        except OSError:
+            continue
+    return signature
+
+
+def resolve_font(cache_path: Path):
+    """
+    返回 (字体文件路径, 字体族名)，找不到中文字体时为 (None, "DejaVu Sans")
+    结果缓存在 cache_path，字体目录没有变化时不再扫描全部系统字体
+    """
+    signature = _font_dirs_signature()
+    cached = _read_json(cache_path)
+    if (cached and cached.get("dirs") == signature
+            and (cached["path"] is None or os.path.exists(cached["path"]))):
+        return cached["path"], cached["family"]
+
+    import matplotlib.font_manager as fm
+    path, family = None, "DejaVu Sans"
+    for font in fm.findSystemFonts(fontpaths=None, fontext='ttf'):
+        if any(key in font for key in CJK_FONT_KEYS):
+            path, family = font, fm.FontProperties(fname=font).get_name()
+            break
+    _write_json(cache_path, {"dirs": signature, "path": path, "family": family},
+                ensure_ascii=False, indent=2)
+    return path, family
+
+
+def setup_fonts(stats_dir: Path = STATS_DIR):
+    """设置中文字体，返回字体文件路径（词云需要文件路径，找不到时为 None）"""
+    font_path, family = resolve_font(stats_dir / FONT_CACHE)
+    plt = _pyplot()
+    plt.rcParams["font.family"] = family
+    plt.rcParams["axes.unicode_minus"] = False
+    return font_path
+
 
 # ---------- 绘图 ----------
-STATS_DIR.mkdir(exist_ok=True)
-
-# 1. 每日趋势
-plt.figure(figsize=(12, 4))
-plt.plot(daily_x, daily_y, marker="o", linewidth=2)
-plt.title(f"最近 {RECENT_DAYS} 天播放趋势（真实累计）")
-plt.xlabel("日期"); plt.ylabel("播放次数")
-plt.tight_layout()
-plt.savefig(STATS_DIR / "trend.png", dpi=160)
-plt.close()
-
-# 2. 24h 分布
-plt.figure(figsize=(6, 4))
-plt.bar(hour_x, hour_y, color="skyblue")
-plt.title("24 小时播放分布（真实累计）")
-plt.xlabel("小时"); plt.ylabel("次数")
-plt.tight_layout()
-plt.savefig(STATS_DIR / "hour.png", dpi=160)
-plt.close()
-
-# 3. 歌手词云
-try:
-    from wordcloud import WordCloud
-    wc = WordCloud(width=800, height=400, background_color="white",
-                   font_path=plt.rcParams["font.family"])
-    wc.generate_from_frequencies(artist_cnt)
-    wc.to_file(STATS_DIR / "wordcloud.png")
-    wordcloud_ok = True
-except Exception:
-    wordcloud_ok = False
+# 每张图一个顶层函数，便于在进程池中执行；参数只有可 pickle 的数据
+def _apply_font(font_family):
+    plt = _pyplot()
+    plt.rcParams["font.family"] = font_family
+    plt.rcParams["axes.unicode_minus"] = False
+    return plt
+
+
+def _plot_trend(out: str, font_family, daily_x, daily_y, recent_days) -> bool:
+    """1. 每日趋势"""
+    plt = _apply_font(font_family)
+    plt.figure(figsize=(12, 4))
+    plt.plot(daily_x, daily_y, marker="o", linewidth=2)
+    plt.title(f"最近 {recent_days} 天播放趋势（真实累计）")
+    plt.xlabel("日期"); plt.ylabel("播放次数")
+    plt.tight_layout()
+    plt.savefig(out, dpi=CHART_DPI)
+    plt.close()
+    return True
+
+
+def _plot_hour(out: str, font_family, hour_x, hour_y) -> bool:
+    """2. 24h 分布"""
+    plt = _apply_font(font_family)
+    plt.figure(figsize=(6, 4))
+    plt.bar(hour_x, hour_y, color="skyblue")
+    plt.title("24 小时播放分布（真实累计）")
+    plt.xlabel("小时"); plt.ylabel("次数")
+    plt.tight_layout()
+    plt.savefig(out, dpi=CHART_DPI)
+    plt.close()
+    return True
+
+
+def _plot_wordcloud(out: str, font_family, frequencies, font_path) -> bool:
+    """3. 歌手词云（可选依赖，失败返回 False）"""
+    try:
+        from wordcloud import WordCloud
+        wc = WordCloud(width=800, height=400, background_color="white",
+                       font_path=font_path)
+        wc.generate_from_frequencies(frequencies)
+        wc.to_file(out)
+        return True
+    except Exception:
+        return False
+
+
+def _chart_jobs(s: dict, font_path):
+    """(文件名, 绘图函数, 输入数据)"""
+    return [
+        ("trend.png", _plot_trend, (s["daily_x"], s["daily_y"], s["recent_days"])),
+        ("hour.png", _plot_hour, (s["hour_x"], s["hour_y"])),
+        ("wordcloud.png", _plot_wordcloud, (dict(s["artist_cnt"]), font_path)),
+    ]
+
+
+def _chart_digest(name: str, font_family, args) -> str:
+    """输入序列 + 绘图选项的内容哈希，相同则图片不变"""
+    payload = json.dumps([name, CHART_DPI, font_family, args], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def render_charts(s: dict, stats_dir: Path = STATS_DIR, font_path=None) -> bool:
+    """
+    输入没变的图直接跳过，其余在进程池里并行绘制
+    返回词云是否生成成功
+    """
+    stats_dir.mkdir(exist_ok=True)
+    cache_path = stats_dir / RENDER_CACHE
+    cache = _read_json(cache_path, {})
+    font_family = _pyplot().rcParams["font.family"]
+
+    done, pending = {}, []
+    for name, fn, args in _chart_jobs(s, font_path):
+        digest = _chart_digest(name, font_family, args)
+        if cache.get(name) == digest and (stats_dir / name).exists():
+            done[name] = True
+        else:
+            pending.append((name, fn, args, digest))
+
+    if len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(pending)) as pool:
+            futures = [pool.submit(fn, str(stats_dir / name), font_family, *args)
+                       for name, fn, args, _ in pending]
+            results = [f.result() for f in futures]
+    else:
+        results = [fn(str(stats_dir / name), font_family, *args) for name, fn, args, _ in pending]
+
+    for (name, _, _, digest), ok in zip(pending, results):
+        done[name] = ok
+        if ok:
+            cache[name] = digest
+        else:
+            cache.pop(name, None)  # 失败的图下次重试
+    if pending:
+        _write_json(cache_path, cache, indent=2)
+    print(f"🖼️ 重绘 {len(pending)} 张图表，{len(done) - len(pending)} 张未变化已跳过")
+    return done["wordcloud.png"]
+
 
 # ---------- HTML ----------
 TMPL = """<!doctype html>
@@ -157,7 +645,13 @@ TMPL = """<!doctype html>
     <ul>
       <li>累计播放 <strong>{{total_plays}}</strong> 次</li>
       <li>有效收听天数 <strong>{{valid_days}}</strong> 天</li>
+      {% if listening %}
+      <li>累计收听 <strong>{{"%0.1f"|format(total_duration)}}</strong> 小时（其中 {{"%0.1f"|format(listening.hours)}} 小时为实际记录，覆盖 {{listening.plays}} 次播放）</li>
+      <li>跳过率 <strong>{{"%0.1f"|format(listening.skip_rate * 100)}}%</strong>（不足 {{listening.skip_seconds}} 秒即切歌）</li>
+      <li>收听会话 <strong>{{listening.sessions}}</strong> 次，平均 {{"%0.0f"|format(listening.avg_session_minutes)}} 分钟，最长 {{"%0.0f"|format(listening.longest_session_minutes)}} 分钟</li>
+      {% else %}
       <li>估算累计收听 <strong>{{"%0.1f"|format(total_duration)}}</strong> 小时</li>
+      {% endif %}
       <li>记录时间跨度 {{first_day}} 至 {{last_day}}</li>
     </ul>
   </div>
@@ -201,18 +695,63 @@ TMPL = """<!doctype html>
 </body>
 </html>"""
 
-html = Template(TMPL).render(
-    gen_time      = dt.datetime.now().strftime("%Y-%m-%d %H:%M"),
-    total_plays   = total_plays,
-    valid_days    = valid_days,
-    total_duration= total_duration,
-    first_day     = first_day,
-    last_day      = last_day,
-    top_artists   = top_artists,
-    top_songs     = top_songs,
-    recent_days   = RECENT_DAYS,
-    wordcloud_ok  = wordcloud_ok
-)
-
-(STATS_DIR / "index.html").write_text(html, encoding="utf-8")
-print(f"✅ 统计报告已生成：{STATS_DIR.resolve() / 'index.html'}")
\ No newline at end of file
+
+def render_html(s: dict, wordcloud_ok: bool, stats_dir: Path = STATS_DIR) -> Path:
+    from jinja2 import Template
+    html = Template(TMPL).render(
+        gen_time      = dt.datetime.now().strftime("%Y-%m-%d %H:%M"),
+        total_plays   = s["total_plays"],
+        valid_days    = s["valid_days"],
+        total_duration= s["total_duration"],
+        first_day     = s["first_day"],
+        last_day      = s["last_day"],
+        top_artists   = s["top_artists"],
+        top_songs     = s["top_songs"],
+        recent_days   = s["recent_days"],
+        listening     = s.get("listening"),
+        wordcloud_ok  = wordcloud_ok
+    )
+    out = stats_dir / "index.html"
+    out.write_text(html, encoding="utf-8")
+    return out
+
+
+def render_report(s: dict, stats_dir: Path = STATS_DIR) -> Path:
+    font_path = setup_fonts(stats_dir)
+    wordcloud_ok = render_charts(s, stats_dir, font_path)
+    return render_html(s, wordcloud_ok, stats_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Your Music Statistics for amll-music-monitor")
+    parser.add_argument("--log", type=Path, default=PLAYBACK_LOG, help="music_playback.log 路径")
+    parser.add_argument("--rebuild", action="store_true", help="忽略聚合缓存，从头统计")
+    parser.add_argument("--backend", choices=("counter", "numpy"), default=BACKEND, help="聚合后端")
+    parser.add_argument("--listening", type=Path, default=None,
+                        help="收听区间文件（默认与播放日志同目录的 listening_intervals.bin）")
+    args = parser.parse_args(argv)
+
+    # 先读收听区间：播放日志按区间的起点统计被区间覆盖的播放
+    listening_path = args.listening or args.log.with_name(LISTENING_LOG.name)
+    listening = ListeningAggregator() if args.rebuild else ListeningAggregator.load(LISTENING_AGG)
+    new_intervals = listening.update(listening_path)
+    if listening.offset:
+        listening.save(LISTENING_AGG)
+        print(f"⏱️ 本次新读取 {new_intervals} 条收听区间")
+
+    agg = StatsAggregator() if args.rebuild else StatsAggregator.load(AGG_FILE)
+    new_lines = agg.update(args.log, covered_since=listening.covered_since)
+    agg.save(AGG_FILE)
+    print(f"📥 本次新解析 {new_lines} 行（已处理到第 {agg.offset} 字节）")
+
+    if not agg.has_records:
+        print("❌ 未解析到任何播放记录，请确认日志格式正确！")
+        return 1
+
+    out = render_report(summarize(agg, args.backend, TOP_N, RECENT_DAYS, listening))
+    print(f"✅ 统计报告已生成：{out.resolve()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+music_stats 基准
+
+用法：
+    python stats_benchmark.py parse [--lines 3000000] [--keep]
+    python stats_benchmark.py aggregate [--sizes 100000 1000000 10000000]
+    python stats_benchmark.py startup [--repeat 5]
+
+parse：在合成的 music_playback.log 上比较旧版两遍全量解析与单遍流式解析的
+吞吐量（行/秒）和峰值内存（RSS）。每种实现在独立子进程里运行，峰值 RSS 互不干扰，
+报告的是解析期间相对子进程基线的 RSS 增量。
+
+aggregate：同一批去重记录分别用 Counter 逐条累加和 NumPy 列式后端聚合，
+比较耗时并校验结果一致。
+
+startup：用 python -X importtime 测量 import music_stats 的冷启动耗时
+（取多次的中位数），并列出最耗时的模块。
+"""
+import argparse
+import datetime as dt
+import multiprocessing as mp
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+_ARTISTS = ["犬儒乐队", "Beyond", "痛仰乐队", "回春丹乐队", "万能青年旅店", "Radiohead", "草东没有派对"]
+
+
+def write_synthetic_log(path: Path, lines: int, seed: int = 42):
+    """生成 lines 行播放日志：约 2000 首歌，偶尔“第 1 次”重新计数"""
+    rnd = random.Random(seed)
+    counts = {}
+    t = dt.datetime(2022, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        buf = []
+        for _ in range(lines):
+            t += dt.timedelta(seconds=rnd.randrange(30, 600))
+            key = (rnd.choice(_ARTISTS) + str(rnd.randrange(50)), f"歌曲{rnd.randrange(40)}")
+            n = 1 if rnd.random() < 0.001 else counts.get(key, 0) + 1
+            counts[key] = n
+            buf.append(f"[{t:%Y-%m-%d %H:%M:%S}] {key[0]} - {key[1]} (第 {n} 次)\n")
+            if len(buf) >= 10_000:
+                f.writelines(buf)
+                buf = []
+        f.writelines(buf)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def legacy_parse(log_path: Path):
+    """旧版 music_stats.py：读入全部行，两遍 LOG_RE.search，逐条 strptime"""
+    from music_stats import LOG_RE
+
+    raw_lines = log_path.read_text(encoding="utf-8").splitlines()
+    last_count = {}
+    for line in raw_lines:
+        m = LOG_RE.search(line)
+        if not m:
+            continue
+        last_count[f"{m['artist']} - {m['title']}"] = int(m["count"])
+
+    records = []
+    for line in raw_lines:
+        m = LOG_RE.search(line)
+        if not m or int(m["count"]) != 1:
+            continue
+        t = dt.datetime.strptime(m["time"], "%Y-%m-%d %H:%M:%S")
+        artist, title = m["artist"].strip(), m["title"].strip()
+        key = f"{artist} - {title}"
+        records.append({"artist": artist, "title": title, "key": key,
+                        "count": last_count[key], "dt": t})
+
+    artist_cnt, song_cnt, daily, hour_cnt = Counter(), Counter(), Counter(), Counter()
+    for r in records:
+        artist_cnt[r["artist"]] += r["count"]
+        song_cnt[r["key"]] += r["count"]
+        daily[r["dt"].date()] += r["count"]
+        hour_cnt[r["dt"].hour] += r["count"]
+    return len(raw_lines), sum(r["count"] for r in records)
+
+
+def streaming_parse(log_path: Path):
+    """当前实现：StatsAggregator 单遍流式解析"""
+    from music_stats import StatsAggregator
+
+    agg = StatsAggregator()
+    lines = agg.update(log_path)
+    return lines, agg.total_plays
+
+
+_IMPLS = {"旧版两遍解析": legacy_parse, "单遍流式解析": streaming_parse}
+
+
+def _child(name: str, log_path: str, out):
+    import music_stats  # noqa: F401  预先导入，基线里包含 matplotlib 等依赖
+    base = _peak_rss_mb()
+    started = time.perf_counter()
+    lines, total = _IMPLS[name](Path(log_path))
+    elapsed = time.perf_counter() - started
+    peak = _peak_rss_mb()
+    out.put((lines, total, elapsed, None if base is None else peak - base))
+
+
+def run(name: str, log_path: Path):
+    out = mp.Queue()
+    proc = mp.Process(target=_child, args=(name, str(log_path), out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def bench_parse(lines: int, keep: bool):
+    tmp = tempfile.mkdtemp(prefix="amll_stats_bench_")
+    log_path = Path(tmp) / "music_playback.log"
+    write_synthetic_log(log_path, lines)
+    size_mb = log_path.stat().st_size / (1024 * 1024)
+    print(f"📄 合成播放日志: {lines:,} 行, {size_mb:.1f} MB")
+
+    totals = set()
+    for name in _IMPLS:
+        lines, total, elapsed, rss = run(name, log_path)
+        totals.add(total)
+        rss_text = "不可用" if rss is None else f"{rss:,.1f} MB"
+        print(f"  {name:<8} {lines / elapsed:>12,.0f} 行/秒  ({elapsed:.2f} 秒)  峰值 RSS 增量 {rss_text}")
+    print("  ✅ 两种实现统计结果一致" if len(totals) == 1 else "  ❌ 统计结果不一致！")
+
+    if keep:
+        print(f"💾 日志保留在 {log_path}")
+    else:
+        log_path.unlink()
+        os.rmdir(tmp)
+
+
+# ---------- 聚合后端 ----------
+def synthetic_records(n: int, seed: int = 7):
+    """n 条去重记录的四列：时间、歌手、歌曲 key、真实累计（同一首歌权重相同）"""
+    rnd = random.Random(seed)
+    start = dt.datetime(2022, 1, 1)
+    span = 3 * 365 * 86400
+    stamps = [(start + dt.timedelta(seconds=rnd.randrange(span))).strftime("%Y-%m-%d %H:%M:%S")
+              for _ in range(min(n, 200_000))]
+    artists = [f"{rnd.choice(_ARTISTS)}{i}" for i in range(2000)]
+    songs = [(artists[rnd.randrange(len(artists))], f"歌曲{i}") for i in range(50_000)]
+    weights = [rnd.randrange(1, 300) for _ in songs]
+
+    times, artist_col, key_col, weight_col = [], [], [], []
+    for _ in range(n):
+        i = rnd.randrange(len(songs))
+        artist, title = songs[i]
+        times.append(stamps[rnd.randrange(len(stamps))])
+        artist_col.append(artist)
+        key_col.append(f"{artist} - {title}")
+        weight_col.append(weights[i])
+    return times, artist_col, key_col, weight_col
+
+
+def counter_summary(records, top_n: int, recent_days: int) -> dict:
+    """Counter 路径：逐条累加（与 StatsAggregator 的计数器同构）"""
+    artist_cnt, song_cnt, daily, hour_cnt = Counter(), Counter(), Counter(), Counter()
+    for t, artist, key, w in records:
+        artist_cnt[artist] += w
+        song_cnt[key] += w
+        daily[t[:10]] += w
+        hour_cnt[int(t[11:13])] += w
+    last_day = dt.date.fromisoformat(max(daily))
+    daily_x = [last_day - dt.timedelta(days=recent_days - 1 - i) for i in range(recent_days)]
+    return {
+        "top_artists": artist_cnt.most_common(top_n),
+        "top_songs": song_cnt.most_common(top_n),
+        "daily_y": [daily.get(d.isoformat(), 0) for d in daily_x],
+        "hour_y": [hour_cnt.get(h, 0) for h in range(24)],
+    }
+
+
+def bench_aggregate(sizes, top_n: int = 10, recent_days: int = 30):
+    from stats_numpy import PlayColumns
+
+    for n in sizes:
+        cols = synthetic_records(n)
+        print(f"📊 {n:,} 条去重记录")
+
+        started = time.perf_counter()
+        expected = counter_summary(zip(*cols), top_n, recent_days)
+        counter_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        play_cols = PlayColumns.from_records(zip(*cols))
+        load_s = time.perf_counter() - started
+        started = time.perf_counter()
+        result = play_cols.summary(top_n, recent_days)
+        numpy_s = time.perf_counter() - started
+
+        same = all(result[k] == v for k, v in expected.items())
+        print(f"  Counter 逐条累加     {counter_s * 1000:>10.1f} ms")
+        print(f"  NumPy 装载列式数组   {load_s * 1000:>10.1f} ms")
+        print(f"  NumPy 聚合           {numpy_s * 1000:>10.1f} ms  "
+              f"(聚合加速 {counter_s / numpy_s:.0f}x, 含装载 {counter_s / (load_s + numpy_s):.1f}x)")
+        print("  ✅ 结果一致" if same else "  ❌ 结果不一致！")
+        del cols, play_cols
+
+
+# ---------- 冷启动 ----------
+def importtime(module: str, cwd: str, repeat: int):
+    """
+    在新解释器里 import module，解析 -X importtime 输出
+    返回 (该模块累计耗时 ms 的中位数, 最后一次运行中它最耗时的直接依赖)
+    """
+    totals, children = [], []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, capture_output=True, text=True, encoding="utf-8")
+        block = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not cumulative.strip().isdigit():
+                continue  # 表头
+            ms = int(cumulative) / 1000
+            depth = (len(name) - len(name.lstrip())) // 2
+            if depth == 0 and name.strip() == module:
+                totals.append(ms)
+                children = sorted(block, reverse=True)[:5]
+            elif depth == 0:
+                block = []
+            elif depth == 1:
+                block.append((ms, name.strip()))
+    return statistics.median(totals), children
+
+
+def bench_startup(repeat: int):
+    here = os.path.dirname(os.path.abspath(__file__))
+    median, top = importtime("music_stats", here, repeat)
+    print(f"🚀 import music_stats: {median:.1f} ms（{repeat} 次中位数）")
+    for ms, name in top:
+        print(f"  {ms:>8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="music_stats 基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parse", help="日志解析吞吐量与峰值内存")
+    p.add_argument("--lines", type=int, default=3_000_000, help="合成日志行数")
+    p.add_argument("--keep", action="store_true", help="保留生成的合成日志")
+
+    p = sub.add_parser("aggregate", help="Counter 与 NumPy 聚合后端耗时对比")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+
+    p = sub.add_parser("startup", help="-X importtime 冷启动耗时")
+    p.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if args.command == "parse":
+        bench_parse(args.lines, args.keep)
+    elif args.command == "aggregate":
+        bench_aggregate(args.sizes)
+    elif args.command == "startup":
+        bench_startup(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NumPy 列式聚合后端
+去重记录装入列式数组（epoch 秒 int64、歌手 / 歌曲整数编码、权重），
+每日 / 24h 分布用 bincount，TOP_N 用 argpartition，结果与 Counter 路径逐项一致
+"""
+import datetime as dt
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+DAY_SECONDS = 86400
+
+
+class PlayColumns:
+    """
+    列式播放记录
+    - ts：时间戳（本地时间按 UTC 解读的 epoch 秒，仅用于按日 / 按小时分桶）
+    - artist / song：整数编码，按首次出现的顺序分配，榜单并列时的先后与 Counter 一致
+    - weight：每条“第 1 次”记录的真实累计
+    """
+
+    def __init__(self, ts: np.ndarray, artist: np.ndarray, song: np.ndarray, weight: np.ndarray,
+                 artists: List[str], songs: List[str]):
+        self.ts = ts
+        self.artist = artist
+        self.song = song
+        self.weight = weight
+        self.artists = artists
+        self.songs = songs
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[str, str, str, int]]) -> "PlayColumns":
+        """records：(时间 YYYY-MM-DD HH:MM:SS, 歌手, 歌曲 key, 权重)"""
+        artist_codes, song_codes = {}, {}
+        times, artist_col, song_col, weights = [], [], [], []
+        for time_str, artist, key, weight in records:
+            times.append(time_str)
+            artist_col.append(artist_codes.setdefault(artist, len(artist_codes)))
+            song_col.append(song_codes.setdefault(key, len(song_codes)))
+            weights.append(weight)
+        return cls(
+            ts=np.array(times, dtype="datetime64[s]").astype(np.int64),
+            artist=np.array(artist_col, dtype=np.int32),
+            song=np.array(song_col, dtype=np.int32),
+            weight=np.array(weights, dtype=np.int64),
+            artists=list(artist_codes),
+            songs=list(song_codes),
+        )
+
+    @classmethod
+    def from_aggregator(cls, agg) -> "PlayColumns":
+        """从 StatsAggregator 的去重记录装载"""
+        return cls.from_records(agg.iter_records())
+
+    # ---------- 聚合 ----------
+    def _weighted_bincount(self, codes: np.ndarray, minlength: int) -> np.ndarray:
+        # 权重是整数，float64 在 2^53 以内精确，取整回 int64
+        return np.rint(np.bincount(codes, weights=self.weight, minlength=minlength)).astype(np.int64)
+
+    def artist_counts(self) -> np.ndarray:
+        return self._weighted_bincount(self.artist, len(self.artists))
+
+    def song_counts(self) -> np.ndarray:
+        return self._weighted_bincount(self.song, len(self.songs))
+
+    def hour_counts(self) -> np.ndarray:
+        return self._weighted_bincount((self.ts % DAY_SECONDS) // 3600, 24)
+
+    def summary(self, top_n: int = 10, recent_days: int = 30) -> dict:
+        """与 StatsAggregator.summary 相同的结构"""
+        days = self.ts // DAY_SECONDS
+        day0 = int(days.min())
+        day_index = days - day0
+        records_per_day = np.bincount(day_index)
+        daily = self._weighted_bincount(day_index, len(records_per_day))
+
+        epoch = dt.date(1970, 1, 1)
+        first_day = epoch + dt.timedelta(days=day0)
+        last_day = epoch + dt.timedelta(days=int(days.max()))
+
+        date_end   = last_day
+        date_start = date_end - dt.timedelta(days=recent_days - 1)
+        daily_x = [date_start + dt.timedelta(days=i) for i in range(recent_days)]
+        window = np.zeros(recent_days, dtype=np.int64)
+        offset = (date_start - first_day).days
+        lo, hi = max(offset, 0), min(offset + recent_days, len(daily))
+        if lo < hi:
+            window[lo - offset:hi - offset] = daily[lo:hi]
+
+        artist_cnt = self.artist_counts()
+        total = int(self.weight.sum())
+        return {
+            "total_plays": total,
+            "valid_days": int(np.count_nonzero(records_per_day)),
+            "total_duration": total * 240 / 3600,   # 估算小时
+            "first_day": first_day,
+            "last_day": last_day,
+            "top_artists": top_n_items(artist_cnt, self.artists, top_n),
+            "top_songs": top_n_items(self.song_counts(), self.songs, top_n),
+            "artist_cnt": dict(zip(self.artists, artist_cnt.tolist())),
+            "daily_x": daily_x,
+            "daily_y": window.tolist(),
+            "hour_x": list(range(24)),
+            "hour_y": self.hour_counts().tolist(),
+            "recent_days": recent_days,
+        }
+
+
+def top_n_items(counts: np.ndarray, names: List[str], n: int) -> List[Tuple[str, int]]:
+    """
+    argpartition 取前 n，再对候选按 (次数降序, 编码升序) 排序
+    分界值上的并列项取编码最小的几个，与 Counter.most_common 的稳定排序一致
+    """
+    n = min(n, len(counts))
+    if n <= 0:
+        return []
+    threshold = counts[np.argpartition(-counts, n - 1)[n - 1]]
+    above = np.flatnonzero(counts > threshold)
+    ties = np.flatnonzero(counts == threshold)[:n - len(above)]
+    picked = np.concatenate([above, ties])
+    picked = picked[np.lexsort((picked, -counts[picked]))]
+    return [(names[i], int(counts[i])) for i in picked]
@@ -0,0 +1,45 @@
+import json
+import os
+from contextlib import contextmanager
+
+
+def _fsync_dir(path: str):
+    """rename 之后同步所在目录，确保新目录项落盘（Windows 不支持打开目录，直接跳过）"""
+    if os.name == "nt":
+        return
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+@contextmanager
+def atomic_write(path: str, fsync: bool = True):
+    """
+    原子写文件：先写同目录下的临时文件，fsync 后 rename 覆盖目标
+    进程在任何时刻被杀，目标文件要么是旧内容、要么是完整的新内容
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync:
+        _fsync_dir(path)
+
+
+def atomic_write_json(path: str, obj, fsync: bool = True, **dump_kwargs):
+    with atomic_write(path, fsync=fsync) as f:
+        json.dump(obj, f, **dump_kwargs)
@@ -1,43 +1,52 @@
-import time
 import threading
 from datetime import datetime
+from typing import Callable, Optional
 
 class AutoRefreshMonitor:
-    """自动刷新监控器"""
+    """自动刷新监控器：订阅曲目变化事件，只在曲目变化时重绘"""
     
-    def __init__(self, music_tracker):
+    def __init__(self, music_tracker, echo: Optional[Callable[[str], None]] = None):
         self.music_tracker = music_tracker
+        # 状态消息默认与记录器走同一个输出（控制台渲染器 / 服务日志）
+        self.echo = echo or music_tracker.echo
         self.is_running = False
         self.refresh_thread = None
         self.last_display = None
+        self._subscription = None
     
     def start_auto_refresh(self, display_callback):
         """开始自动刷新显示"""
         self.is_running = True
         self.display_callback = display_callback
+        # 合并策略：控制台来不及重绘时只显示最新曲目，不会拖住发布事件的监控线程
+        self._subscription = self.music_tracker.events.subscribe(
+            "console", topics=["track"], policy="coalesce")
         
         self.refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
         self.refresh_thread.start()
         
-        print("🔄 启用自动刷新显示...")
+        self.echo("🔄 启用自动刷新显示...")
     
     def _refresh_loop(self):
-        """自动刷新循环"""
+        """等待曲目变化事件并刷新显示"""
+        subscription = self._subscription
         while self.is_running:
+            events = subscription.get()
+            # 补录积压的曲目不逐首显示
+            tracks = [e.data for e in events if not e.data.get("backlog")]
+            if not tracks or not self.is_running:
+                continue
             try:
-                current_track = self.music_tracker.get_current_track()
-                
-                # 如果当前有曲目在播放，定期更新显示时间
-                if current_track:
-                    self.display_callback(current_track)
-                
-                time.sleep(5)  # 每5秒刷新一次显示
-                
+                self.last_display = datetime.now()
+                self.display_callback(tracks[-1])
             except Exception as e:
-                print(f"刷新显示错误: {e}")
-                time.sleep(10)
+                self.echo(f"刷新显示错误: {e}")
     
     def stop_auto_refresh(self):
         """停止自动刷新"""
         self.is_running = False
-        print("⏹️ 停止自动刷新")
\ No newline at end of file
+        if self._subscription is not None:
+            self._subscription.close()
+        if self.refresh_thread is not None:
+            self.refresh_thread.join(timeout=2)
+        self.echo("⏹️ 停止自动刷新")
\ No newline at end of file
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+离线补录：从历史 AMLL Player 日志重建播放历史与播放次数
+
+用法：
+    python backfill.py [日志文件或目录 ...] [--no-rotated] [--window 秒] [--batch-size 5000]
+
+- 不给路径时补录 Config.LOG_PATH 及其轮转文件（amll-player.log.1、*.gz 等）
+- 支持 gzip 压缩的日志；多个文件按首行时间从旧到新处理
+- 与实时监控使用同一套解析（classify_line / parse_line_time）和计数闸门（Config.DEDUP_WINDOW / MIN_DWELL）
+- 请在监控程序退出后运行，避免两边同时写历史与次数文件
+"""
+
+import argparse
+import bisect
+import glob
+import gzip
+import itertools
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from log_parser import LINE_MARKS, classify_line, is_player_track, parse_line_time, SessionEnter, SessionLeave
+
+# 每次读取的（解压后）字节数
+CHUNK_SIZE = 1 << 20
+# 每批写入的曲目数：一批对应一次 batch()，即历史 / 播放日志 / 次数各写一次、SQLite 一个事务
+BATCH_SIZE = 5000
+# 读取文件开头多少字节来确定首行时间
+_HEAD_BYTES = 64 * 1024
+_MARKS = tuple(mark.encode("utf-8") for mark in LINE_MARKS)
+
+
+class BackfillStats:
+    """补录过程的计数，用于进度与最终报告"""
+
+    def __init__(self):
+        self.files = 0
+        self.file_bytes = 0      # 磁盘上的字节数（gzip 为压缩后）
+        self.bytes = 0           # 解压后的字节数
+        self.lines = 0
+        self.tracks = 0          # 通过会话过滤的曲目行
+        self.imported = 0
+        self.duplicates = 0      # 与已有记录（或重叠日志）重复
+        self.repeats = 0         # 连续重复的同一首
+        self.gated = 0           # 被计数闸门挡下（窗口内重播、没听满最短时长）
+        self.no_time = 0         # 缺少可解析的时间戳
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# -------------- 日志文件 --------------
+def open_log(path: str):
+    """以二进制方式打开日志，.gz 透明解压"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def rotated_siblings(path: str) -> List[str]:
+    """
+    同目录下的轮转文件：amll-player.log.1、amll-player.log.2.gz、amll-player.2025-10-24.log 等
+    返回值包含 path 本身
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    stem = os.path.splitext(name)[0]
+    found = {os.path.abspath(path)}
+    for pattern in (f"{name}.*", f"{stem}.*.log", f"{stem}.*.log.gz", f"{stem}-*.log", f"{stem}-*.log.gz"):
+        found.update(os.path.abspath(p) for p in glob.glob(os.path.join(glob.escape(directory), pattern)))
+    return sorted(p for p in found if os.path.isfile(p))
+
+
+def expand_paths(paths: Iterable[str], rotated: bool = True) -> List[str]:
+    """展开目录（目录下所有 *.log / *.log.* 文件）与轮转文件，去重后按首行时间排序"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ("*.log", "*.log.*"):
+                files.extend(glob.glob(os.path.join(glob.escape(path), pattern)))
+        elif rotated:
+            files.extend(rotated_siblings(path))
+        else:
+            files.append(path)
+    unique = list(dict.fromkeys(os.path.abspath(f) for f in files if os.path.isfile(f)))
+    return sorted(unique, key=_sort_key)
+
+
+def first_line_time(path: str) -> Optional[datetime]:
+    """文件开头第一个能解析出时间戳的行"""
+    try:
+        with open_log(path) as f:
+            head = f.read(_HEAD_BYTES)
+    except (OSError, EOFError):
+        return None
+    for raw in head.split(b"\n")[:200]:
+        value = parse_line_time(raw.decode("utf-8", errors="replace"))
+        if value is not None:
+            return value
+    return None
+
+
+def _sort_key(path: str) -> Tuple[float, str]:
+    value = first_line_time(path)
+    stamp = value.timestamp() if value is not None else os.path.getmtime(path)
+    return stamp, path
+
+
+def iter_marked_lines(f, stats: BackfillStats, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    大块读取，直接在字节上查找会话 / 曲目关键字，只解码命中的行
+    其余行只计数不解码，吞吐量接近磁盘（或 gzip 解压）速度
+    """
+    tail = b""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        stats.bytes += len(chunk)
+        data = tail + chunk
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            tail = data
+            continue
+        tail = data[end:]
+        stats.lines += data.count(b"\n", 0, end)
+
+        starts = set()
+        for mark in _MARKS:
+            pos = data.find(mark, 0, end)
+            while pos != -1:
+                starts.add(data.rfind(b"\n", 0, pos) + 1)
+                pos = data.find(mark, data.find(b"\n", pos, end), end)
+        for start in sorted(starts):
+            stop = data.find(b"\n", start, end)
+            yield data[start:stop].decode("utf-8", errors="replace").rstrip("\r")
+
+    if tail:
+        stats.lines += 1
+        if any(mark in tail for mark in _MARKS):
+            yield tail.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def iter_plays(paths: List[str], stats: BackfillStats,
+               progress_interval: float = 2.0) -> Iterator[Tuple[str, str, datetime]]:
+    """按文件顺序产出 (歌手, 歌曲, 播放时间)；会话状态跨文件延续（轮转文件首尾相接）"""
+    session = None
+    next_report = time.perf_counter() + progress_interval
+    for path in paths:
+        stats.files += 1
+        stats.file_bytes += os.path.getsize(path)
+        print(f"📄 [{stats.files}/{len(paths)}] {path}")
+        try:
+            with open_log(path) as f:
+                for line in iter_marked_lines(f, stats):
+                    event = classify_line(line)
+                    if event is None:
+                        continue
+                    if isinstance(event, SessionEnter):
+                        session = "amll"
+                        continue
+                    if isinstance(event, SessionLeave):
+                        session = None
+                        continue
+                    if not is_player_track(session, event.artist, event.title):
+                        continue
+                    stats.tracks += 1
+                    played_at = parse_line_time(line)
+                    if played_at is None:
+                        stats.no_time += 1
+                        continue
+                    yield event.artist, event.title, played_at
+
+                    if time.perf_counter() >= next_report:
+                        next_report = time.perf_counter() + progress_interval
+                        _print_progress(stats)
+        except (OSError, EOFError) as e:
+            # 截断的 .gz 等：已读出的部分照常导入
+            print(f"⚠️ 读取 {path} 中断: {e}")
+
+
+def _print_progress(stats: BackfillStats):
+    rate = stats.lines / stats.elapsed if stats.elapsed else 0
+    print(f"  ⏳ {stats.lines:,} 行, {stats.bytes / 1024 / 1024:.1f} MB, "
+          f"导入 {stats.imported:,} 首, {rate * 60:,.0f} 行/分钟")
+
+
+# -------------- 去重 --------------
+class PlayIndex:
+    """
+    已有播放的时间索引：曲目 key -> 升序的 epoch 秒
+    同一首在 window 秒内已有记录即视为重复（实时监控记录的是检测时刻，与日志行时间相差不到一秒）
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._times: Dict[str, List[float]] = defaultdict(list)
+
+    def load(self, records: Iterable[Dict]) -> int:
+        count = 0
+        for record in records:
+            try:
+                ts = datetime.fromisoformat(record["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._times[f"{record.get('artist', '')}|{record.get('title', '')}"].append(ts)
+            count += 1
+        for times in self._times.values():
+            times.sort()
+        return count
+
+    def seen(self, key: str, ts: float) -> bool:
+        times = self._times.get(key)
+        if not times:
+            return False
+        i = bisect.bisect_left(times, ts - self.window)
+        return i < len(times) and times[i] <= ts + self.window
+
+    def add(self, key: str, ts: float):
+        bisect.insort(self._times[key], ts)
+
+
+def backfill(tracker, paths: List[str], window: float = 5.0, batch_size: int = BATCH_SIZE) -> BackfillStats:
+    """
+    把 paths 中的播放按时间写入 tracker
+    每 batch_size 首进入一次 tracker.batch()：期间不打印、不逐条落盘，退出时统一写入
+    """
+    index = PlayIndex(window)
+    existing = index.load(tracker.play_store)
+    if existing:
+        print(f"🔎 已有 {existing:,} 条播放记录，{window:g} 秒内的同名播放视为重复")
+
+    # 去重只取决于日志内容与已有记录，重复运行补录不会再导入任何播放
+    # - 连续重复：与日志中上一首相同（不论上一首是否导入）
+    # - 重复播放：window 秒内已有同名记录；跳过后清除 tracker 的当前曲目，使其判断与日志顺序一致
+    # 其余切歌交给 tracker，由与实时监控相同的闸门决定是否计数；开启最短收听时确认的可能是前一首，
+    # 所以导入数按 tracker.committed 的增量统计
+    stats = BackfillStats()
+    plays = iter_plays(paths, stats)
+    committed = tracker.committed
+    offered = 0
+    last_key = None
+    while True:
+        chunk = list(itertools.islice(plays, batch_size))
+        if not chunk:
+            break
+        with tracker.batch():
+            for artist, title, played_at in chunk:
+                key = f"{artist}|{title}"
+                if key == last_key:
+                    stats.repeats += 1
+                    continue
+                last_key = key
+                ts = played_at.timestamp()
+                if index.seen(key, ts):
+                    stats.duplicates += 1
+                    tracker.reset_current()
+                    continue
+                tracker.update_track(artist, title, played_at)
+                index.add(key, ts)
+                offered += 1
+    # 日志里最后一首早已播放完毕，确认挂起中的播放
+    with tracker.batch():
+        tracker.confirm_pending()
+    stats.imported = tracker.committed - committed
+    stats.gated = offered - stats.imported
+    sync = getattr(tracker.play_store, "sync", None)
+    if sync is not None:
+        sync()
+    return stats
+
+
+def print_report(stats: BackfillStats):
+    elapsed = stats.elapsed or 1e-9
+    mb = stats.bytes / 1024 / 1024
+    print("✅ 补录完成")
+    print(f"  文件: {stats.files} 个，磁盘 {stats.file_bytes / 1024 / 1024:.1f} MB，解压后 {mb:.1f} MB")
+    print(f"  日志行: {stats.lines:,} 行，用时 {elapsed:.2f} 秒"
+          f"（{stats.lines / elapsed * 60:,.0f} 行/分钟，{mb / elapsed:.1f} MB/秒）")
+    print(f"  曲目行: {stats.tracks:,}，导入 {stats.imported:,} 首")
+    print(f"  跳过: 与已有记录重复 {stats.duplicates:,}，连续重复 {stats.repeats:,}，缺少时间戳 {stats.no_time:,}，"
+          f"计数闸门未计 {stats.gated:,}")
+
+
+def main(argv=None):
+    from config import Config
+    from music_tracker import MusicTracker
+
+    parser = argparse.ArgumentParser(description="从历史 AMLL Player 日志补录播放历史与次数")
+    parser.add_argument("paths", nargs="*", help="日志文件或目录（默认 Config.LOG_PATH）")
+    parser.add_argument("--no-rotated", action="store_true", help="不自动包含同目录下的轮转文件")
+    parser.add_argument("--window", type=float, default=None,
+                        help="与已有记录判定重复的时间窗口（秒，默认取 5 与 Config.DEDUP_WINDOW 中较大者）")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批写入的曲目数")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or ([Config.LOG_PATH] if Config.LOG_PATH else [])
+    files = expand_paths(paths, rotated=not args.no_rotated)
+    if not files:
+        print("❌ 错误: 没有找到可补录的日志文件")
+        return 1
+    print(f"⏩ 补录 {len(files)} 个日志文件...")
+
+    tracker = MusicTracker(
+        history_file=Config.HISTORY_FILE,
+        log_file=Config.PLAYBACK_LOG_FILE,
+        history_backend=Config.HISTORY_BACKEND,
+        db_file=Config.SQLITE_DB_FILE,
+        fsync_policy=Config.FSYNC_POLICY,
+        dedup_window=Config.DEDUP_WINDOW,
+        min_dwell=Config.MIN_DWELL,
+    )
+    # 已有记录与补录的播放相距不到去重窗口时，实时监控也不会再计一次
+    window = args.window if args.window is not None else max(5.0, Config.DEDUP_WINDOW)
+    try:
+        stats = backfill(tracker, files, window, args.batch_size)
+    finally:
+        tracker.close()
+    print_report(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
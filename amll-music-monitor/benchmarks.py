@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+AMLL Music Monitor 微基准
+
+用法：
+    python benchmarks.py parser [--size-mb 16]
+    python benchmarks.py sqlite [--plays 500000]
+    python benchmarks.py startup [--repeat 5]
+    python benchmarks.py multi [--sources 1 10 100] [--backend polling]
+    python benchmarks.py memory [--plays 100000]
+    python benchmarks.py lyrics [--files 5000]
+    python benchmarks.py dedup [--plays 20000] [--bounce 0.1]
+    python benchmarks.py metrics [--size-mb 16]
+    python benchmarks.py render [--tracks 2000] [--write-ms 2]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from log_generator import ARTISTS, NOISE, TITLES, synthetic_amll_lines
+from log_parser import classify_line
+
+
+def _legacy_classify(line: str):
+    """旧版 _process_log_content 的逐行逻辑：最多三次未预编译的 re.search"""
+    line = line.strip()
+    if not line:
+        return None
+    if re.search(r'会话切换:[^"]*"-> "net\.stevexmh\.amllplayer"', line):
+        return "enter"
+    m = re.search(r'会话切换: "net\.stevexmh\.amllplayer" -> "([^"]+)"', line)
+    if m:
+        return m.group(1)
+    m = re.search(r"\[SmtcRunner\] 新曲目信息: '([^']*)' - '([^']*)'", line)
+    if m:
+        return m.group(1).strip(), m.group(2).strip()
+    return None
+
+
+def _time_lines(fn: Callable, lines: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_parser(size_mb: float, repeat: int):
+    lines = synthetic_amll_lines(size_mb)
+    print(f"📄 合成日志: {len(lines):,} 行, 约 {size_mb:g} MB")
+
+    legacy = _time_lines(_legacy_classify, lines, repeat)
+    current = _time_lines(classify_line, lines, repeat)
+    for name, elapsed in (("旧版 re.search", legacy), ("classify_line", current)):
+        print(f"  {name:<16} {len(lines) / elapsed:>14,.0f} 行/秒  ({elapsed * 1000:.1f} ms)")
+    print(f"  加速比: {legacy / current:.1f}x")
+
+
+def bench_sqlite(plays: int):
+    from sqlite_store import SqlitePlayStore
+
+    rnd = random.Random(7)
+    artists = [f"歌手{i}" for i in range(800)]
+    start = datetime(2022, 1, 1)
+    span = int(timedelta(days=3 * 365).total_seconds())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqlitePlayStore(os.path.join(tmp, "plays.db"), commit_every=10_000)
+        began = time.perf_counter()
+        batch = []
+        for _ in range(plays):
+            ts = start + timedelta(seconds=rnd.randrange(span))
+            batch.append({"artist": rnd.choice(artists), "title": f"歌曲{rnd.randrange(20)}",
+                          "timestamp": ts.isoformat()})
+            if len(batch) == 10_000:
+                store.extend(batch)
+                batch = []
+        store.extend(batch)
+        store.commit()
+        elapsed = time.perf_counter() - began
+        print(f"🗄️  写入 {plays:,} 条播放（约 3 年）: {elapsed:.2f} 秒, {plays / elapsed:,.0f} 条/秒")
+
+        last_day = (start + timedelta(seconds=span)).date()
+        queries = (
+            ("top_artists(10)", lambda: store.top_artists(10)),
+            ("top_songs(10)", lambda: store.top_songs(10)),
+            ("daily_counts(30 天)", lambda: store.daily_counts(str(last_day - timedelta(days=29)), str(last_day))),
+            ("daily_counts(全部)", store.daily_counts),
+            ("hourly_counts()", store.hourly_counts),
+            ("recent(10)", lambda: store.recent(10)),
+        )
+        for name, fn in queries:
+            began = time.perf_counter()
+            fn()
+            print(f"  {name:<20} {(time.perf_counter() - began) * 1000:>8.2f} ms")
+        store.close()
+
+
+def importtime(module: str, repeat: int):
+    """
+    在临时目录里用新解释器 import module（避免在仓库目录生成历史 / 计数文件），解析 -X importtime 输出
+    返回 (该模块累计耗时 ms 的中位数, 最后一次运行中它最耗时的直接依赖)
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    totals, children = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                  cwd=tmp, env=env, capture_output=True, text=True, encoding="utf-8")
+            block = []
+            for line in proc.stderr.splitlines():
+                if not line.startswith("import time:") or "|" not in line:
+                    continue
+                _, cumulative, name = line[len("import time:"):].split("|")
+                if not cumulative.strip().isdigit():
+                    continue  # 表头
+                ms = int(cumulative) / 1000
+                depth = (len(name) - len(name.lstrip())) // 2
+                if depth == 0 and name.strip() == module:
+                    totals.append(ms)
+                    children = sorted(block, reverse=True)[:5]
+                elif depth == 0:
+                    block = []
+                elif depth == 1:
+                    block.append((ms, name.strip()))
+    return statistics.median(totals), children
+
+
+def bench_startup(repeat: int):
+    for module in ("log_monitor", "music_tracker", "main"):
+        median, children = importtime(module, repeat)
+        print(f"🚀 import {module}: {median:.1f} ms（{repeat} 次中位数）")
+        for ms, name in children:
+            print(f"  {ms:>8.1f} ms  {name}")
+
+
+def _track_line(rnd: random.Random) -> str:
+    return (f"2025-10-24T19:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}.000000Z  "
+            f"INFO amll_player::smtc: [SmtcRunner] 新曲目信息: "
+            f"'{rnd.choice(ARTISTS)}' - '{rnd.choice(TITLES)}{rnd.randrange(10**6)}'\n")
+
+
+def _run_monitors(mode: str, paths: List[str], backend: str, idle: float, tracks: int,
+                  data_dir: str) -> dict:
+    """
+    启动 mode 对应的监控与计数（"multi" 单线程多来源 + SourceTrackers 共用一个写线程 /
+    "threads" 每个日志一个 AMLLLogMonitor + 各自带后台写入的 MusicTracker），
+    依次测量：启动后的 Python 堆增量、空闲 idle 秒的 CPU、每个日志追加 tracks 首曲目后全部送达的耗时与 CPU
+    """
+    from log_monitor import AMLLLogMonitor
+    from log_source import _load_observer
+    from multi_monitor import MultiLogMonitor, SourceTrackers
+    from music_tracker import MusicTracker
+
+    _load_observer()  # 先完成 watchdog 导入，堆增量只计监控本身
+
+    received = [0]
+    lock = threading.Lock()
+    expected = len(paths) * tracks
+    done = threading.Event()
+
+    def count_delivery():
+        with lock:
+            received[0] += 1
+            if received[0] >= expected:
+                done.set()
+
+    def quiet(text):
+        pass
+
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    if mode == "multi":
+        trackers = SourceTrackers(os.path.join(data_dir, "sources"), write_behind=True, echo=quiet)
+
+        def on_track(name, artist, title):
+            trackers.on_track(name, artist, title)
+            count_delivery()
+
+        monitor = MultiLogMonitor(backend=backend, verbose=False)
+        for path in paths:
+            # 计数的 tracker 在首次出现曲目时才创建，这里预先创建，让堆增量与线程数包含它们
+            trackers.get(monitor.add_source(path))
+        monitor.start_monitoring(on_track)
+        monitors, closers = [monitor], [trackers.close]
+    else:
+        monitors, closers = [], []
+        for i, path in enumerate(paths):
+            directory = os.path.join(data_dir, f"threads-{i}")
+            os.makedirs(directory)
+            tracker = MusicTracker(
+                history_file=os.path.join(directory, "amll_music_history.json"),
+                log_file=os.path.join(directory, "music_playback.log"),
+                count_file=os.path.join(directory, "play_count.json"),
+                write_behind=True, echo=quiet)
+
+            def on_track(artist, title, tracker=tracker):
+                tracker.update_track(artist, title)
+                count_delivery()
+
+            monitor = AMLLLogMonitor(path, backend=backend)
+            monitor.start_monitoring(on_track)
+            monitors.append(monitor)
+            closers.append(tracker.close)
+    heap = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    threads = threading.active_count() - threads_before
+
+    cpu = time.process_time()
+    time.sleep(idle)
+    idle_cpu = time.process_time() - cpu
+
+    rnd = random.Random(3)
+    cpu, began = time.process_time(), time.perf_counter()
+    for _ in range(tracks):
+        for path in paths:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(_track_line(rnd))
+    delivered = done.wait(30)
+    elapsed = time.perf_counter() - began
+    active_cpu = time.process_time() - cpu
+
+    for monitor in monitors:
+        monitor.stop_monitoring()
+    for close in closers:
+        close()
+    return {"heap": heap, "threads": threads, "idle_cpu": idle_cpu, "elapsed": elapsed,
+            "active_cpu": active_cpu, "delivered": delivered}
+
+
+def bench_multi(source_counts: List[int], backend: str, idle: float, tracks: int):
+    print(f"📡 多来源监控（后端 {backend}，空闲 {idle:g} 秒，每个日志追加 {tracks} 首）")
+    print(f"  {'来源':>5} {'方式':<8} {'线程':>5} {'堆增量':>10} {'空闲 CPU':>10} {'送达耗时':>10} {'处理 CPU':>10}")
+    for count in source_counts:
+        for mode in ("multi", "threads"):
+            with tempfile.TemporaryDirectory() as tmp:
+                paths = []
+                for i in range(count):
+                    path = os.path.join(tmp, f"amll-{i}.log")
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("\n".join(synthetic_amll_lines(0.01, seed=i)) + "\n")
+                    paths.append(path)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    r = _run_monitors(mode, paths, backend, idle, tracks, tmp)
+            status = "" if r["delivered"] else "  ⚠️ 未全部送达"
+            print(f"  {count:>5} {mode:<8} {r['threads']:>5} {r['heap'] / 1024:>8.0f} KB "
+                  f"{r['idle_cpu'] * 1000:>7.1f} ms {r['elapsed'] * 1000:>7.0f} ms "
+                  f"{r['active_cpu'] * 1000:>7.1f} ms{status}")
+
+
+def _measure(build: Callable[[], object]):
+    """tracemalloc 测量 build() 返回的对象在保留期间占用的 Python 堆（字节）"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def bench_memory(plays: int, songs: int, buffer: int):
+    from collections import deque
+
+    from play_record import Play, SymbolTable
+
+    rnd = random.Random(11)
+    library = [(f"歌手{rnd.randrange(songs // 8 + 1)}", f"歌曲{i}") for i in range(songs)]
+    start = datetime(2025, 1, 1)
+    # 解析日志得到的字符串每次都是新对象，用 bytes 解码模拟
+    raw = [(a.encode("utf-8"), t.encode("utf-8")) for a, t in library]
+    picks = [(rnd.randrange(songs), start + timedelta(seconds=240 * i)) for i in range(plays)]
+
+    def as_dicts():
+        records = []
+        for i, played_at in picks:
+            artist, title = raw[i][0].decode("utf-8"), raw[i][1].decode("utf-8")
+            records.append({"artist": artist, "title": title, "timestamp": played_at.isoformat(),
+                            "software": "AMLL Player", "key": f"{artist}|{title}"})
+        return records
+
+    def as_plays(symbols=None):
+        def build():
+            records = []
+            for i, played_at in picks:
+                records.append(Play.create(raw[i][0].decode("utf-8"), raw[i][1].decode("utf-8"),
+                                           played_at, symbols))
+            return records
+        return build
+
+    def ring():
+        symbols, recent = SymbolTable(), deque(maxlen=buffer)
+        for i, played_at in picks:
+            recent.append(Play.create(raw[i][0].decode("utf-8"), raw[i][1].decode("utf-8"),
+                                      played_at, symbols))
+        return symbols, recent
+
+    print(f"🧠 {plays:,} 次播放（曲库 {songs:,} 首）的内存占用")
+    baseline = _measure(as_dicts)
+    rows = (
+        ("dict（5 个字符串键）", baseline),
+        ("Play（__slots__）", _measure(as_plays())),
+        ("Play + 驻留表", _measure(as_plays(SymbolTable()))),
+        (f"环形缓冲 {buffer} 条 + 驻留表", _measure(ring)),
+    )
+    for name, used in rows:
+        print(f"  {name:<24} {used / 1024 / 1024:>8.2f} MB  {used / plays:>7.1f} B/条  "
+              f"({used / baseline:.0%})")
+
+
+def _write_lyrics_library(root: str, files: int, rnd: random.Random) -> List[Tuple[str, str]]:
+    """按歌手分目录生成 LRC / TTML 歌词，返回 (歌手, 歌曲) 列表"""
+    tracks = []
+    for i in range(files):
+        artist, title = f"歌手{i % 200}", f"歌曲{i}"
+        directory = os.path.join(root, artist)
+        os.makedirs(directory, exist_ok=True)
+        lines = [(s * 4000, f"第 {s} 行歌词 {rnd.random():.6f}") for s in range(60)]
+        if i % 3:
+            body = "".join(f"[{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}]{text}\n"
+                           for ms, text in lines)
+            name = f"{artist} - {title}.lrc"
+        else:
+            body = ('<tt xmlns="http://www.w3.org/ns/ttml" xmlns:amll="http://www.example.com/ns/amll">'
+                    f'<head><metadata><amll:meta key="musicName" value="{title}"/>'
+                    f'<amll:meta key="artists" value="{artist}"/></metadata></head><body><div>'
+                    + "".join(f'<p begin="{ms / 1000:.3f}s"><span>{text}</span></p>' for ms, text in lines)
+                    + "</div></body></tt>")
+            name = f"{i}.ttml"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(body)
+        tracks.append((artist, title))
+    return tracks
+
+
+def bench_lyrics(files: int, lookups: int):
+    from lyrics_index import LyricsIndex
+
+    rnd = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "lyrics")
+        index_file = os.path.join(tmp, "lyrics_index.json")
+        tracks = _write_lyrics_library(root, files, rnd)
+
+        def timed(label: str, fn: Callable):
+            began = time.perf_counter()
+            result = fn()
+            print(f"  {label:<28} {(time.perf_counter() - began) * 1000:>9.2f} ms")
+            return result
+
+        print(f"📜 歌词目录: {files:,} 个文件，{len(os.listdir(root))} 个子目录")
+        index = LyricsIndex(root, index_file)
+        timed("首次全量扫描", index.refresh)
+        index = timed("加载持久化索引", lambda: LyricsIndex(root, index_file))
+        timed("增量刷新（无变化）", index.refresh)
+        with open(os.path.join(root, "歌手0", "歌手0 - 新歌.lrc"), "w", encoding="utf-8") as f:
+            f.write("[00:01.00]新歌\n")
+        timed("增量刷新（新增 1 个文件）", index.refresh)
+
+        sample = [rnd.choice(tracks) for _ in range(lookups)]
+        began = time.perf_counter()
+        for artist, title in sample:
+            index.get(artist, title)
+        cold = (time.perf_counter() - began) / lookups
+        began = time.perf_counter()
+        for artist, title in sample[-index.cache_size:] * (lookups // index.cache_size + 1):
+            index.get(artist, title)
+        warm = (time.perf_counter() - began) / (index.cache_size * (lookups // index.cache_size + 1))
+        print(f"  {'get() 未命中（读文件 + 解析）':<28} {cold * 1000:>9.3f} ms/次")
+        print(f"  {'get() 命中缓存':<28} {warm * 1000:>9.3f} ms/次")
+        index.close()
+
+
+def _write_bounce_log(path: str, plays: int, bounce: float, rnd: random.Random) -> int:
+    """
+    合成 AMLL 日志：plays 首真实播放（每首 150~300 秒），其中 bounce 比例在开始 2 秒后
+    切回上一首、4 秒后再切回来（AMLL 会把来回切换都输出为新曲目信息），返回真实播放数
+    """
+    library = [(a, t) for a in ARTISTS for t in TITLES]
+    start = datetime(2025, 10, 24)
+
+    def track(at: datetime, artist: str, title: str) -> str:
+        return (f"{at:%Y-%m-%dT%H:%M:%S}.000000Z  INFO amll_player::smtc: [SmtcRunner] "
+                f"新曲目信息: '{artist}' - '{title}'\n")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{start:%Y-%m-%dT%H:%M:%S}.000000Z  INFO amll_player::smtc: "
+                f'会话切换: "-> "net.stevexmh.amllplayer"\n')
+        at, previous = start, None
+        for _ in range(plays):
+            current = rnd.choice([x for x in library if x != previous])
+            f.write(track(at, *current))
+            if previous is not None and rnd.random() < bounce:
+                f.write(track(at + timedelta(seconds=2), *previous))
+                f.write(track(at + timedelta(seconds=4), *current))
+            f.write(f"{at:%Y-%m-%dT%H:%M:%S}.500000Z  {rnd.choice(NOISE)}\n")
+            at += timedelta(seconds=rnd.randrange(150, 300))
+            previous = current
+    return plays
+
+
+def bench_dedup(plays: int, bounce: float, window: float, min_dwell: float, events: int):
+    from backfill import BackfillStats, iter_plays
+    from dedup import DedupIndex
+    from music_tracker import MusicTracker
+
+    rnd = random.Random(5)
+    with tempfile.TemporaryDirectory() as root:
+        log = os.path.join(root, "amll.log")
+        truth = _write_bounce_log(log, plays, bounce, rnd)
+        print(f"🔁 回放 {plays:,} 首播放（{bounce:.0%} 带来回切歌），比较计数与真实播放数 {truth:,}")
+        configs = (("不去重", 0.0, 0.0), (f"时间窗 {window:g}s", window, 0.0),
+                   (f"最短收听 {min_dwell:g}s", 0.0, min_dwell),
+                   ("时间窗 + 最短收听", window, min_dwell))
+        for i, (name, w, d) in enumerate(configs):
+            directory = os.path.join(root, str(i))
+            os.makedirs(directory)
+            playback = os.path.join(directory, "music_playback.log")
+            with contextlib.redirect_stdout(io.StringIO()):
+                tracker = MusicTracker(
+                    history_file=os.path.join(directory, "history.jsonl"), log_file=playback,
+                    history_backend="jsonl", count_file=os.path.join(directory, "play_count.json"),
+                    dedup_window=w, min_dwell=d)
+                t0 = time.perf_counter()
+                with tracker.batch():
+                    for artist, title, played_at in iter_plays([log], BackfillStats()):
+                        tracker.update_track(artist, title, played_at)
+                tracker.close()
+                elapsed = time.perf_counter() - t0
+            with open(playback, encoding="utf-8") as f:
+                counted = sum(1 for _ in f)
+            print(f"  {name:<16} 计数 {counted:>8,}  误差 {counted - truth:>+7,} "
+                  f"({(counted - truth) / truth:+.2%})  {elapsed:.2f}s")
+
+    index = DedupIndex(window)
+    keys = [f"歌手{i % 500}|歌曲{i}" for i in range(5_000)]
+    stamps = sorted(rnd.uniform(0, events * 2.0) for _ in range(events))
+    picks = [rnd.choice(keys) for _ in range(events)]
+    peak = 0
+    t0 = time.perf_counter()
+    for key, at in zip(picks, stamps):
+        index.seen(key, at)
+        peak = max(peak, len(index))
+    elapsed = time.perf_counter() - t0
+    print(f"  DedupIndex.seen(): {events:,} 次 {elapsed / events * 1e6:.2f} µs/次，"
+          f"表内最多 {peak:,} 条（窗口内平均 {window / 2.0:,.0f} 个事件）")
+
+
+def bench_metrics(size_mb: float, repeat: int, calls: int):
+    from log_parser import classify_line
+    from log_source import LogSource
+    from metrics import LATENCY_BUCKETS, MonitorMetrics
+
+    lines = synthetic_amll_lines(size_mb)
+
+    def process(metrics) -> float:
+        classify = classify_line if metrics is None else metrics.timed_classify(classify_line)
+        source = LogSource(os.devnull, backlog_batch_size=1 << 30, classify=classify, metrics=metrics)
+        source.catching_up = True  # 补录模式：曲目进积压队列，不打印
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            source.process_lines(lines)
+            best = min(best, time.perf_counter() - start)
+            source.backlog.clear()
+        return best
+
+    print(f"📏 {len(lines):,} 行（{size_mb:g} MB）经 LogSource.process_lines 的耗时，取 {repeat} 次最好成绩")
+    off = process(None)
+    on = process(MonitorMetrics())
+    print(f"  {'关闭指标':<10} {off / len(lines) * 1e9:>8.0f} ns/行")
+    print(f"  {'开启指标':<10} {on / len(lines) * 1e9:>8.0f} ns/行  "
+          f"（额外 {(on - off) / len(lines) * 1e9:.0f} ns/行）")
+
+    metrics = MonitorMetrics()
+    inc, observe = metrics.lines.inc, metrics.update.observe
+    values = [random.Random(1).choice(LATENCY_BUCKETS) * 0.7 for _ in range(1000)] * (calls // 1000)
+    t0 = time.perf_counter()
+    for _ in values:
+        inc()
+    t1 = time.perf_counter()
+    for v in values:
+        observe(v)
+    t2 = time.perf_counter()
+    print(f"  Counter.inc()        {(t1 - t0) / len(values) * 1e9:>8.0f} ns/次")
+    print(f"  Histogram.observe()  {(t2 - t1) / len(values) * 1e9:>8.0f} ns/次")
+
+
+class _SlowTerminal(io.StringIO):
+    """模拟慢终端 / 管道：每次 write 额外耗时 delay 秒"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.delay)
+        return super().write(text)
+
+    def isatty(self):
+        return True
+
+
+def bench_render(tracks: int, write_ms: float, fps: float):
+    from console_renderer import ConsoleRenderer
+
+    delay = write_ms / 1000
+    plays = [(ARTISTS[i % len(ARTISTS)], f"{TITLES[i % len(TITLES)]} {i}") for i in range(tracks)]
+    print(f"🖥️ {tracks:,} 次曲目更新写到每次 write 耗时 {write_ms:g} ms 的终端，调用方（监控线程）的耗时")
+
+    # 旧做法：在监控线程里逐行 print 一个 5 行的框
+    stream = _SlowTerminal(delay)
+    t0 = time.perf_counter()
+    for artist, title in plays:
+        print("\n🎵 检测到新曲目!", file=stream)
+        print("┌" + "─" * 50 + "┐", file=stream)
+        print(f"│ 歌曲: {title:<42} │", file=stream)
+        print(f"│ 艺术家: {artist:<40} │", file=stream)
+        print("└" + "─" * 50 + "┘", file=stream)
+    legacy = time.perf_counter() - t0
+    print(f"  {'同步 print':<12} {legacy / tracks * 1e6:>10.1f} µs/次  写入 {stream.writes:,} 次")
+
+    stream = _SlowTerminal(delay)
+    renderer = ConsoleRenderer(fps, ansi=True, stream=stream)
+    renderer.start()
+    t0 = time.perf_counter()
+    for i, (artist, title) in enumerate(plays):
+        renderer.update(track={"artist": artist, "title": title, "time": "12:00:00", "play_count": i + 1})
+    queued = time.perf_counter() - t0
+    renderer.close(timeout=10)
+    drained = time.perf_counter() - t0
+    print(f"  {'渲染器入队':<12} {queued / tracks * 1e6:>10.1f} µs/次  "
+          f"{renderer.frames:,} 帧（上限 {fps:g} 帧/秒），全部画完 {drained * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AMLL Music Monitor 微基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parser", help="日志行分类吞吐量（行/秒）")
+    p.add_argument("--size-mb", type=float, default=16)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("sqlite", help="SQLite 播放库写入与统计查询耗时")
+    p.add_argument("--plays", type=int, default=500_000)
+
+    p = sub.add_parser("startup", help="-X importtime 冷启动耗时")
+    p.add_argument("--repeat", type=int, default=5)
+
+    p = sub.add_parser("multi", help="单线程多来源监控（共用写线程）与逐日志线程的资源对比")
+    p.add_argument("--sources", type=int, nargs="+", default=[1, 10, 100])
+    p.add_argument("--backend", choices=["auto", "watchdog", "polling"], default="polling")
+    p.add_argument("--idle", type=float, default=3.0)
+    p.add_argument("--tracks", type=int, default=20)
+
+    p = sub.add_parser("memory", help="播放记录的内存占用：dict 与 Play / 环形缓冲对比")
+    p.add_argument("--plays", type=int, default=100_000)
+    p.add_argument("--songs", type=int, default=2_000)
+    p.add_argument("--buffer", type=int, default=200)
+
+    p = sub.add_parser("lyrics", help="歌词索引扫描 / 增量刷新 / 查找耗时")
+    p.add_argument("--files", type=int, default=5_000)
+    p.add_argument("--lookups", type=int, default=1_000)
+
+    p = sub.add_parser("dedup", help="去重闸门：回放带来回切歌的日志，比较计数误差与耗时")
+    p.add_argument("--plays", type=int, default=20_000)
+    p.add_argument("--bounce", type=float, default=0.1)
+    p.add_argument("--window", type=float, default=180.0)
+    p.add_argument("--min-dwell", type=float, default=10.0)
+    p.add_argument("--events", type=int, default=1_000_000)
+
+    p = sub.add_parser("metrics", help="运行指标的开销：开启 / 关闭时逐行处理耗时")
+    p.add_argument("--size-mb", type=float, default=16)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--calls", type=int, default=1_000_000)
+
+    p = sub.add_parser("render", help="控制台显示：同步 print 与渲染线程入队对监控线程的耗时")
+    p.add_argument("--tracks", type=int, default=2_000)
+    p.add_argument("--write-ms", type=float, default=2.0)
+    p.add_argument("--fps", type=float, default=10.0)
+
+    args = parser.parse_args()
+    if args.command == "parser":
+        bench_parser(args.size_mb, args.repeat)
+    elif args.command == "sqlite":
+        bench_sqlite(args.plays)
+    elif args.command == "startup":
+        bench_startup(args.repeat)
+    elif args.command == "multi":
+        bench_multi(args.sources, args.backend, args.idle, args.tracks)
+    elif args.command == "memory":
+        bench_memory(args.plays, args.songs, args.buffer)
+    elif args.command == "lyrics":
+        bench_lyrics(args.files, args.lookups)
+    elif args.command == "dedup":
+        bench_dedup(args.plays, args.bounce, args.window, args.min_dwell, args.events)
+    elif args.command == "metrics":
+        bench_metrics(args.size_mb, args.repeat, args.calls)
+    elif args.command == "render":
+        bench_render(args.tracks, args.write_ms, args.fps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Optional, Tuple
+
+from atomic_io import atomic_write_json
+
+# 启动校验时最多往回读取的字节数（足够容纳一行 AMLL 日志）
+_VERIFY_WINDOW = 64 * 1024
+
+
+def line_digest(line: str) -> str:
+    """最后处理行的摘要：与 LogTailReader 的解码结果一致即可比对"""
+    return hashlib.sha1(line.encode("utf-8")).hexdigest()
+
+
+class LogCheckpoint:
+    """
+    日志续读断点：字节偏移 + 文件标识 + 最后处理行的摘要
+    写入频率受 flush_interval 限制，退出时强制落盘
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0, echo: Callable[[str], None] = print):
+        self.path = path
+        self.echo = echo
+        self.flush_interval = flush_interval
+        self._state = None
+        self._dirty = False
+        self._last_flush = 0.0
+
+    # -------------- 读取 / 校验 --------------
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            int(state["offset"])
+            return state
+        except Exception as e:
+            self.echo(f"读取断点文件失败: {e}")
+            return None
+
+    def resolve_offset(self, log_path: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        根据断点计算续读位置，返回 (偏移, 会话状态)
+        - 没有断点：(None, None)，调用方从文件末尾开始（首次运行的旧行为）
+        - 文件标识一致且最后一行摘要吻合：从断点续读
+        - 文件被替换或截断重写：断点之后的内容都是新的，从 0 开始
+        """
+        state = self.load()
+        if state is None:
+            return None, None
+
+        st = os.stat(log_path)
+        offset = int(state["offset"])
+        same_file = [st.st_dev, st.st_ino] == state.get("file_id")
+        if not same_file or offset > st.st_size:
+            return 0, None
+        if not self._verify_line(log_path, offset, state.get("line_hash")):
+            return 0, None
+        return offset, state.get("session")
+
+    @staticmethod
+    def _verify_line(log_path: str, offset: int, expected: Optional[str]) -> bool:
+        if offset == 0 or not expected:
+            return True
+        start = max(0, offset - _VERIFY_WINDOW)
+        with open(log_path, "rb") as f:
+            f.seek(start)
+            data = f.read(offset - start)
+        if not data.endswith(b"\n"):
+            return False
+        body = data[:-1]
+        if b"\n" not in body and start > 0:
+            return True  # 超长行无法完整回读，仅凭文件标识判断
+        raw = body.rsplit(b"\n", 1)[-1]
+        line = raw.decode("utf-8", errors="replace").rstrip("\r")
+        return line_digest(line) == expected
+
+    # -------------- 更新 / 落盘 --------------
+    def update(self, offset: int, file_id, last_line: Optional[str], session: Optional[str]):
+        """记录最新进度；只有距上次落盘超过 flush_interval 才真正写文件"""
+        previous = self._state or {}
+        self._state = {
+            "offset": offset,
+            "file_id": list(file_id) if file_id else None,
+            "line_hash": line_digest(last_line) if last_line is not None else previous.get("line_hash"),
+            "session": session,
+            "updated_at": time.time(),
+        }
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty or self._state is None:
+            return
+        try:
+            atomic_write_json(self.path, self._state)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        except Exception as e:
+            self.echo(f"保存断点文件失败: {e}")
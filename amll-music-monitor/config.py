@@ -20,6 +20,29 @@ def _find_amll_log():
     return None
 
 
+def _find_amll_logs():
+    """
+    多来源监控用：返回所有存在的 AMLL Player 日志（去重，保持发现顺序）
+    除当前用户外，还会扫描同一台机器上其他用户目录下的同名日志
+    """
+    home = os.path.expanduser("~")
+    homes = [home]
+    users_dir = os.path.dirname(home)
+    try:
+        homes += sorted(os.path.join(users_dir, name) for name in os.listdir(users_dir))
+    except OSError:
+        pass
+
+    found = []
+    for user_home in homes:
+        for relative in (os.path.join(".amll-player", "logs", "amll-player.log"),
+                         os.path.join("AMLL Player", "amll-player.log")):
+            path = os.path.abspath(os.path.join(user_home, relative))
+            if path not in found and os.path.isfile(path):
+                found.append(path)
+    return found
+
+
 class Config:
     """配置文件：所有参数集中管理"""
 
@@ -29,9 +52,86 @@ class Config:
     # ② 其他配置
     CHECK_INTERVAL = 1  # 秒
     HISTORY_FILE = "amll_music_history.json"
+    # 历史存储："jsonl" 追加式写入、不截断（首次启动自动迁移旧 JSON）；"json" 为旧的整表重写
+    # "sqlite"：历史、次数统一存入 SQLITE_DB_FILE（首次建库从播放日志导入）
+    HISTORY_BACKEND = "jsonl"
+    SQLITE_DB_FILE = "amll_plays.db"
+    # 内存中保留的最近播放条数（环形缓冲），更早的记录只在历史存储中
+    HISTORY_BUFFER_SIZE = 200
+    # 后台写入：检测线程只入队，写线程每 FLUSH_INTERVAL 秒合并落盘一次
+    WRITE_BEHIND = True
+    FLUSH_INTERVAL = 1.0
+    WRITE_QUEUE_SIZE = 1024
+    # fsync 策略："never" 交给操作系统；"interval" 定期 fsync；"always" 每次刷新都 fsync
+    FSYNC_POLICY = "interval"
     PLAYBACK_LOG_FILE = "music_playback.log"
+    # 收听时长：每次播放的实际收听区间（定长二进制记录），music_stats.py 据此统计时长、跳过率与会话；None 关闭
+    LISTENING_FILE = "listening_intervals.bin"
+    MAX_DWELL = 1200  # 单首最长计入的收听时长（秒），没有等到结束事件时按此截断
+    SESSION_GAP = 1800  # 两次收听间隔超过该秒数视为新的收听会话
+    # 计数去重：同一首 DEDUP_WINDOW 秒内再次出现不重复计数（AMLL 快速来回切歌时会重复输出新曲目信息）；0 关闭
+    # 默认关闭：开启后单曲循环短于窗口的歌曲不再逐遍计数，需要时再设为例如 180
+    DEDUP_WINDOW = 0
+    # 最短收听：听不满 MIN_DWELL 秒就切走的曲目不计数；0 关闭（曲目显示不受影响，计数与播放日志在听满后写入）
+    # 默认关闭，保持原有“每次切歌计一次”的计数方式；需要时再设为例如 10
+    MIN_DWELL = 0
     TARGET_SOFTWARE = "net.stevexmh.amllplayer"
 
     # ③ 歌词目录（可选）
     LYRICS_DIR = "lyrics"
-    SUPPORTED_LYRICS_FORMATS = [".lrc", ".ttml", ".txt"]
\ No newline at end of file
+    SUPPORTED_LYRICS_FORMATS = [".lrc", ".ttml", ".txt"]
+    # 歌词索引：按规范化的歌手 / 歌曲建立并持久化，目录 mtime 变化时才重新列举
+    LYRICS_INDEX_FILE = "lyrics_index.json"
+    LYRICS_REFRESH_INTERVAL = 30.0  # 后台检查歌词目录变化的间隔（秒）
+    LYRICS_CACHE_SIZE = 64  # 解析后的歌词最多缓存多少首（LRU）
+
+    # ④ 日志监控后端
+    # "auto"：优先使用 watchdog 文件系统通知，缺失时退回轮询
+    # "watchdog"：强制使用文件系统通知
+    # "polling"：定时检查文件大小（旧行为）
+    MONITOR_BACKEND = "auto"
+    POLL_INTERVAL = 0.5  # 轮询后端的检查间隔（秒）
+    # 通知后端的兜底检查间隔：Windows 上被写入方占用的文件不一定及时触发通知
+    WATCHDOG_FALLBACK_INTERVAL = 2.0
+    # 流式读取日志的块大小（字节）：积压再大也只占用固定内存
+    READ_CHUNK_SIZE = 64 * 1024
+
+    # ⑤ 续读断点：记录已处理的字节偏移，重启后补录停机期间的播放；设为 None 关闭
+    CHECKPOINT_FILE = "monitor_checkpoint.json"
+    CHECKPOINT_INTERVAL = 5.0  # 断点最多每隔多少秒写一次（秒）
+
+    # ⑥ 实时统计接口（可选）：在本进程内提供 JSON 接口，数据来自内存计数器，不读写磁盘
+    # 例如 http://127.0.0.1:8765/api/summary，另有 current / recent / top / series
+    # /events 为 Server-Sent Events 流，曲目变化时实时推送
+    STATS_SERVER = False
+    STATS_SERVER_HOST = "127.0.0.1"
+    STATS_SERVER_PORT = 8765
+    # 允许跨域读取的网页来源（例如 "http://localhost:3000"）；None 不带 CORS 头，只有同源或非浏览器客户端可读
+    STATS_SERVER_ALLOW_ORIGIN = None
+
+    # ⑦ 当前曲目文件（可选）：每次曲目变化原子写入该 JSON 文件，供直播叠加层等读取；None 关闭
+    NOW_PLAYING_FILE = None
+
+    # ⑧ 多来源监控（multi_monitor.py）：单线程同时跟踪多个日志，每个来源独立的偏移、会话和统计
+    # 默认监控本机所有用户目录下发现的 AMLL 日志；可改为手动指定的路径列表
+    LOG_PATHS = _find_amll_logs()
+    # 每个来源的历史、次数、播放日志和断点存放在 SOURCES_DIR/<来源名>/ 下，互不干扰
+    SOURCES_DIR = "sources"
+
+    # ⑨ 运行指标（可选）：日志行数 / 字节数、逐行解析耗时、检测到写盘的延迟、各文件写入耗时
+    # 开启后 /metrics 以 Prometheus 文本格式导出（需同时开启 STATS_SERVER），也可定期写入 JSON 文件
+    # 关闭时不创建任何指标，热路径上没有额外开销
+    METRICS = False
+    METRICS_FILE = None  # 例如 "monitor_metrics.json"；None 不写文件
+    METRICS_INTERVAL = 10.0  # 写入 JSON 的间隔（秒）
+
+    # ⑩ 控制台显示：由单独的渲染线程输出，监控线程只把状态入队，慢终端或管道不会拖住检测
+    # "auto" 在终端中原地重绘、输出被重定向时逐条追加；"ansi" / "plain" 强制其一
+    # "headless" 不输出任何运行中的显示（作为服务运行时使用）
+    CONSOLE_MODE = "auto"
+    CONSOLE_FPS = 10  # 每秒最多重绘的帧数，两帧之间的多次更新合并为一帧
+
+    # ⑪ 服务模式（service.py）：无界面运行，SIGTERM 时按顺序停止并一次性写完挂起状态
+    # 日志为每行一个 JSON 对象；None 时写到 stderr，由 systemd-journald 等收集
+    SERVICE_LOG_FILE = None
+    SERVICE_LOG_LEVEL = "info"  # debug / info / warning / error
\ No newline at end of file
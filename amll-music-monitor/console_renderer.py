@@ -0,0 +1,240 @@
+import queue
+import shutil
+import sys
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Dict, List
+
+from colorama import Fore, Style
+
+MODES = ("auto", "ansi", "plain", "headless")
+
+# 光标上移 n 行回到行首并清除到屏幕末尾；colorama 在旧版 Windows 控制台上也能转换这几个序列
+_CURSOR_UP = "\x1b[{}A\r"
+_CLEAR_DOWN = "\x1b[J"
+
+_STOP = object()
+_NOTHING = object()
+
+
+def display_width(text: str) -> int:
+    """终端显示宽度：全角 / 宽字符（中文、emoji）占两列，组合字符不占列"""
+    width = 0
+    for ch in text:
+        if unicodedata.combining(ch):
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+    return width
+
+
+def fit(text: str, width: int) -> str:
+    """按显示宽度截断（末尾加 …）并用空格补齐到恰好 width 列"""
+    if display_width(text) > width:
+        out, used = [], 0
+        for ch in text:
+            w = display_width(ch)
+            if used + w > width - 1:
+                break
+            out.append(ch)
+            used += w
+        text = "".join(out) + "…"
+    return text + " " * (width - display_width(text))
+
+
+class ConsoleRenderer:
+    """
+    控制台渲染器：所有输出都由一个渲染线程完成
+    - 调用方通过 update(**state) / message(text) 入队，永不阻塞；慢终端或管道只拖慢渲染线程
+    - 两帧之间的多次更新合并为一帧，每秒最多 fps 帧
+    - ansi 模式在原处重绘（光标上移 + 清屏到末尾），最近几条消息显示在曲目框下方
+    - plain 模式用于输出被重定向：消息逐条追加，曲目变化时追加一个曲目框，不输出控制序列
+    """
+
+    def __init__(self, fps: float = 10.0, ansi: bool = True, stream=None, messages: int = 3):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.ansi = ansi
+        self._stream = stream or sys.stdout
+        self._queue = queue.SimpleQueue()
+        self._state: Dict = {}
+        self._messages = deque(maxlen=messages)
+        self._new_messages: List[str] = []
+        self._dirty = False
+        self._drawn_lines = 0
+        self._last_track = _NOTHING
+        self._thread = None
+        self._closed = False
+        self._broken = False
+        self.frames = 0
+        self.updates = 0
+
+    # -------------- 调用方接口（任意线程） --------------
+    def update(self, **state):
+        """合并到显示状态：track（artist / title / time / play_count 的字典或 None）、session、lyrics"""
+        if not self._closed:
+            self._queue.put(state)
+
+    def message(self, text: str):
+        """一条状态消息（检测到曲目、会话切换、轮转等）"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            # 渲染线程没在运行（启动前 / 关闭后）：直接写出，不会与帧交错
+            self._write(text + "\n")
+        elif not self._closed:
+            self._queue.put(text)
+
+    def start(self):
+        """开始渲染，先画一帧等待状态"""
+        if self._thread is None:
+            self._queue.put({})
+            self._thread = threading.Thread(target=self._run, name="console-renderer", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 2.0):
+        """画完队列里剩下的更新后退出；之后的更新直接丢弃"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # -------------- 渲染线程 --------------
+    def _apply(self, item) -> bool:
+        if item is _STOP:
+            return False
+        self.updates += 1
+        if isinstance(item, str):
+            self._messages.append(item)
+            self._new_messages.append(item)
+        else:
+            self._state.update(item)
+        self._dirty = True
+        return True
+
+    def _run(self):
+        last_frame = 0.0
+        running = True
+        while running:
+            running = self._apply(self._queue.get())
+            # 距上一帧不足 interval 时继续收集更新，到点后只画一帧
+            deadline = last_frame + self.interval
+            while running:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                running = self._apply(item)
+            if self._dirty:
+                self._draw()
+                last_frame = time.monotonic()
+
+    def _draw(self):
+        self._dirty = False
+        if self.ansi:
+            text = self._ansi_frame()
+        else:
+            text = self._plain_frame()
+        if text and self._write(text):
+            self.frames += 1
+
+    def _write(self, text: str) -> bool:
+        if self._broken:
+            return False
+        try:
+            self._stream.write(text)
+            self._stream.flush()
+        except (OSError, ValueError):
+            # 终端已关闭或管道断开：之后不再输出，但不影响检测
+            self._broken = True
+            return False
+        return True
+
+    # -------------- 帧内容 --------------
+    def _box(self, width: int) -> List[str]:
+        state = self._state
+        track = state.get("track")
+        inner = width - 2
+        border = Fore.CYAN
+        rows = []
+        if track:
+            rows.append(("歌曲: ", track.get("title", "未知标题")))
+            rows.append(("艺术家: ", track.get("artist", "未知艺术家")))
+            rows.append(("时间: ", track.get("time", "")))
+            if track.get("play_count"):
+                rows.append(("次数: ", f"第 {track['play_count']} 次"))
+        else:
+            rows.append(("", "⏳ 等待检测播放内容..."))
+        session = state.get("session")
+        if session is not None:
+            rows.append(("状态: ", "播放中" if session == "enter" else "已暂停"))
+        if state.get("lyrics"):
+            rows.append(("歌词: ", state["lyrics"]))
+
+        lines = [f"{border}┌{'─' * inner}┐{Style.RESET_ALL}"]
+        for label, value in rows:
+            body = fit(label + value, inner - 2)
+            shown_label = body[:len(label)] if body.startswith(label) else ""
+            rest = body[len(shown_label):]
+            lines.append(f"{border}│ {Fore.YELLOW}{shown_label}{Fore.WHITE}{rest} {border}│{Style.RESET_ALL}")
+        lines.append(f"{border}└{'─' * inner}┘{Style.RESET_ALL}")
+        return lines
+
+    def _ansi_frame(self) -> str:
+        columns = shutil.get_terminal_size((80, 24)).columns
+        # 每行都不超过终端宽度，折行会让上移的行数对不上
+        width = max(20, min(52, columns - 1))
+        lines = self._box(width)
+        for text in self._messages:
+            lines.append(f"{Style.DIM}{fit(text, columns - 1).rstrip()}{Style.RESET_ALL}")
+        self._new_messages.clear()
+        prefix = (_CURSOR_UP.format(self._drawn_lines) if self._drawn_lines else "") + _CLEAR_DOWN
+        self._drawn_lines = len(lines)
+        return prefix + "\n".join(lines) + "\n"
+
+    def _plain_frame(self) -> str:
+        out = self._new_messages
+        self._new_messages = []
+        track = self._state.get("track")
+        key = (track.get("artist"), track.get("title")) if track else None
+        if key != self._last_track:
+            self._last_track = key
+            if track:
+                out = out + [""] + self._box(52)
+            else:
+                out = out + [f"{Fore.YELLOW}⏳ 等待检测播放内容... {time.strftime('%H:%M:%S')}{Style.RESET_ALL}"]
+        return "".join(line + "\n" for line in out)
+
+
+class HeadlessRenderer:
+    """无界面模式：接口相同，什么也不输出（作为服务运行时使用）"""
+
+    frames = 0
+    updates = 0
+
+    def update(self, **state):
+        pass
+
+    def message(self, text: str):
+        pass
+
+    def start(self):
+        pass
+
+    def close(self, timeout: float = 2.0):
+        pass
+
+
+def create_renderer(mode: str = "auto", fps: float = 10.0, stream=None):
+    """auto：标准输出是终端时原地重绘，被重定向到文件或管道时逐条追加"""
+    if mode not in MODES:
+        raise ValueError(f"未知的控制台模式: {mode}")
+    if mode == "headless":
+        return HeadlessRenderer()
+    stream = stream or sys.stdout
+    if mode == "auto":
+        isatty = getattr(stream, "isatty", None)
+        mode = "ansi" if isatty is not None and isatty() else "plain"
+    return ConsoleRenderer(fps, ansi=mode == "ansi", stream=stream)
@@ -0,0 +1,116 @@
+import json
+import os
+from collections import Counter
+from typing import Callable, Dict
+
+from atomic_io import atomic_write, atomic_write_json
+
+
+class CountStore:
+    """
+    播放次数持久化：原子快照 + 追加日志（journal）
+    - 快照 play_count.json 通过临时文件 + fsync + rename 原子替换，不会留下半截文件
+    - 每次保存前先把变化的计数（绝对值）追加到 journal；journal 开头总是一份完整基线，
+      只靠它就能还原全部计数，快照损坏时据此恢复，无需从 music_playback.log 重建
+    - journal 超过 compact_every 行时原子重写为一份新的基线
+    """
+
+    def __init__(self, path: str, journal_path: str = None, compact_every: int = 1000,
+                 fsync: bool = True, echo: Callable[[str], None] = print):
+        self.path = path
+        self.echo = echo
+        self.journal_path = journal_path or os.path.splitext(path)[0] + ".journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._journal = None
+        self._journal_lines = 0
+        self._last_saved: Dict[str, int] = {}
+
+    # -------------- 读取 / 恢复 --------------
+    def load(self) -> Counter:
+        journal_exists = os.path.exists(self.journal_path)
+        if not os.path.exists(self.path):
+            # 快照不存在视为用户主动清零（删除 play_count.json），同时作废旧 journal
+            if journal_exists:
+                os.remove(self.journal_path)
+            counts = Counter()
+            self._write_snapshot({})
+        else:
+            counts = self._read_snapshot()
+            if counts is None:
+                counts = self._read_journal()
+                self.echo(f"♻️ 计数快照损坏，已从 journal 恢复 {len(counts)} 首歌曲的播放次数")
+                self._write_snapshot(dict(counts))
+            elif journal_exists:
+                # 快照可能落后于 journal（写入快照前进程退出），计数只增不减，取较大值
+                for key, n in self._read_journal().items():
+                    if n > counts[key]:
+                        counts[key] = n
+
+        self._last_saved = dict(counts)
+        self._rewrite_journal(self._last_saved)
+        return counts
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return Counter(json.load(f))
+        except Exception as e:
+            self.echo(f"读取计数文件失败: {e}")
+            return None
+
+    def _read_journal(self) -> Counter:
+        counts = Counter()
+        if not os.path.exists(self.journal_path):
+            return counts
+        with open(self.journal_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key, n = entry["k"], int(entry["n"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # 末尾未写完的行
+                if n > counts[key]:
+                    counts[key] = n
+        return counts
+
+    # -------------- 写入 --------------
+    def save(self, counts: Dict[str, int]):
+        """先追加变化到 journal，再原子替换快照"""
+        changed = {k: n for k, n in counts.items() if self._last_saved.get(k) != n}
+        if not changed and os.path.exists(self.path):
+            return
+        if self._journal_lines + len(changed) > max(self.compact_every, 2 * len(counts)):
+            self._rewrite_journal(counts)
+        else:
+            self._append_journal(changed)
+        self._write_snapshot(counts)
+        self._last_saved = dict(counts)
+
+    def _write_snapshot(self, counts: Dict[str, int]):
+        atomic_write_json(self.path, counts, fsync=self.fsync, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _encode(key: str, n: int) -> str:
+        return json.dumps({"k": key, "n": n}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _append_journal(self, changed: Dict[str, int]):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8", newline="\n")
+        self._journal.writelines(self._encode(k, n) for k, n in changed.items())
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_lines += len(changed)
+
+    def _rewrite_journal(self, counts: Dict[str, int]):
+        """用一份完整基线替换 journal"""
+        self.close()
+        with atomic_write(self.journal_path, fsync=self.fsync) as f:
+            f.writelines(self._encode(k, n) for k, n in counts.items())
+        self._journal_lines = len(counts)
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,95 @@
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from play_record import Play
+
+
+class DedupIndex:
+    """
+    时间窗口去重：(曲目 key, 时间桶) 哈希表 + 按时间排序的到期队列
+    - 桶宽等于 window 秒，window 秒内的上一次出现只可能落在当前桶或前一个桶，查两次哈希即可
+    - 每次查询先从队首弹出过期条目，内存只与 window 秒内出现过的曲目数有关；max_entries 为硬上限
+    - 每个事件均摊 O(1)
+    """
+
+    def __init__(self, window: float = 180.0, max_entries: int = 4096):
+        self.window = window
+        self.max_entries = max_entries
+        self._seen: Dict[Tuple[str, int], float] = {}
+        self._expiry: Deque[Tuple[float, Tuple[str, int]]] = deque()
+        self.hits = 0
+
+    def _expire(self, now: float):
+        expiry, seen = self._expiry, self._seen
+        deadline = now - self.window
+        while expiry and (expiry[0][0] <= deadline or len(expiry) > self.max_entries):
+            at, entry = expiry.popleft()
+            if seen.get(entry) == at:
+                del seen[entry]
+
+    def seen(self, key: str, at: float) -> bool:
+        """key 在 at 之前 window 秒内出现过返回 True；否则记下这次出现并返回 False"""
+        self._expire(at)
+        bucket = int(at // self.window)
+        for entry in ((key, bucket), (key, bucket - 1)):
+            last = self._seen.get(entry)
+            if last is not None and abs(at - last) < self.window:
+                self.hits += 1
+                return True
+        entry = (key, bucket)
+        self._seen[entry] = at
+        self._expiry.append((at, entry))
+        return False
+
+    def clear(self):
+        self._seen.clear()
+        self._expiry.clear()
+
+    def __len__(self):
+        return len(self._seen)
+
+
+class PlayGate:
+    """
+    决定一次曲目切换能否计为播放
+    - window > 0：同一首 window 秒内已经计过数则不再计（AMLL 快速来回切歌时会重复输出“新曲目信息”）
+    - min_dwell > 0：新曲目先挂起，从开始算听满 min_dwell 秒才确认，之前被切走则丢弃
+      确认发生在下一次切歌时，或由 poll() 定期检查
+    """
+
+    def __init__(self, window: float = 0.0, min_dwell: float = 0.0, max_entries: int = 4096):
+        self.dedup = DedupIndex(window, max_entries) if window > 0 else None
+        self.min_dwell = min_dwell
+        self._pending: Optional[Play] = None
+        self.dropped = 0
+
+    @property
+    def pending(self) -> Optional[Play]:
+        return self._pending
+
+    def offer(self, play: Play) -> Optional[Play]:
+        """新曲目开始；返回此刻应当计数的播放（可能是之前挂起的一首），没有则为 None"""
+        if self.min_dwell <= 0:
+            return self._accept(play)
+        ready = self.poll(play.played_at)
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = play
+        return ready
+
+    def poll(self, now: float) -> Optional[Play]:
+        """挂起的播放已经听满 min_dwell 秒则确认并返回"""
+        play = self._pending
+        if play is None or now - play.played_at < self.min_dwell:
+            return None
+        self._pending = None
+        return self._accept(play)
+
+    def discard(self):
+        """放弃挂起的播放（补录跳过重复记录时使用）"""
+        self._pending = None
+
+    def _accept(self, play: Play) -> Optional[Play]:
+        if self.dedup is not None and self.dedup.seen(play.key, play.played_at):
+            return None
+        return play
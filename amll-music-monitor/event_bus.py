@@ -0,0 +1,171 @@
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from atomic_io import atomic_write_json
+
+# 订阅者积压时的处理策略
+POLICIES = ("drop", "coalesce")
+
+
+class Event(NamedTuple):
+    topic: str
+    data: Any
+    seq: int
+    time: float
+
+
+class Subscription:
+    """
+    单个订阅者的收件箱
+    - "drop"：有界队列，满了丢弃最旧的事件（记入 dropped）
+    - "coalesce"：每个主题只保留最新一条，适合“当前曲目”这类状态
+    投递只做入队和通知，永远不会阻塞发布方
+    """
+
+    def __init__(self, bus: "EventBus", name: str, topics, maxsize: int, policy: str,
+                 on_ready: Optional[Callable[[], None]]):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的订阅策略: {policy}")
+        self._bus = bus
+        self.name = name
+        self.topics = set(topics) if topics else None
+        self.policy = policy
+        self._queue = deque(maxlen=maxsize)
+        self._latest: Dict[str, Event] = {}
+        self._cond = threading.Condition()
+        self._on_ready = on_ready
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def wants(self, topic: str) -> bool:
+        return self.topics is None or topic in self.topics
+
+    def _offer(self, event: Event):
+        with self._cond:
+            if self.closed:
+                return
+            if self.policy == "coalesce":
+                if event.topic in self._latest:
+                    self.dropped += 1
+                self._latest[event.topic] = event
+            else:
+                if len(self._queue) == self._queue.maxlen:
+                    self.dropped += 1
+                self._queue.append(event)
+            self._cond.notify()
+        if self._on_ready is not None:
+            self._on_ready()
+
+    def _pop_all(self) -> List[Event]:
+        if self.policy == "coalesce":
+            events = sorted(self._latest.values(), key=lambda e: e.seq)
+            self._latest.clear()
+        else:
+            events = list(self._queue)
+            self._queue.clear()
+        self.delivered += len(events)
+        return events
+
+    def drain(self) -> List[Event]:
+        """取出当前积压的全部事件（不等待）"""
+        with self._cond:
+            return self._pop_all()
+
+    def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """等待至少一条事件或超时 / 关闭，返回积压的全部事件"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed or self._queue or self._latest, timeout)
+            return self._pop_all()
+
+    def close(self):
+        self._bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        if self._on_ready is not None:
+            self._on_ready()
+
+
+class EventBus:
+    """
+    进程内发布 / 订阅
+    发布方只把事件放进各订阅者的收件箱；慢订阅者的积压被丢弃或合并，不会拖住日志监控线程
+    """
+
+    def __init__(self, echo: Callable[[str], None] = print):
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._seq = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, name: str, topics=None, maxsize: int = 64, policy: str = "drop",
+                  on_ready: Optional[Callable[[], None]] = None) -> Subscription:
+        """
+        topics 为 None 时订阅全部主题
+        on_ready：有新事件时在发布方线程里调用，必须足够轻量（例如 call_soon_threadsafe）
+        """
+        sub = Subscription(self, name, topics, maxsize, policy, on_ready)
+        with self._lock:
+            self._subscribers = self._subscribers + [sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not sub]
+
+    def publish(self, topic: str, data: Any) -> Event:
+        # 监控线程与服务器线程都会发布：编号与计数在锁内更新，投递在锁外进行
+        with self._lock:
+            event = Event(topic, data, next(self._seq), time.time())
+            self.published += 1
+        for sub in self._subscribers:  # 写时复制的列表，遍历无需加锁
+            if sub.wants(topic):
+                try:
+                    sub._offer(event)
+                except Exception as e:
+                    self.echo(f"事件投递失败（{sub.name}）: {e}")
+        return event
+
+    def stats(self) -> Dict:
+        subscribers = self._subscribers
+        return {
+            "published": self.published,
+            "subscribers": {
+                s.name: {"policy": s.policy, "delivered": s.delivered, "dropped": s.dropped}
+                for s in subscribers
+            },
+        }
+
+
+class EventFileSink:
+    """
+    文件输出：订阅曲目变化，把当前曲目原子写入 JSON 文件（例如给直播叠加层读取）
+    独立线程写盘，合并策略下写入再慢也只会跳过中间状态
+    """
+
+    def __init__(self, bus: EventBus, path: str, topic: str = "track",
+                 echo: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.echo = echo or bus.echo
+        self._sub = bus.subscribe("file-sink", topics=[topic], policy="coalesce")
+        self._thread = threading.Thread(target=self._run, name="event-file-sink", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            for event in self._sub.get():
+                try:
+                    atomic_write_json(self.path, event.data, fsync=False, ensure_ascii=False, indent=2)
+                except Exception as e:
+                    self.echo(f"写入当前曲目文件失败: {e}")
+            if self._sub.closed:
+                break
+
+    def close(self, timeout: float = 2.0):
+        self._sub.close()
+        self._thread.join(timeout)
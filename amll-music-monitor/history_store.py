@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from atomic_io import atomic_write, atomic_write_json
+
+# 反向读取文件尾部时的块大小
+_TAIL_BLOCK = 8 * 1024
+
+
+class JsonHistoryStore:
+    """旧格式：整表 JSON，每次写入都重写文件，只保留最近 keep 条"""
+
+    def __init__(self, path: str, keep: int = 100, echo: Callable[[str], None] = print):
+        self.path = path
+        self.keep = keep
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._records = self._load()
+
+    def _load(self) -> List[Dict]:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            self.echo(f"加载历史记录失败: {e}")
+        return []
+
+    def append(self, record: Dict):
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict]):
+        """写入失败时抛出，内存里的记录保持不变，重试不会重复"""
+        with self._lock:
+            updated = (self._records + list(records))[-self.keep:]
+            atomic_write_json(self.path, updated, ensure_ascii=False, indent=2)
+            self._records = updated
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            return self._records[-limit:]
+
+    def __iter__(self):
+        with self._lock:
+            records = list(self._records)
+        return iter(records)
+
+    def close(self):
+        pass
+
+
+class JsonlHistoryStore:
+    """
+    追加式历史记录：每条播放一行 JSON（JSON Lines）
+    - 写入只追加一行，代价与历史长度无关，也不再截断旧记录
+    - 启动时不加载全部历史，最近记录从文件尾部反向读取
+    - 崩溃留下的半行在打开时修复；读取时遇到无法解析的行，下一次写入时重写文件把它们丢弃
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None,
+                 echo: Callable[[str], None] = print):
+        self.path = path
+        self.echo = echo
+        self._lock = threading.Lock()
+        # recent() / 遍历读到的损坏行数；非零时由下一次写入触发压缩
+        self._damaged = 0
+
+        if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+        self._repair_tail()
+        self._file = open(self.path, "a", encoding="utf-8", newline="\n")
+
+    # -------------- 迁移 / 修复 --------------
+    def _migrate(self, legacy_path: str):
+        """一次性把旧的 amll_music_history.json 转成 JSON Lines；旧文件原样保留"""
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except Exception as e:
+            self.echo(f"迁移历史记录失败，将从空历史开始: {e}")
+            return
+
+        with atomic_write(self.path) as f:
+            for record in records:
+                f.write(self._encode(record))
+        self.echo(f"📦 已将 {len(records)} 条历史记录迁移到 {self.path}")
+
+    def _repair_tail(self):
+        """截掉文件末尾没写完的半行（进程在写入中途被杀）"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                start = max(0, pos - _TAIL_BLOCK)
+                f.seek(start)
+                block = f.read(pos - start)
+                nl = block.rfind(b"\n")
+                if nl >= 0:
+                    f.truncate(start + nl + 1)
+                    break
+                pos = start
+            else:
+                f.truncate(0)
+        self.echo("⚠️ 历史记录末尾存在未写完的记录，已修复")
+
+    @staticmethod
+    def _encode(record: Dict) -> str:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    # -------------- 写入 --------------
+    def append(self, record: Dict):
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict]):
+        """写入失败时抛出并截回写入前的长度，调用方整批重试不会重复记录或留下半行"""
+        with self._lock:
+            data = "".join(self._encode(record) for record in records)
+            if self._file.closed:
+                # 上一次回滚后没能重新打开
+                self._file = open(self.path, "a", encoding="utf-8", newline="\n")
+            start = os.fstat(self._file.fileno()).st_size
+            try:
+                self._file.write(data)
+                self._file.flush()
+            except Exception:
+                self._rollback_locked(start)
+                raise
+            if self._damaged:
+                # 失败时不在每次写入时重试，等下次再读到损坏行
+                self._damaged = 0
+                self._compact_locked()
+
+    def _rollback_locked(self, size: int):
+        """丢掉缓冲里没写出的部分，把文件截回 size 字节后重新打开"""
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        try:
+            os.truncate(self.path, size)
+        except OSError as e:
+            self.echo(f"回滚未写完的历史记录失败: {e}")
+        self._file = open(self.path, "a", encoding="utf-8", newline="\n")
+
+    def sync(self):
+        """把已写入的记录刷到磁盘（fsync）"""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    # -------------- 读取 --------------
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """只读取文件尾部足够容纳 limit 行的字节"""
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "rb") as f:
+                pos = f.seek(0, os.SEEK_END)
+                data = b""
+                while pos > 0 and data.count(b"\n") <= limit:
+                    start = max(0, pos - _TAIL_BLOCK)
+                    f.seek(start)
+                    data = f.read(pos - start) + data
+                    pos = start
+
+            lines = data.split(b"\n")
+            if pos > 0:
+                lines = lines[1:]  # 第一段可能是不完整的行
+            records = []
+            for raw in lines[-(limit + 1):]:
+                if not raw.strip():
+                    continue
+                try:
+                    records.append(json.loads(raw))
+                except ValueError:
+                    self._damaged += 1
+            return records[-limit:]
+
+    def __iter__(self):
+        """顺序遍历全部历史（流式，不整体加载）"""
+        with self._lock:
+            self._file.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    self._damaged += 1
+
+    # -------------- 压缩 --------------
+    def compact(self):
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """流式重写文件，丢弃无法解析的行"""
+        self._file.close()
+        kept = dropped = 0
+        try:
+            with atomic_write(self.path) as dst:
+                # 源文件在 atomic_write 替换之前关闭：Windows 上不能替换仍被打开的文件
+                with open(self.path, "r", encoding="utf-8", errors="replace") as src:
+                    for line in src:
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            dropped += 1
+                            continue
+                        dst.write(self._encode(record))
+                        kept += 1
+            self._damaged = 0
+            self.echo(f"🧹 历史记录压缩完成: 保留 {kept} 条，丢弃 {dropped} 条损坏记录")
+        except Exception as e:
+            self.echo(f"压缩历史记录失败: {e}")
+        finally:
+            self._file = open(self.path, "a", encoding="utf-8", newline="\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def create_history_store(backend: str, history_file: str,
+                         db_file: Optional[str] = None, playback_log: Optional[str] = None,
+                         echo: Callable[[str], None] = print):
+    """
+    按配置创建历史存储
+    "json"：旧的整表 JSON；"jsonl"：追加式 JSON Lines（路径为 history_file 换成 .jsonl 后缀）
+    "sqlite"：SQLite 播放库（db_file），首次建库时从 playback_log 导入既有播放
+    echo：迁移、修复、写入失败等状态消息的输出
+    """
+    if backend == "sqlite":
+        from sqlite_store import SqlitePlayStore
+        return SqlitePlayStore(db_file or os.path.splitext(history_file)[0] + ".db",
+                               import_log=playback_log, echo=echo)
+    if backend == "jsonl":
+        jsonl_path = os.path.splitext(history_file)[0] + ".jsonl"
+        return JsonlHistoryStore(jsonl_path, legacy_path=history_file, echo=echo)
+    return JsonHistoryStore(history_file, echo=echo)
@@ -0,0 +1,122 @@
+import os
+import struct
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# 定长二进制记录：开始时间（epoch 秒，float64）、收听时长（秒，float32）、收听会话编号（uint32）、标志位
+# 每次播放 20 字节；读取与汇总在 music_stats.py 的 ListeningAggregator 中，格式改动时两边一起改
+RECORD = struct.Struct("<dfIB3x")
+
+FLAG_RESUMED = 1   # 暂停（AMLL 会话被切走）后恢复的续播片段，时长属于前一首
+FLAG_CAPPED = 2    # 没有等到结束事件，时长按 max_dwell 截断
+FLAG_NEXT = 4      # 因切到下一首而结束（区别于暂停 / 退出），用于判断跳过
+
+
+class ListeningRecorder:
+    """
+    由曲目切换与 AMLL 会话切换推算每次播放的实际收听时长，并划分收听会话
+    - 新曲目开始 = 上一首结束；会话切走 = 暂停，结束当前片段；切回来时为同一首续一个片段
+    - 两次收听间隔超过 session_gap 秒开启新的收听会话
+    - 结束的区间立即追加到 path（定长二进制）；批量模式下先缓存，flush() 时一次写入
+    - 给出 submit 时不在调用线程写盘，区间交给后台写入器（WriteBehindWriter.submit_listening）
+    """
+
+    def __init__(self, path: str, max_dwell: float = 1200.0, session_gap: float = 1800.0,
+                 echo: Callable[[str], None] = print, submit: Optional[Callable[[bytes], None]] = None):
+        self.path = path
+        self.echo = echo
+        self._submit = submit
+        self.max_dwell = max_dwell
+        self.session_gap = session_gap
+        self._buffer: List[bytes] = []
+        self._hold = 0
+        self._open: Optional[tuple] = None    # (开始时间, 标志位)
+        self._paused = False
+        self._session = 0
+        self._last_end: Optional[float] = None
+        self._resume_from_file()
+
+    def _resume_from_file(self):
+        """截掉崩溃留下的半条记录，并从最后一条记录接续会话编号"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        usable = size - size % RECORD.size
+        if usable != size:
+            with open(self.path, "r+b") as f:
+                f.truncate(usable)
+        if usable:
+            with open(self.path, "rb") as f:
+                f.seek(usable - RECORD.size)
+                start, dwell, session, _ = RECORD.unpack(f.read(RECORD.size))
+            self._session, self._last_end = session, start + dwell
+
+    @staticmethod
+    def _epoch(at: Optional[datetime]) -> float:
+        return (at or datetime.now()).timestamp()
+
+    # -------------- 事件 --------------
+    def track_started(self, at: Optional[datetime] = None):
+        now = self._epoch(at)
+        if self._open is not None:
+            self._close(now, FLAG_NEXT)
+        self._paused = False
+        self._begin(now, 0)
+
+    def session_left(self, at: Optional[datetime] = None):
+        if self._open is not None:
+            self._close(self._epoch(at), 0)
+            self._paused = True
+
+    def session_entered(self, at: Optional[datetime] = None):
+        if self._paused and self._open is None:
+            self._paused = False
+            self._begin(self._epoch(at), FLAG_RESUMED)
+
+    def _begin(self, start: float, flags: int):
+        if self._last_end is None or start - self._last_end > self.session_gap:
+            self._session += 1
+        self._open = (start, flags)
+
+    def _close(self, end: float, flags: int):
+        start, flags0 = self._open
+        self._open = None
+        dwell = max(0.0, end - start)
+        flags |= flags0
+        if dwell > self.max_dwell:
+            dwell = self.max_dwell
+            flags |= FLAG_CAPPED
+        self._last_end = start + dwell
+        self._buffer.append(RECORD.pack(start, dwell, self._session, flags))
+        if not self._hold:
+            self.flush()
+
+    # -------------- 写入 --------------
+    def hold(self):
+        """进入批量模式：区间只缓存不写盘（可嵌套）"""
+        self._hold += 1
+
+    def release(self):
+        self._hold -= 1
+        if not self._hold:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        data, self._buffer = b"".join(self._buffer), []
+        if self._submit is not None:
+            self._submit(data)
+            return
+        try:
+            with open(self.path, "ab") as f:
+                f.write(data)
+        except OSError as e:
+            self.echo(f"保存收听区间失败: {e}")
+
+    def close(self, at: Optional[datetime] = None):
+        """退出时结束正在播放的一首"""
+        if self._open is not None:
+            self._close(self._epoch(at), 0)
+        self.flush()
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import threading
+from collections import Counter, deque
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+# HTTP 接口可用的视图
+VIEWS = ("current", "recent", "top", "series", "summary")
+
+
+class LiveStats:
+    """
+    内存中的实时统计：启动时从历史存储加载一次，之后由 MusicTracker 增量更新（计数只含通过闸门的播放，当前曲目跟随每次切歌）
+    - 歌手 / 歌曲 / 每日 / 24h 计数器，最近播放用定长 deque
+    - 每次变化递增 version；序列化结果按 (视图, version) 缓存，未变化时直接复用同一份字节
+    - ETag 取 JSON 内容的哈希：新曲目没有改变某个视图（例如榜单）时，该视图仍可返回 304
+    - 读取只访问内存，不碰磁盘
+    """
+
+    def __init__(self, recent_size: int = 50, top_n: int = 10, recent_days: int = 30):
+        self.top_n = top_n
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+        self._artist_cnt = Counter()
+        self._song_cnt = Counter()
+        self._daily = Counter()
+        self._hourly = [0] * 24
+        self._recent = deque(maxlen=recent_size)
+        self._current: Optional[Dict] = None
+        self._total = 0
+        self.version = 0
+        self._rendered: Dict[str, Tuple[int, str, bytes]] = {}
+
+    # -------------- 更新 --------------
+    def seed(self, records: Iterable[Dict]):
+        """从历史存储加载已有播放记录（不改变当前曲目）"""
+        with self._lock:
+            for record in records:
+                self._add(record)
+            self.version += 1
+
+    def record(self, track: Dict):
+        """记录一次计数的播放（不改变当前曲目：开启最短收听时确认的可能是已经切走的那首）"""
+        with self._lock:
+            self._add(track)
+            self.version += 1
+
+    def set_current(self, track: Dict):
+        """切换当前曲目；每次切歌都调用，与是否计数无关"""
+        with self._lock:
+            self._current = dict(track)
+            self.version += 1
+
+    def _add(self, record: Dict):
+        artist = record.get("artist", "")
+        title = record.get("title", "")
+        timestamp = record.get("timestamp", "")
+        self._artist_cnt[artist] += 1
+        self._song_cnt[f"{artist} - {title}"] += 1
+        # isoformat：YYYY-MM-DDTHH:MM:SS[.ffffff]，按位置切片即可
+        if len(timestamp) >= 13 and timestamp[11:13].isdigit():
+            self._daily[timestamp[:10]] += 1
+            self._hourly[int(timestamp[11:13])] += 1
+        self._recent.append({"artist": artist, "title": title, "timestamp": timestamp})
+        self._total += 1
+
+    # -------------- 视图 --------------
+    @property
+    def current(self) -> Optional[Dict]:
+        with self._lock:
+            return dict(self._current) if self._current else None
+
+    def _view(self, name: str) -> Dict:
+        if name == "current":
+            return {"current": self._current}
+        if name == "recent":
+            return {"recent": list(reversed(self._recent))}
+        if name == "top":
+            return {
+                "artists": self._artist_cnt.most_common(self.top_n),
+                "songs": self._song_cnt.most_common(self.top_n),
+            }
+        if name == "series":
+            return {"hourly": list(self._hourly), "daily": self._daily_series()}
+        view = {"total_plays": self._total, "days": len(self._daily)}
+        for part in ("current", "recent", "top", "series"):
+            view.update(self._view(part))
+        return view
+
+    def _daily_series(self):
+        """最近 recent_days 天（以最后一个有播放的日期为止）的每日次数"""
+        if not self._daily:
+            return []
+        end = date.fromisoformat(max(self._daily))
+        days = [(end - timedelta(days=i)).isoformat() for i in range(self.recent_days - 1, -1, -1)]
+        return [[d, self._daily.get(d, 0)] for d in days]
+
+    def render(self, name: str) -> Optional[Tuple[str, bytes]]:
+        """返回 (ETag, JSON 字节)；未知视图返回 None"""
+        if name not in VIEWS:
+            return None
+        with self._lock:
+            cached = self._rendered.get(name)
+            if cached is not None and cached[0] == self.version:
+                return cached[1], cached[2]
+            body = json.dumps(self._view(name), ensure_ascii=False).encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            self._rendered[name] = (self.version, etag, body)
+            return etag, body
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+合成 AMLL Player 日志生成器
+
+按给定速率向日志文件追加仿真的 AMLL 日志：SmtcRunner 新曲目信息、会话切换和大量无关行，
+并可按大小轮转（改名为 .1 后新建）或原地截断（模拟 AMLL 重启），供基准与回放测试使用。
+
+用法：
+    python log_generator.py amll.log --rate 2000 --duration 30 --rotate-mb 4
+    python log_generator.py amll.log --lines 1000000 --rate 0        # 不限速，尽快写完
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+ARTISTS = ["犬儒乐队", "Beyond", "痛仰乐队", "回春丹乐队", "万能青年旅店", "Radiohead", "草东没有派对"]
+TITLES = ["皮囊", "长城", "大地雷公", "杀死那个石家庄人", "Creep", "山海", "志铭"]
+NOISE = [
+    "INFO amll_player::player: 播放进度更新 position=183.42 duration=241.00",
+    "DEBUG amll_player::audio: 缓冲区填充 frames=4096",
+    "INFO amll_player::lyric: 歌词行切换 index=27",
+    "WARN tao::platform_impl::platform::event_loop::runner: NewEvents emitted without explicit RedrawEventsCleared",
+    "DEBUG amll_player::smtc: 时间线更新 position=184000",
+]
+OTHER_PLAYERS = ["Spotify.exe", "cloudmusic.exe", "QQMusic.exe"]
+
+SESSION_ENTER = 'INFO amll_player::smtc: 会话切换: "-> "net.stevexmh.amllplayer"'
+
+
+def track_body(artist: str, title: str) -> str:
+    return f"INFO amll_player::smtc: [SmtcRunner] 新曲目信息: '{artist}' - '{title}'"
+
+
+def session_leave_body(target: str) -> str:
+    return f'INFO amll_player::smtc: 会话切换: "net.stevexmh.amllplayer" -> "{target}"'
+
+
+def stamp(at: datetime) -> str:
+    """AMLL 的行首时间格式（UTC，微秒，Z 结尾）"""
+    return at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def synthetic_amll_lines(size_mb: float, seed: int = 42) -> List[str]:
+    """生成约 size_mb 大小的合成 AMLL 日志行（约 2% 曲目行、1% 会话切换），整体放在内存里"""
+    rnd = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    lines, total = [], 0
+    while total < target:
+        at = f"2025-10-24T19:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}.{rnd.randrange(10**6):06d}Z"
+        roll = rnd.random()
+        if roll < 0.02:
+            body = track_body(rnd.choice(ARTISTS), rnd.choice(TITLES))
+        elif roll < 0.025:
+            body = SESSION_ENTER
+        elif roll < 0.03:
+            body = session_leave_body("Spotify.exe")
+        else:
+            body = rnd.choice(NOISE)
+        line = f"{at}  {body}"
+        lines.append(line)
+        total += len(line.encode("utf-8")) + 1
+    return lines
+
+
+class AmllLogGenerator:
+    """
+    按速率向 path 追加合成日志
+    - track_ratio / session_ratio：曲目行、会话切换行在所有行中的比例，其余为无关行
+    - unique_titles：歌名后附递增编号，回放时可以按歌名对上写入时刻
+    - rotate_bytes：文件超过该大小时改名为 path.1（覆盖上一份）并新建；0 不轮转
+    - truncate_every：每写这么多行原地截断一次（模拟 AMLL 重启清空日志）；0 不截断
+    - on_track(artist, title, written)：曲目行写入并 flush 后回调，written 为 time.monotonic()
+    """
+
+    def __init__(self, path: str, rate: float = 1000.0, track_ratio: float = 0.02,
+                 session_ratio: float = 0.005, unique_titles: bool = True,
+                 rotate_bytes: int = 0, truncate_every: int = 0, seed: int = 42,
+                 on_track: Optional[Callable[[str, str, float], None]] = None):
+        self.path = path
+        self.rate = rate
+        self.track_ratio = track_ratio
+        self.session_ratio = session_ratio
+        self.unique_titles = unique_titles
+        self.rotate_bytes = rotate_bytes
+        self.truncate_every = truncate_every
+        self.on_track = on_track
+        self._rnd = random.Random(seed)
+        self._in_amll = False
+        self._file = None
+
+        self.lines = 0
+        self.tracks = 0
+        self.bytes = 0
+        self.rotations = 0
+        self.truncations = 0
+
+    # -------------- 行内容 --------------
+    def _next_body(self) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """返回 (行内容, 曲目)；曲目行的第二项为 (歌手, 歌名)，其余为 None"""
+        rnd = self._rnd
+        roll = rnd.random()
+        if roll < self.track_ratio:
+            if not self._in_amll:
+                # 曲目只在 AMLL 会话里出现，先切回来
+                self._in_amll = True
+                return SESSION_ENTER, None
+            artist, title = rnd.choice(ARTISTS), rnd.choice(TITLES)
+            if self.unique_titles:
+                title = f"{title} #{self.tracks + 1}"
+            return track_body(artist, title), (artist, title)
+        if roll < self.track_ratio + self.session_ratio:
+            self._in_amll = not self._in_amll
+            if self._in_amll:
+                return SESSION_ENTER, None
+            return session_leave_body(rnd.choice(OTHER_PLAYERS)), None
+        return rnd.choice(NOISE), None
+
+    # -------------- 文件 --------------
+    def _open(self, mode: str = "a"):
+        self._file = open(self.path, mode, encoding="utf-8", newline="\n")
+
+    def _rotate(self):
+        self._file.close()
+        os.replace(self.path, self.path + ".1")
+        self._open("w")
+        self.rotations += 1
+
+    def _truncate(self):
+        self._file.truncate(0)
+        self._file.seek(0)
+        self.truncations += 1
+
+    def write_burst(self, count: int):
+        """写 count 行后 flush；曲目回调在 flush 之后，时间即对读者可见的时刻"""
+        f = self._file
+        now = stamp(datetime.now(timezone.utc))
+        tracks = []
+        for _ in range(count):
+            body, track = self._next_body()
+            line = f"{now}  {body}\n"
+            f.write(line)
+            self.lines += 1
+            self.bytes += len(line.encode("utf-8"))
+            if track is not None:
+                self.tracks += 1
+                tracks.append(track)
+            if self.truncate_every and self.lines % self.truncate_every == 0:
+                f.flush()
+                self._truncate()
+        f.flush()
+        written = time.monotonic()
+        if self.on_track is not None:
+            for artist, title in tracks:
+                self.on_track(artist, title, written)
+        if self.rotate_bytes and f.tell() >= self.rotate_bytes:
+            self._rotate()
+
+    def run(self, duration: float = 0.0, total_lines: int = 0, tick: float = 0.01):
+        """
+        持续写入，直到写满 duration 秒或 total_lines 行（两者都给时先到者为准）
+        rate <= 0 时不限速，每次写一个 1000 行的批次
+        """
+        self._open()
+        started = time.monotonic()
+        try:
+            while True:
+                elapsed = time.monotonic() - started
+                if duration and elapsed >= duration:
+                    break
+                if total_lines and self.lines >= total_lines:
+                    break
+                if self.rate > 0:
+                    due = int(elapsed * self.rate) + 1 - self.lines
+                else:
+                    due = 1000
+                if total_lines:
+                    due = min(due, total_lines - self.lines)
+                if due > 0:
+                    self.write_burst(due)
+                if self.rate > 0:
+                    time.sleep(tick)
+        finally:
+            self._file.close()
+            self._file = None
+        return time.monotonic() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成 AMLL Player 日志")
+    parser.add_argument("path", help="日志文件（追加写入）")
+    parser.add_argument("--rate", type=float, default=1000.0, help="每秒行数；0 表示不限速")
+    parser.add_argument("--duration", type=float, default=0.0, help="写入时长（秒）")
+    parser.add_argument("--lines", type=int, default=0, help="写入行数")
+    parser.add_argument("--track-ratio", type=float, default=0.02, help="曲目行比例")
+    parser.add_argument("--session-ratio", type=float, default=0.005, help="会话切换行比例")
+    parser.add_argument("--rotate-mb", type=float, default=0.0, help="超过该大小轮转为 .1")
+    parser.add_argument("--truncate-every", type=int, default=0, help="每写这么多行原地截断一次")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", help="把每个曲目行的写入时刻（monotonic 秒）与歌名写入该文件（TSV）")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.lines:
+        parser.error("需要 --duration 或 --lines")
+
+    manifest = open(args.manifest, "w", encoding="utf-8") if args.manifest else None
+
+    def on_track(artist, title, written):
+        manifest.write(f"{written:.6f}\t{artist}\t{title}\n")
+
+    generator = AmllLogGenerator(
+        args.path, args.rate, args.track_ratio, args.session_ratio,
+        rotate_bytes=int(args.rotate_mb * 1024 * 1024), truncate_every=args.truncate_every,
+        seed=args.seed, on_track=on_track if manifest else None)
+    try:
+        elapsed = generator.run(args.duration, args.lines)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    print(f"✍️ 写入 {generator.lines:,} 行（{generator.tracks:,} 首曲目，{generator.bytes / 1024 / 1024:.1f} MB），"
+          f"用时 {elapsed:.1f} 秒；轮转 {generator.rotations} 次，截断 {generator.truncations} 次",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,126 +1,133 @@
-import re
-import time
-import os
 import threading
 from typing import Callable, Optional
 
+from checkpoint import LogCheckpoint
+from log_parser import classify_line
+from log_reader import DEFAULT_CHUNK_SIZE
+from log_source import LogSource, start_observer
+
+
 class AMLLLogMonitor:
-    """AMLL 日志监控器 - 改进版"""
+    """AMLL 日志监控器 - 改进版（单个日志，读取、解析与断点由 LogSource 完成）"""
     
-    def __init__(self, log_path: str):
+    def __init__(self, log_path: str, backend: str = "auto",
+                 poll_interval: float = 0.5, fallback_interval: float = 2.0,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 checkpoint: Optional[LogCheckpoint] = None, backlog_batch_size: int = 500,
+                 metrics=None, echo: Callable[[str], None] = print):
         self.log_path = log_path
-        self.last_position = 0
         self.is_monitoring = False
-        self.callback = None
-        self.current_session = None
         self.monitor_thread = None
+        self.max_errors = 5
+
+        # 监控后端："auto" / "watchdog" / "polling"
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.fallback_interval = fallback_interval
+        self._observer = None
+        self._wakeup = threading.Event()
+
+        # 可选的 MonitorMetrics：开启时逐行计数、计时，关闭时直接调用原分类函数
+        self.metrics = metrics
+
+        # 监控线程里的状态消息经 echo 输出；交给控制台渲染器时只入队，慢终端不会拖住监控
+        self.echo = echo
+
+        # 持有日志句柄的流式读取器、会话状态、续读断点与积压补录
+        self.source = LogSource(
+            log_path, chunk_size=chunk_size, checkpoint=checkpoint,
+            backlog_batch_size=backlog_batch_size,
+            classify=classify_line if metrics is None else metrics.timed_classify(classify_line),
+            metrics=metrics, echo=echo
+        )
+
+    @property
+    def current_session(self) -> Optional[str]:
+        return self.source.session
+
+    @property
+    def catching_up(self) -> bool:
+        return self.source.catching_up
+
+    @property
+    def last_position(self) -> int:
+        """已处理到的字节偏移"""
+        return self.source.offset
         
-    def start_monitoring(self, callback: Callable):
-        """开始监控"""
-        self.callback = callback
+    def start_monitoring(self, callback: Callable, batch_callback: Optional[Callable] = None,
+                         session_callback: Optional[Callable] = None):
+        """
+        开始监控
+        callback(artist, title)：实时检测到的曲目
+        batch_callback([(artist, title, played_at), ...])：从断点补录的积压曲目；未提供时逐条走 callback
+        session_callback(kind, at)：AMLL 会话切换，kind 为 "enter" / "leave"；补录时 at 为日志行时间，实时为 None
+        """
+        source = self.source
+        source.on_track = callback
+        source.on_backlog = batch_callback
+        source.on_session = session_callback
         
-        if not os.path.exists(self.log_path):
-            print(f"❌ 错误: 找不到日志文件 {self.log_path}")
+        # 初始化文件位置 - 有断点则从断点续读，否则从文件末尾开始监控
+        if not source.open():
+            self.echo(f"❌ 错误: 找不到日志文件 {self.log_path}")
             return False
-        
-        # 初始化文件位置 - 从文件末尾开始监控
-        self.last_position = os.path.getsize(self.log_path)
         self.is_monitoring = True
+        self._wakeup.clear()
+        self._observer = start_observer(self.backend, {self.log_path: self.log_path},
+                                        lambda _: self._wakeup.set(), self.echo)
         
         # 在单独线程中运行监控
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, name="amll-monitor", daemon=True)
         self.monitor_thread.start()
         
-        print(f"🎵 开始实时监控 AMLL Player 日志...")
+        self.echo(f"🎵 开始实时监控 AMLL Player 日志...")
         return True
+
+    # -------------- 监控后端 --------------
+    def _stop_backend(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+
+    @property
+    def active_backend(self) -> str:
+        return "watchdog" if self._observer is not None else "polling"
+
+    def _wait_for_change(self):
+        """等待下一次检查：通知后端靠事件唤醒，轮询后端定时醒来"""
+        timeout = self.fallback_interval if self._observer is not None else self.poll_interval
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
     
     def _monitor_loop(self):
-        """实时监控循环"""
-        consecutive_errors = 0
-        max_errors = 5
-        
+        """实时监控循环：补录积压、检查更新，连续出错过多时停止监控"""
+        source = self.source
         while self.is_monitoring:
-            try:
-                self._check_log_updates()
-                consecutive_errors = 0  # 重置错误计数
-                time.sleep(0.5)  # 更频繁的检查（0.5秒）
-                
-            except Exception as e:
-                consecutive_errors += 1
-                if consecutive_errors >= max_errors:
-                    print(f"❌ 监控错误过多，停止监控: {e}")
-                    break
-                print(f"⚠️ 监控错误 ({consecutive_errors}/{max_errors}): {e}")
-                time.sleep(2)
-    
-    def _check_log_updates(self):
-        """检查日志更新 - 改进版"""
-        if not os.path.exists(self.log_path):
-            return
-        
-        try:
-            current_size = os.path.getsize(self.log_path)
-            
-            # 处理文件被重置的情况（比如程序重启）
-            if current_size < self.last_position:
-                print("📄 检测到日志文件重置，重新开始监控...")
-                self.last_position = 0
-            
-            # 如果有新内容
-            if current_size > self.last_position:
-                with open(self.log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    f.seek(self.last_position)
-                    new_content = f.read()
-                    self.last_position = f.tell()
-                
-                if new_content.strip():
-                    self._process_log_content(new_content)
-                    
-        except PermissionError:
-            print("⚠️ 无法访问日志文件，可能被其他进程占用")
-            time.sleep(1)
-        except Exception as e:
-            print(f"❌ 读取日志文件错误: {e}")
-            raise
+            source.poll(self.max_errors)
+            if source.disabled:
+                self.is_monitoring = False
+                break
+            self._wait_for_change()
     
-    def _process_log_content(self, content: str):
-        """处理日志内容 - 改进版"""
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # 1. 首先检测会话切换
-            session_to_amll = re.search(r'会话切换:[^"]*"-> "net\.stevexmh\.amllplayer"', line)
-            if session_to_amll:
-                self.current_session = "amll"
-                print("🔊 AMLL Player 变为活动状态")
-                continue
-            
-            session_from_amll = re.search(r'会话切换: "net\.stevexmh\.amllplayer" -> "([^"]+)"', line)
-            if session_from_amll:
-                other_app = session_from_amll.group(1)
-                self.current_session = None
-                print(f"🔇 AMLL Player 暂停，切换到: {other_app}")
-                continue
-            
-            # 2. 检测 AMLL Player 的音乐信息（无论会话状态）
-            music_match = re.search(r"\[SmtcRunner\] 新曲目信息: '([^']*)' - '([^']*)'", line)
-            if music_match:
-                artist = music_match.group(1).strip()
-                title = music_match.group(2).strip()
-                
-                # 只在 AMLL Player 会话中处理，或者如果artist/title有效
-                if self.current_session == "amll" or (artist and title and artist != "未知歌手" and title != "未知歌曲"):
-                    print(f"🎵 检测到音乐信息: '{artist}' - '{title}'")
-                    if self.callback:
-                        self.callback(artist, title)
-    
-    def stop_monitoring(self):
-        """停止监控"""
+    def stop_monitoring(self, drain: Optional[Callable[[], None]] = None, timeout: float = 5.0) -> bool:
+        """
+        停止监控
+        drain：监控线程退出后、写最终断点前调用（例如关闭记录器、写完后台队列），
+        断点因此不会越过还没落盘的播放，此时被杀掉重启也只会重放而不会丢失
+        监控线程在 timeout 秒内没有退出（例如卡在回调里）时不调用 drain、不写最终断点，返回 False
+        """
         self.is_monitoring = False
+        self.source.stopping = True
+        self._wakeup.set()
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            self.monitor_thread.join(timeout)
+        self._stop_backend()
         if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=2)
-        print("🛑 AMLL Player 监控已停止")
\ No newline at end of file
+            self.echo(f"⚠️ 监控线程未在 {timeout:g} 秒内退出，跳过最终断点，下次启动从上一个断点续读")
+            return False
+        if drain is not None:
+            drain()
+        self.source.close()
+        self.echo("🛑 AMLL Player 监控已停止")
+        return True
@@ -0,0 +1,98 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+# 预编译的匹配规则（与 AMLLLogMonitor 原有的三条正则一致）
+_SESSION_TO_AMLL_RE = re.compile(r'会话切换:[^"]*"-> "net\.stevexmh\.amllplayer"')
+_SESSION_FROM_AMLL_RE = re.compile(r'会话切换: "net\.stevexmh\.amllplayer" -> "([^"]+)"')
+_TRACK_INFO_RE = re.compile(r"\[SmtcRunner\] 新曲目信息: '([^']*)' - '([^']*)'")
+
+# 子串预筛：绝大多数日志行两个关键字都不含，直接跳过正则
+_SESSION_MARK = "会话切换"
+_TRACK_MARK = "新曲目信息"
+# 批量扫描时可直接在 UTF-8 字节块上查找这些关键字，只解码命中的行
+LINE_MARKS = (_SESSION_MARK, _TRACK_MARK)
+
+# 行首时间戳：兼容 "2025-10-24T11:00:13.002Z"、"2025-10-24 19:00:13" 与 "[2025-10-24][19:00:13]"
+_LINE_TIME_RE = re.compile(
+    r"\[?(\d{4})-(\d{2})-(\d{2})(?:[T ]|\]\[)(\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,6})\d*)?"
+    r"(Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+class SessionEnter(NamedTuple):
+    """AMLL Player 变为活动会话"""
+
+
+class SessionLeave(NamedTuple):
+    """AMLL Player 会话切换到其他应用"""
+    target: str
+
+
+class TrackInfo(NamedTuple):
+    """SmtcRunner 上报的新曲目信息（已去除首尾空白）"""
+    artist: str
+    title: str
+
+
+LogEvent = Union[SessionEnter, SessionLeave, TrackInfo]
+
+_SESSION_ENTER = SessionEnter()
+
+
+def classify_line(line: str) -> Optional[LogEvent]:
+    """
+    单行分类：先做子串预筛，命中后才跑对应的预编译正则
+    优先级与旧实现相同：会话切换 > 新曲目信息；不相关的行返回 None
+    """
+    if _SESSION_MARK in line:
+        if _SESSION_TO_AMLL_RE.search(line):
+            return _SESSION_ENTER
+        m = _SESSION_FROM_AMLL_RE.search(line)
+        if m:
+            return SessionLeave(m.group(1))
+
+    if _TRACK_MARK in line:
+        m = _TRACK_INFO_RE.search(line)
+        if m:
+            return TrackInfo(m.group(1).strip(), m.group(2).strip())
+
+    return None
+
+
+def is_player_track(session: Optional[str], artist: str, title: str) -> bool:
+    """是否记录该曲目：处于 AMLL Player 会话中，或歌手 / 歌曲都是有效值"""
+    return session == "amll" or bool(artist and title and artist != "未知歌手" and title != "未知歌曲")
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[LogEvent]:
+    """批量分类：只产出有意义的事件"""
+    for line in lines:
+        event = classify_line(line)
+        if event is not None:
+            yield event
+
+
+def parse_line_time(line: str) -> Optional[datetime]:
+    """
+    解析日志行首的时间戳，返回本地时间（naive datetime）
+    带时区（Z / +08:00）的时间会换算成本地时间；解析不到返回 None
+    """
+    m = _LINE_TIME_RE.match(line)
+    if not m:
+        return None
+    year, month, day, hour, minute, second, frac, tz = m.groups()
+    try:
+        value = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                         int(frac.ljust(6, "0")) if frac else 0)
+    except ValueError:
+        return None
+    if tz:
+        if tz == "Z":
+            offset = timedelta(0)
+        else:
+            sign = -1 if tz[0] == "-" else 1
+            digits = tz[1:].replace(":", "")
+            offset = sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        value = value.replace(tzinfo=timezone(offset)).astimezone().replace(tzinfo=None)
+    return value
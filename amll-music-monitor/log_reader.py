@@ -0,0 +1,120 @@
+import os
+from typing import Callable, Iterator, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# 单行上限：超过后强制切分，防止没有换行的异常内容让缓冲区无限增长
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def open_shared(path: str):
+    """
+    以二进制、共享方式打开日志文件
+    Windows 默认的 open() 不带 FILE_SHARE_DELETE，长期持有句柄会阻止 AMLL 轮转日志
+    """
+    if os.name != "nt":
+        return open(path, 'rb')
+
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    GENERIC_READ = 0x80000000
+    FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004  # READ | WRITE | DELETE
+    OPEN_EXISTING = 3
+    INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+    create_file = ctypes.windll.kernel32.CreateFileW
+    create_file.restype = wintypes.HANDLE
+    handle = create_file(path, GENERIC_READ, FILE_SHARE_ALL, None, OPEN_EXISTING, 0, None)
+    if handle == INVALID_HANDLE_VALUE:
+        raise ctypes.WinError()
+    fd = msvcrt.open_osfhandle(handle, os.O_RDONLY)
+    return open(fd, 'rb')
+
+
+class LogTailReader:
+    """
+    按字节偏移流式读取日志
+    - 以固定大小的块读取，内存占用与积压量无关
+    - 未写完的行留到下一次读取，只对完整的行做 UTF-8 解码
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offset = 0        # 已完整消费的字节偏移（最后一个换行之后）
+        self.file_id = None    # (st_dev, st_ino)
+        self._file = None
+        self._tail = b""
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    @property
+    def read_position(self) -> int:
+        """已从文件读出的字节位置（含尚未成行的尾巴）"""
+        return self.offset + len(self._tail)
+
+    def open(self, offset: Optional[int] = None):
+        """打开（或重新打开）日志；offset 为 None 表示从文件末尾开始"""
+        self.close()
+        self._file = open_shared(self.path)
+        st = os.fstat(self._file.fileno())
+        self.file_id = (st.st_dev, st.st_ino)
+        if offset is None:
+            offset = st.st_size
+        self.seek(offset)
+
+    def seek(self, offset: int):
+        """跳到指定字节偏移，丢弃未成行的尾巴（用于截断后从头读）"""
+        self._file.seek(offset)
+        self.offset = offset
+        self._tail = b""
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self.file_id = None
+        self._tail = b""
+
+    def read_lines(self, stop: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[str, int]]:
+        """
+        读取新增的完整行，逐行产出 (解码后的行, 该行结束处的字节偏移)
+        末尾没有换行的部分保留在缓冲区，等下次读取补全
+        offset 在消费方处理完一行、取下一行时才前进；消费方中途抛出时停在出错的那一行之前，
+        下次读取从该行重读，块里剩下的行不会丢
+        stop() 为真时在块边界停下：已产出的行都已处理完，offset 仍指向最后一个完整行之后
+        """
+        if self._file.tell() != self.read_position:
+            # 上一次读取被消费方异常打断：文件位置已越过未处理的行，回到 offset 重读
+            self.seek(self.offset)
+        read = self._file.read
+        chunk_size = self.chunk_size
+        while stop is None or not stop():
+            chunk = read(chunk_size)
+            if not chunk:
+                break
+
+            parts = (self._tail + chunk).split(b"\n")
+            self._tail = parts.pop()
+            offset = self.offset
+            for raw in parts:
+                end = offset + len(raw) + 1
+                yield raw.decode('utf-8', errors='replace').rstrip('\r'), end
+                self.offset = offset = end
+
+            if len(self._tail) > MAX_LINE_BYTES:
+                yield from self.flush_tail()
+
+    def flush_tail(self) -> Iterator[Tuple[str, int]]:
+        """把缓冲区里没有换行结尾的内容当作一行交出（文件轮转、超长行时使用）"""
+        if self._tail:
+            end = self.offset + len(self._tail)
+            yield self._tail.decode('utf-8', errors='replace').rstrip('\r'), end
+            self._tail = b""
+            self.offset = end
@@ -0,0 +1,300 @@
+import os
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from checkpoint import LogCheckpoint
+from log_parser import classify_line, is_player_track, parse_line_time, SessionEnter, SessionLeave
+from log_reader import LogTailReader, DEFAULT_CHUNK_SIZE
+
+
+def _load_observer():
+    """按需导入 watchdog（可选依赖，导入较慢），缺失时返回 None 退回轮询"""
+    try:
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+    return Observer
+
+
+class _PathEventHandler:
+    """
+    watchdog 事件处理器：按路径找到被监视的日志，以其键回调 on_change
+    Observer 只调用 dispatch()，因此无需继承 FileSystemEventHandler，模块加载时不必导入 watchdog
+    """
+
+    def __init__(self, targets: Dict[str, str], on_change: Callable[[str], None]):
+        self._targets = targets
+        self._on_change = on_change
+
+    def dispatch(self, event):
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path:
+                key = self._targets.get(os.path.normcase(os.path.abspath(path)))
+                if key is not None:
+                    self._on_change(key)
+
+
+def start_observer(backend: str, paths: Dict[str, str], on_change: Callable[[str], None],
+                   echo: Callable[[str], None] = print):
+    """
+    按配置为 {键: 日志路径} 启动一个 watchdog Observer，同一目录只注册一次
+    返回 Observer；"polling"、未安装 watchdog 或启动失败时返回 None，由调用方轮询
+    """
+    if backend == "polling" or not paths:
+        return None
+
+    Observer = _load_observer()
+    if Observer is None:
+        if backend == "watchdog":
+            echo("⚠️ 未安装 watchdog，退回轮询模式")
+        return None
+
+    targets, dirs = {}, set()
+    for key, path in paths.items():
+        abspath = os.path.abspath(path)
+        targets[os.path.normcase(abspath)] = key
+        dirs.add(os.path.dirname(abspath))
+    try:
+        observer = Observer()
+        handler = _PathEventHandler(targets, on_change)
+        for directory in sorted(dirs):
+            observer.schedule(handler, directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+    except Exception as e:
+        echo(f"⚠️ 文件系统通知启动失败，退回轮询模式: {e}")
+        return None
+    return observer
+
+
+class LogSource:
+    """
+    单个 AMLL 日志来源：读取句柄、偏移、会话状态、断点与积压补录
+    AMLLLogMonitor 持有一个，MultiLogMonitor 在一个线程里轮流驱动多个
+    - poll()：有待补录的积压时先补录，否则按文件标识识别轮转、按大小识别截断并读出新增的完整行
+    - 补录期间曲目按批交给 on_backlog，会话切换前先交付之前的积压，保持事件先后顺序
+    - 持有者停止监控时置 stopping：补录和读取在下一个块边界停下，不再拖住停止
+    回调 on_track(artist, title) / on_backlog([(artist, title, played_at)]) / on_session(kind, at)
+    由持有者设置；name 非空时状态消息带上 [来源名]
+    """
+
+    def __init__(self, path: str, name: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 checkpoint: Optional[LogCheckpoint] = None, backlog_batch_size: int = 500,
+                 classify: Callable = classify_line, metrics=None,
+                 echo: Callable[[str], None] = print, verbose: bool = True):
+        self.path = path
+        self.name = name
+        self.label = f"[{name}] " if name else ""
+        self.reader = LogTailReader(path, chunk_size)
+        self.checkpoint = checkpoint
+        self.backlog_batch_size = backlog_batch_size
+        self.classify = classify
+        self.metrics = metrics
+        self.echo = echo
+        self.verbose = verbose
+
+        self.on_track: Optional[Callable] = None
+        self.on_backlog: Optional[Callable] = None
+        self.on_session: Optional[Callable] = None
+
+        self.session = None
+        self.last_line = None
+        self.resume_pending = False
+        self.stopping = False
+        self.catching_up = False
+        self.backlog = []
+        self.backlog_delivered = 0
+        self.errors = 0
+        self.disabled = False
+
+    # -------------- 打开 / 关闭 --------------
+    def open(self) -> bool:
+        """打开日志：有有效断点时从断点续读（第一次 poll 先补录积压），否则从末尾开始；找不到日志返回 False"""
+        if not os.path.exists(self.path):
+            return False
+        resume_offset = None
+        if self.checkpoint is not None:
+            resume_offset, self.session = self.checkpoint.resolve_offset(self.path)
+        self.reader.open(resume_offset)
+        self.resume_pending = resume_offset is not None
+        self.stopping = False
+        return True
+
+    def close(self):
+        """写出最终断点并关闭句柄"""
+        self.save_checkpoint()
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+        self.reader.close()
+
+    def save_checkpoint(self):
+        if self.checkpoint is not None and self.reader.is_open:
+            self.checkpoint.update(self.reader.offset, self.reader.file_id, self.last_line, self.session)
+
+    @property
+    def offset(self) -> int:
+        """已处理到的字节偏移"""
+        return self.reader.offset
+
+    # -------------- 检查 --------------
+    def poll(self, max_errors: int = 5):
+        """
+        检查一次；出错只记在本来源上（下一次 poll 重试），连续失败 max_errors 次后停用
+        补录与常规检查走同一套错误处理，读取失败或回调异常不会让监控线程退出
+        """
+        if self.stopping:
+            return
+        try:
+            if self.resume_pending:
+                self.catch_up()
+                self.resume_pending = False
+            else:
+                self.check()
+            self.errors = 0
+        except PermissionError:
+            self.echo(f"⚠️ {self.label}无法访问日志文件，可能被其他进程占用")
+        except Exception as e:
+            self.errors += 1
+            if self.errors >= max_errors:
+                self.echo(f"❌ {self.label}监控错误过多，停止监控该日志: {e}")
+                self.disabled = True
+                self.close()
+                return
+            self.echo(f"⚠️ {self.label}监控错误 ({self.errors}/{max_errors}): {e}")
+
+    def check(self):
+        """读出新增内容；文件标识变化视为轮转，文件变小视为截断"""
+        reader = self.reader
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 日志已被移走、新文件尚未创建：先读完旧句柄里剩下的内容
+            if reader.is_open:
+                self.read_new_content()
+            return
+
+        if not reader.is_open:
+            reader.open(0)
+        elif (st.st_dev, st.st_ino) != reader.file_id:
+            # 文件标识变化 = 日志轮转：读完旧文件（含最后半行）后切换到新文件
+            self.read_new_content(final=True)
+            self.echo(f"📄 {self.label}检测到日志文件轮转，切换到新文件...")
+            reader.open(0)
+        elif st.st_size < reader.read_position:
+            # 处理文件被截断的情况（比如程序重启）
+            self.echo(f"📄 {self.label}检测到日志文件重置，重新开始监控...")
+            reader.seek(0)
+
+        if st.st_size > reader.read_position:
+            self.read_new_content()
+
+    def catch_up(self):
+        """一次性补录断点之后的积压日志：批量交付、静默处理"""
+        try:
+            backlog_bytes = os.path.getsize(self.path) - self.reader.offset
+        except FileNotFoundError:
+            # 日志刚好被轮转走：交给常规检查读完旧句柄再切换
+            return
+        if backlog_bytes <= 0 and not self.backlog:
+            return
+
+        self.echo(f"⏩ {self.label}从断点续读，补录 {backlog_bytes / 1024:.1f} KB 积压日志...")
+        started = time.perf_counter()
+        self.catching_up = True
+        self.backlog_delivered = 0
+        try:
+            # 读取中途失败时已读出的积压留在 backlog，重试补录时一并交付
+            self.read_new_content()
+        finally:
+            self.catching_up = False
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+        if self.stopping:
+            # 停止时中断：已读出的积压已交付，剩余部分下次启动从断点继续补录
+            self.echo(f"⏸️ {self.label}补录在停止时中断，已补录 {self.backlog_delivered} 首曲目")
+            return
+        self.echo(f"✅ {self.label}补录完成: {self.backlog_delivered} 首曲目，"
+                  f"用时 {time.perf_counter() - started:.2f} 秒")
+
+    def read_new_content(self, final: bool = False):
+        """从持有的句柄流式读取新增的完整行；final 时把没有换行结尾的最后半行也交出"""
+        start = self.reader.offset
+        self.process_lines(line for line, _ in self.reader.read_lines(self._stop_requested))
+        if final and not self.stopping:
+            self.process_lines(line for line, _ in self.reader.flush_tail())
+        if self.metrics is not None:
+            self.metrics.bytes.inc(self.reader.offset - start)
+        if self.catching_up:
+            # 断点只在积压交付之后前进
+            self._deliver_backlog()
+        self.save_checkpoint()
+
+    def _stop_requested(self) -> bool:
+        return self.stopping
+
+    # -------------- 解析 --------------
+    def process_lines(self, lines: Iterable[str]):
+        classify = self.classify
+        line = done = None
+        for line in lines:
+            # 断点的校验行只跟到处理完的上一行：回调在这一行抛出时，
+            # 读取器的 offset 也停在这一行之前，下次从这一行重试
+            if done is not None:
+                self.last_line = done
+            done = line
+            event = classify(line)
+            if event is None:
+                continue
+
+            # 1. 会话切换
+            if isinstance(event, SessionEnter):
+                self.session = "amll"
+                if self.verbose and not self.catching_up:
+                    self.echo(f"🔊 {self.label}AMLL Player 变为活动状态")
+                self._notify_session("enter", line)
+                continue
+
+            if isinstance(event, SessionLeave):
+                self.session = None
+                if self.verbose and not self.catching_up:
+                    self.echo(f"🔇 {self.label}AMLL Player 暂停，切换到: {event.target}")
+                self._notify_session("leave", line)
+                continue
+
+            # 2. AMLL Player 的音乐信息：只在 AMLL 会话中，或歌手 / 歌名有效时处理
+            artist, title = event.artist, event.title
+            if not is_player_track(self.session, artist, title):
+                continue
+            if self.catching_up:
+                self.backlog.append((artist, title, parse_line_time(line)))
+                if len(self.backlog) >= self.backlog_batch_size:
+                    self._deliver_backlog()
+                continue
+            if self.verbose:
+                self.echo(f"🎵 {self.label}检测到音乐信息: '{artist}' - '{title}'")
+            if self.on_track:
+                self.on_track(artist, title)
+
+        if line is not None:
+            self.last_line = line
+
+    def _deliver_backlog(self):
+        batch, self.backlog = self.backlog, []
+        if not batch:
+            return
+        if self.on_backlog:
+            self.on_backlog(batch)
+        elif self.on_track:
+            for artist, title, _ in batch:
+                self.on_track(artist, title)
+        self.backlog_delivered += len(batch)
+
+    def _notify_session(self, kind: str, line: str):
+        """会话切换回调；补录时先交付之前积压的曲目，保持事件先后顺序"""
+        if not self.on_session:
+            return
+        if self.catching_up:
+            self._deliver_backlog()
+            self.on_session(kind, parse_line_time(line))
+        else:
+            self.on_session(kind, None)
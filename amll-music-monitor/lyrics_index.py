@@ -0,0 +1,378 @@
+import bisect
+import json
+import os
+import re
+import threading
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from atomic_io import atomic_write_json
+
+INDEX_VERSION = 1
+# 建索引时读取文件开头多少字节来找 [ar:] / [ti:] 或 TTML 元数据
+_META_BYTES = 4096
+# 歌手字段里常见的多人分隔符，按单个歌手再查一次
+_ARTIST_SPLIT_RE = re.compile(r"\s*(?:/|、|,|，|&|;|；| feat\. | ft\. )\s*", re.IGNORECASE)
+_NORMALIZE_DROP_RE = re.compile(r"[\s\W_]+")
+
+_LRC_TIME_RE = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+_LRC_TAG_RE = re.compile(r"^\[([a-zA-Z]+):(.*)\]\s*$")
+_LRC_WORD_TIME_RE = re.compile(r"<\d+:\d{1,2}(?:[.:]\d{1,3})?>")
+_LRC_META_RE = re.compile(r"^\[(ar|ti):([^\]]*)\]", re.MULTILINE | re.IGNORECASE)
+_TTML_META_RE = re.compile(r'<amll:meta\s+key="(musicName|artists)"\s+value="([^"]*)"')
+
+_TTML_NS = "{http://www.w3.org/ns/ttml}"
+_TTM_ROLE = "{http://www.w3.org/ns/ttml#metadata}role"
+
+
+def normalize(text: str) -> str:
+    """索引键：全角转半角、忽略大小写，去掉空白和标点"""
+    return _NORMALIZE_DROP_RE.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+class Lyrics(NamedTuple):
+    """
+    解析后的歌词
+    lines：[(毫秒, 文本), ...]，按时间排序；.txt 等无时间轴的歌词时间为 None
+    """
+    path: str
+    format: str
+    lines: List[Tuple[Optional[int], str]]
+
+    @property
+    def timed(self) -> bool:
+        return bool(self.lines) and self.lines[0][0] is not None
+
+    def line_at(self, position_ms: int) -> Optional[str]:
+        """播放进度对应的当前行"""
+        if not self.timed:
+            return None
+        i = bisect.bisect_right(self.lines, (position_ms, "\uffff")) - 1
+        return self.lines[i][1] if i >= 0 else None
+
+
+# -------------- 解析 --------------
+def parse_lrc(text: str) -> List[Tuple[Optional[int], str]]:
+    """LRC：支持一行多个时间标签、[offset:] 与逐字时间（<mm:ss.xx> 会被去掉）"""
+    offset = 0
+    lines = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        tag = _LRC_TAG_RE.match(raw)
+        if tag and not tag.group(1).isdigit():
+            if tag.group(1).lower() == "offset":
+                try:
+                    offset = int(tag.group(2).strip())
+                except ValueError:
+                    pass
+            continue
+        stamps = []
+        pos = 0
+        while True:
+            m = _LRC_TIME_RE.match(raw, pos)
+            if not m:
+                break
+            minutes, seconds, frac = m.groups()
+            ms = int(frac.ljust(3, "0")) if frac else 0
+            stamps.append((int(minutes) * 60 + int(seconds)) * 1000 + ms)
+            pos = m.end()
+        if not stamps:
+            continue
+        content = _LRC_WORD_TIME_RE.sub("", raw[pos:]).strip()
+        lines.extend((stamp, content) for stamp in stamps)
+    # offset 为正表示歌词提前
+    lines = [(max(0, stamp - offset), content) for stamp, content in lines]
+    lines.sort(key=lambda line: line[0])
+    return lines
+
+
+def _ttml_time(value: Optional[str]) -> Optional[int]:
+    """TTML 时间：hh:mm:ss.fff / mm:ss.fff / ss.fff、12.5s、1234ms"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if value.endswith("ms"):
+            return int(float(value[:-2]))
+        if value.endswith("s"):
+            return int(float(value[:-1]) * 1000)
+        seconds = 0.0
+        for part in value.split(":"):
+            seconds = seconds * 60 + float(part)
+        return int(round(seconds * 1000))
+    except ValueError:
+        return None
+
+
+def _ttml_text(element) -> str:
+    """<p> 的正文：拼接逐字 <span>，跳过翻译 / 音译 / 背景人声"""
+    parts = [element.text or ""]
+    for child in element:
+        if child.get(_TTM_ROLE) is None:
+            parts.append(_ttml_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def parse_ttml(text: str) -> List[Tuple[Optional[int], str]]:
+    """TTML（AMLL 逐字歌词格式）：每个 <p begin="..."> 一行"""
+    root = ET.fromstring(text)
+    lines = []
+    for p in root.iter(f"{_TTML_NS}p"):
+        content = " ".join(_ttml_text(p).split())
+        begin = _ttml_time(p.get("begin"))
+        if begin is None:
+            spans = [_ttml_time(s.get("begin")) for s in p.iter(f"{_TTML_NS}span")]
+            begin = min((t for t in spans if t is not None), default=0)
+        lines.append((begin, content))
+    lines.sort(key=lambda line: line[0])
+    return lines
+
+
+def parse_txt(text: str) -> List[Tuple[Optional[int], str]]:
+    return [(None, line.strip()) for line in text.splitlines() if line.strip()]
+
+
+_PARSERS = {".lrc": parse_lrc, ".ttml": parse_ttml, ".txt": parse_txt}
+
+
+def load_lyrics(path: str) -> Lyrics:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        text = f.read()
+    return Lyrics(path, ext.lstrip("."), _PARSERS.get(ext, parse_txt)(text))
+
+
+def read_meta(path: str, name: str) -> Tuple[str, str]:
+    """
+    从文件推断 (歌手, 歌曲)
+    优先 LRC 的 [ar:] / [ti:] 与 TTML 的 amll:meta，其次文件名 "歌手 - 歌曲"，否则文件名即歌曲名
+    """
+    stem = os.path.splitext(name)[0]
+    artist, _, title = stem.partition(" - ")
+    if not title:
+        artist, title = "", stem
+    try:
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            head = f.read(_META_BYTES)
+    except OSError:
+        return artist.strip(), title.strip()
+    tags = {}
+    for key, value in _LRC_META_RE.findall(head) + _TTML_META_RE.findall(head):
+        key = key.lower()
+        key = {"musicname": "ti", "artists": "ar"}.get(key, key)
+        tags.setdefault(key, value.strip())
+    return tags.get("ar") or artist.strip(), tags.get("ti") or title.strip()
+
+
+class LyricsIndex:
+    """
+    歌词目录索引
+    - 以规范化后的 (歌手, 歌曲) 为键；另有只按歌曲名的兜底
+    - 索引持久化到 index_file；refresh() 只对 mtime 变化的目录重新列举，未变化的目录只 stat 其中的歌词文件
+    - 解析结果放在 LRU 缓存里，按文件 mtime / 大小校验；命中时一次查找只有字典访问加一次 stat
+    """
+
+    def __init__(self, lyrics_dir: str, index_file: Optional[str] = None,
+                 formats: Iterable[str] = (".lrc", ".ttml", ".txt"), cache_size: int = 64,
+                 echo: Callable[[str], None] = print):
+        self.root = os.path.abspath(lyrics_dir)
+        # 状态消息（含后台刷新线程的）经 echo 输出，可交给控制台渲染器或服务日志
+        self.echo = echo
+        self.index_file = index_file
+        self.formats = tuple(f.lower() for f in formats)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._dirs: Dict[str, Dict] = {}
+        self._entries: Dict[str, List] = {}      # 相对路径 -> [歌手, 歌曲, mtime_ns]
+        self._by_pair: Dict[Tuple[str, str], str] = {}
+        self._by_title: Dict[str, List[str]] = {}
+        self._cache: "OrderedDict[str, Tuple[int, int, Lyrics]]" = OrderedDict()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.hits = self.misses = 0
+        self._load()
+
+    # -------------- 持久化 --------------
+    def _load(self):
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != INDEX_VERSION or state.get("root") != self.root \
+                    or state.get("formats") != list(self.formats):
+                return
+            self._dirs = state["dirs"]
+            self._entries = state["entries"]
+        except Exception as e:
+            self.echo(f"读取歌词索引失败，将重新扫描: {e}")
+            self._dirs, self._entries = {}, {}
+            return
+        self._rebuild_lookup()
+
+    def _save(self):
+        if not self.index_file:
+            return
+        try:
+            atomic_write_json(self.index_file, {
+                "version": INDEX_VERSION, "root": self.root, "formats": list(self.formats),
+                "dirs": self._dirs, "entries": self._entries,
+            }, fsync=False, ensure_ascii=False)
+        except Exception as e:
+            self.echo(f"保存歌词索引失败: {e}")
+
+    # -------------- 增量刷新 --------------
+    def refresh(self) -> bool:
+        """按目录与文件的 mtime 增量更新索引，返回索引是否有变化"""
+        dirs, entries = {}, {}
+        changed = False
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            full = os.path.join(self.root, rel)
+            try:
+                mtime = os.stat(full).st_mtime_ns
+            except OSError:
+                continue
+            info = self._dirs.get(rel)
+            if info is None or info["mtime"] != mtime:
+                info = self._scan_dir(rel, full, mtime, entries)
+                changed = True
+            else:
+                # 改写已有文件不会改变目录 mtime，逐个 stat 文件，只重新读取变化的
+                for name in info["files"]:
+                    path = os.path.join(rel, name)
+                    try:
+                        file_mtime = os.stat(os.path.join(full, name)).st_mtime_ns
+                    except OSError:
+                        changed = True
+                        continue
+                    old = self._entries.get(path)
+                    if old is not None and old[2] == file_mtime:
+                        entries[path] = old
+                    else:
+                        entries[path] = [*read_meta(os.path.join(full, name), name), file_mtime]
+                        changed = True
+            dirs[rel] = info
+            stack.extend(os.path.join(rel, name) for name in info["subdirs"])
+
+        if changed or dirs.keys() != self._dirs.keys():
+            with self._lock:
+                self._dirs, self._entries = dirs, entries
+                self._rebuild_lookup()
+            self._save()
+            return True
+        return False
+
+    def _scan_dir(self, rel: str, full: str, mtime: int, entries: Dict[str, List]) -> Dict:
+        subdirs, files = [], []
+        try:
+            with os.scandir(full) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in self.formats:
+                        files.append(entry.name)
+                        path = os.path.join(rel, entry.name)
+                        file_mtime = entry.stat().st_mtime_ns
+                        old = self._entries.get(path)
+                        if old is not None and old[2] == file_mtime:
+                            entries[path] = old
+                        else:
+                            entries[path] = [*read_meta(entry.path, entry.name), file_mtime]
+        except OSError as e:
+            self.echo(f"⚠️ 无法读取歌词目录 {full}: {e}")
+        return {"mtime": mtime, "subdirs": sorted(subdirs), "files": sorted(files)}
+
+    def _rebuild_lookup(self):
+        by_pair, by_title = {}, {}
+        # 同一首有多个文件时按 formats 的顺序优先
+        rank = {ext: i for i, ext in enumerate(self.formats)}
+        ordered = sorted(self._entries.items(),
+                         key=lambda item: (rank.get(os.path.splitext(item[0])[1].lower(), len(rank)), item[0]))
+        for path, (artist, title, _) in ordered:
+            title_key = normalize(title)
+            if not title_key:
+                continue
+            by_pair.setdefault((normalize(artist), title_key), path)
+            by_title.setdefault(title_key, []).append(path)
+        self._by_pair, self._by_title = by_pair, by_title
+
+    def watch(self, interval: float = 30.0):
+        """后台线程定期刷新（只 stat 目录和歌词文件），查找路径上永远不扫描目录"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.echo(f"刷新歌词索引失败: {e}")
+
+        self._watcher = threading.Thread(target=run, name="lyrics-index", daemon=True)
+        self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=2)
+            self._watcher = None
+
+    # -------------- 查找 --------------
+    def __len__(self):
+        return len(self._entries)
+
+    def find(self, artist: str, title: str) -> Optional[str]:
+        """返回歌词文件的绝对路径；先按 (歌手, 歌曲)，再按拆分后的单个歌手，最后按歌曲名唯一匹配"""
+        title_key = normalize(title)
+        if not title_key:
+            return None
+        by_pair, by_title = self._by_pair, self._by_title
+        path = by_pair.get((normalize(artist), title_key))
+        if path is None:
+            for part in _ARTIST_SPLIT_RE.split(artist):
+                path = by_pair.get((normalize(part), title_key))
+                if path is not None:
+                    break
+        if path is None:
+            # 只有歌曲名的文件（或全库只有一首同名歌）
+            path = by_pair.get(("", title_key))
+            candidates = by_title.get(title_key, ())
+            if path is None and len(candidates) == 1:
+                path = candidates[0]
+        return os.path.join(self.root, path) if path is not None else None
+
+    def get(self, artist: str, title: str) -> Optional[Lyrics]:
+        """查找并返回解析后的歌词；命中缓存时不读文件"""
+        path = self.find(artist, title)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return cached[2]
+        try:
+            lyrics = load_lyrics(path)
+        except Exception as e:
+            self.echo(f"解析歌词失败 {path}: {e}")
+            return None
+        with self._lock:
+            self.misses += 1
+            self._cache[path] = (st.st_mtime_ns, st.st_size, lyrics)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return lyrics
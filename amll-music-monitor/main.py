@@ -4,6 +4,7 @@ AMLL Player 音乐检测器 - 实时监控版
 """
 
 import os
+import signal
 import sys
 import time
 from datetime import datetime
@@ -13,53 +14,107 @@ from colorama import init, Fore, Back, Style
 init(autoreset=True)
 
 from log_monitor import AMLLLogMonitor
+from checkpoint import LogCheckpoint
 from music_tracker import MusicTracker
 from auto_refresh_monitor import AutoRefreshMonitor
+from event_bus import EventFileSink
+from console_renderer import create_renderer
 from config import Config
 
+# 运行指标（可选）：关闭时为 None，各模块不做任何计时
+monitor_metrics = None
+if Config.METRICS:
+    from metrics import MonitorMetrics
+    monitor_metrics = MonitorMetrics()
+
+# 控制台渲染器：运行中的显示与状态消息都由它的渲染线程输出，监控线程只入队
+console = create_renderer(Config.CONSOLE_MODE, Config.CONSOLE_FPS)
+
 # 创建全局实例
 music_tracker = MusicTracker(
     history_file=Config.HISTORY_FILE,
-    log_file=Config.PLAYBACK_LOG_FILE
+    log_file=Config.PLAYBACK_LOG_FILE,
+    history_backend=Config.HISTORY_BACKEND,
+    db_file=Config.SQLITE_DB_FILE,
+    write_behind=Config.WRITE_BEHIND,
+    flush_interval=Config.FLUSH_INTERVAL,
+    fsync_policy=Config.FSYNC_POLICY,
+    max_queue=Config.WRITE_QUEUE_SIZE,
+    live_stats=Config.STATS_SERVER,
+    history_buffer=Config.HISTORY_BUFFER_SIZE,
+    listening_file=Config.LISTENING_FILE,
+    max_dwell=Config.MAX_DWELL,
+    session_gap=Config.SESSION_GAP,
+    dedup_window=Config.DEDUP_WINDOW,
+    min_dwell=Config.MIN_DWELL,
+    metrics=monitor_metrics,
+    echo=console.message
 )
 
 class AMLLMusicDetector:
     """AMLL 音乐检测器 - 实时版"""
     
     def __init__(self):
-        self.monitor = AMLLLogMonitor(Config.LOG_PATH)
+        checkpoint = None
+        if Config.CHECKPOINT_FILE:
+            checkpoint = LogCheckpoint(Config.CHECKPOINT_FILE, Config.CHECKPOINT_INTERVAL, console.message)
+        self.monitor = AMLLLogMonitor(
+            Config.LOG_PATH,
+            backend=Config.MONITOR_BACKEND,
+            poll_interval=Config.POLL_INTERVAL,
+            fallback_interval=Config.WATCHDOG_FALLBACK_INTERVAL,
+            chunk_size=Config.READ_CHUNK_SIZE,
+            checkpoint=checkpoint,
+            metrics=monitor_metrics,
+            echo=console.message
+        )
         self.auto_refresh = AutoRefreshMonitor(music_tracker)
+        self.stats_server = None
+        self.now_playing_sink = None
+        self.metrics_dumper = None
+        self.lyrics = None
         self.is_running = False
     
     def on_music_detected(self, artist: str, title: str):
-        """音乐检测回调函数"""
-        if music_tracker.update_track(artist, title):
-            # 新曲目被检测到
-            self._display_music_info(artist, title, is_new=True)
+        """音乐检测回调函数：只更新记录，显示由订阅曲目变化事件的自动刷新负责"""
+        music_tracker.update_track(artist, title)
     
-    def _display_music_info(self, artist: str, title: str, is_new=False):
-        """显示音乐信息"""
-        current_time = datetime.now().strftime('%H:%M:%S')
-        
-        if is_new:
-            print(f"\n{Fore.GREEN}🎵 检测到新曲目! {Style.RESET_ALL}")
-        else:
-            print(f"\n{Fore.CYAN}🔄 更新显示 {Style.RESET_ALL}")
-        
-        print(f"{Fore.CYAN}┌{'─' * 50}┐")
-        print(f"{Fore.CYAN}│ {Fore.YELLOW}歌曲: {Fore.WHITE}{title:<42} {Fore.CYAN}│")
-        print(f"{Fore.CYAN}│ {Fore.YELLOW}艺术家: {Fore.WHITE}{artist:<40} {Fore.CYAN}│")
-        print(f"{Fore.CYAN}│ {Fore.YELLOW}时间: {Fore.WHITE}{current_time:<40} {Fore.CYAN}│")
-        print(f"{Fore.CYAN}└{'─' * 50}┘{Style.RESET_ALL}")
+    def on_backlog_detected(self, tracks):
+        """断点补录回调：批量写入，不逐首显示"""
+        with music_tracker.batch():
+            for artist, title, played_at in tracks:
+                music_tracker.update_track(artist, title, played_at)
+    
+    def on_session_changed(self, kind: str, at=None):
+        """AMLL 会话切换回调：用于计算实际收听时长"""
+        music_tracker.session_event(kind, at)
+        if at is None:
+            console.update(session=kind)
     
     def display_current_track(self, track_info):
-        """显示当前曲目（用于自动刷新）"""
+        """显示当前曲目（曲目变化事件触发）：只把状态交给渲染器，不在本线程输出"""
         if track_info:
             artist = track_info.get('artist', '未知艺术家')
             title = track_info.get('title', '未知标题')
-            self._display_music_info(artist, title, is_new=False)
+            timestamp = track_info.get('timestamp')
+            shown_at = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+            console.update(track={
+                'artist': artist,
+                'title': title,
+                'time': shown_at.strftime('%H:%M:%S'),
+                'play_count': track_info.get('play_count'),
+            }, lyrics=self._lyrics_summary(artist, title))
         else:
-            print(f"{Fore.YELLOW}⏳ 等待检测播放内容... {datetime.now().strftime('%H:%M:%S')}")
+            console.update(track=None, lyrics=None)
+    
+    def _lyrics_summary(self, artist: str, title: str):
+        """歌词匹配结果（索引与解析结果都在内存中，不扫描目录）；未启用歌词索引时为 None"""
+        if self.lyrics is None:
+            return None
+        lyrics = self.lyrics.get(artist, title)
+        if lyrics is None:
+            return "未找到歌词"
+        return f"{os.path.basename(lyrics.path)}（{lyrics.format.upper()}，{len(lyrics.lines)} 行）"
     
     def start_monitoring(self):
         """开始监控"""
@@ -80,22 +135,68 @@ class AMLLMusicDetector:
         self.is_running = True
         
         # 启动日志监控
-        if not self.monitor.start_monitoring(self.on_music_detected):
+        if not self.monitor.start_monitoring(self.on_music_detected, self.on_backlog_detected,
+                                             self.on_session_changed):
             return False
         
+        # 歌词索引（可选）：歌词目录存在时加载持久化索引并增量刷新
+        if Config.LYRICS_DIR and os.path.isdir(Config.LYRICS_DIR):
+            from lyrics_index import LyricsIndex
+            self.lyrics = LyricsIndex(Config.LYRICS_DIR, Config.LYRICS_INDEX_FILE,
+                                      Config.SUPPORTED_LYRICS_FORMATS, Config.LYRICS_CACHE_SIZE,
+                                      echo=console.message)
+            self.lyrics.refresh()
+            self.lyrics.watch(Config.LYRICS_REFRESH_INTERVAL)
+            print(f"{Fore.CYAN}📜 歌词索引: {len(self.lyrics)} 个文件")
+        
         # 启动自动刷新显示
         self.auto_refresh.start_auto_refresh(self.display_current_track)
         
+        # 当前曲目文件输出（可选）
+        if Config.NOW_PLAYING_FILE:
+            self.now_playing_sink = EventFileSink(music_tracker.events, Config.NOW_PLAYING_FILE)
+        
+        # 启动实时统计接口（可选）
+        if music_tracker.live_stats is not None:
+            from stats_server import StatsServer
+            self.stats_server = StatsServer(music_tracker.live_stats,
+                                            Config.STATS_SERVER_HOST, Config.STATS_SERVER_PORT,
+                                            event_bus=music_tracker.events,
+                                            metrics=monitor_metrics, echo=console.message,
+                                            allow_origin=Config.STATS_SERVER_ALLOW_ORIGIN)
+            if not self.stats_server.start():
+                self.stats_server = None
+        
+        # 运行指标定期写入 JSON（可选）
+        if monitor_metrics is not None and Config.METRICS_FILE:
+            from metrics import MetricsDumper
+            self.metrics_dumper = MetricsDumper(monitor_metrics, Config.METRICS_FILE,
+                                                Config.METRICS_INTERVAL, console.message)
+        
+        # 启动信息打印完后才开始渲染，之后的显示都由渲染线程负责
+        console.start()
+        
         return True
     
     def stop_monitoring(self):
         """停止监控"""
         self.is_running = False
-        self.monitor.stop_monitoring()
+        # 先让渲染器画完最后一帧并退出，后面的退出信息照常打印
+        console.close()
+        # 监控线程退出后先写完记录器，再写最终断点
+        self.monitor.stop_monitoring(drain=music_tracker.close)
         self.auto_refresh.stop_auto_refresh()
+        if self.stats_server is not None:
+            self.stats_server.stop()
+        if self.now_playing_sink is not None:
+            self.now_playing_sink.close()
+        if self.lyrics is not None:
+            self.lyrics.close()
         
         # 显示播放历史
         self._display_history()
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.close()
     
     def _display_history(self):
         """显示播放历史"""
@@ -112,13 +213,19 @@ class AMLLMusicDetector:
         else:
             print(f"{Fore.YELLOW}📝 暂无播放历史")
     
+    def _on_terminate(self, signum, frame):
+        """SIGTERM（关机、任务管理器结束进程）与 Ctrl+C 一样正常退出，而不是直接被杀掉"""
+        raise KeyboardInterrupt
+    
     def run(self):
         """运行监控"""
+        signal.signal(signal.SIGTERM, self._on_terminate)
         try:
             if self.start_monitoring():
                 # 保持程序运行
                 while self.is_running:
                     time.sleep(1)
+                    music_tracker.confirm_pending()
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}🛑 接收到停止信号...")
             self.stop_monitoring()
@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from atomic_io import atomic_write_json
+
+# 直方图分桶（秒）：单行解析在微秒级，写盘 / 落盘延迟在毫秒到秒级
+PARSE_BUCKETS = (1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 1e-3)
+LATENCY_BUCKETS = (1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 逐行解析耗时的抽样间隔（行，2 的幂）
+PARSE_SAMPLE = 16
+
+# 按文件统计写入耗时
+WRITE_TARGETS = ("history", "playback_log", "counts")
+
+
+def _label_text(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    """单调递增计数；只能由一个线程更新（不加锁），读取可以在任意线程"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Histogram:
+    """
+    固定分桶直方图：observe() 一次 bisect（C 实现）加三次整数累加
+    各桶只记本桶的数量，导出时再累加成 Prometheus 要求的 le 累计值
+    只能由一个线程 observe()（不加锁）；多个线程共用时用 SharedHistogram
+    """
+
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def read(self) -> Tuple[List[int], int, float]:
+        """(各桶数量, 次数, 总和) 的副本，导出时使用"""
+        return list(self.buckets), self.count, self.sum
+
+    def quantile(self, q: float) -> float:
+        """按分桶估算分位数（取所在桶的上界），没有数据时为 0"""
+        buckets, count, _ = self.read()
+        return _quantile(self.bounds, buckets, count, q)
+
+
+class SharedHistogram(Histogram):
+    """
+    多个线程同时 observe() 的直方图（例如多来源时各写线程共用的写盘耗时）
+    observe() 与 read() 各加一次锁，只用在写盘这类毫秒级的路径上
+    """
+
+    __slots__ = ("_lock",)
+
+    def __init__(self, bounds: Sequence[float]):
+        super().__init__(bounds)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            Histogram.observe(self, value)
+
+    def read(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            return Histogram.read(self)
+
+
+def _quantile(bounds: Sequence[float], buckets: Sequence[int], count: int, q: float) -> float:
+    if not count:
+        return 0.0
+    rank, seen = q * count, 0
+    for bound, n in zip(bounds, buckets):
+        seen += n
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+
+class Registry:
+    """按名称登记指标，导出为 Prometheus 文本格式或 JSON 快照"""
+
+    def __init__(self):
+        # 名称 -> (类型, 说明, [(标签, 指标)])
+        self._families: Dict[str, Tuple[str, str, List[Tuple[Optional[Dict], object]]]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, kind: str, name: str, help_text: str, labels: Optional[Dict], metric):
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, []))
+            if family[0] != kind:
+                raise ValueError(f"指标 {name} 已登记为 {family[0]}")
+            family[2].append((labels, metric))
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict] = None) -> Counter:
+        return self._add("counter", name, help_text, labels, Counter())
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float],
+                  labels: Optional[Dict] = None, shared: bool = False) -> Histogram:
+        """shared：会被多个线程同时 observe() 时加锁"""
+        metric = SharedHistogram(bounds) if shared else Histogram(bounds)
+        return self._add("histogram", name, help_text, labels, metric)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float],
+              labels: Optional[Dict] = None):
+        """读取时才求值的瞬时值（队列深度等），热路径上没有任何开销"""
+        self._add("gauge", name, help_text, labels, read)
+
+    def _items(self):
+        with self._lock:
+            return [(name, kind, help_text, list(metrics))
+                    for name, (kind, help_text, metrics) in self._families.items()]
+
+    def render_prometheus(self) -> str:
+        out = []
+        for name, kind, help_text, metrics in self._items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind == "counter":
+                    out.append(f"{name}{_label_text(labels)} {metric.value}")
+                elif kind == "gauge":
+                    out.append(f"{name}{_label_text(labels)} {metric()}")
+                else:
+                    buckets, count, total = metric.read()
+                    cumulative = 0
+                    for bound, n in zip(metric.bounds + (float("inf"),), buckets):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        out.append(f"{name}_bucket{_label_text(dict(labels or {}, le=le))} {cumulative}")
+                    out.append(f"{name}_sum{_label_text(labels)} {total}")
+                    out.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(out) + "\n"
+
+    def snapshot(self) -> Dict:
+        """JSON 快照：计数与瞬时值直接给出，直方图给出次数、均值与 p50 / p99 估计"""
+        data = {}
+        for name, kind, _, metrics in self._items():
+            for labels, metric in metrics:
+                key = name + _label_text(labels)
+                if kind == "counter":
+                    data[key] = metric.value
+                elif kind == "gauge":
+                    data[key] = metric()
+                else:
+                    buckets, count, total = metric.read()
+                    data[key] = {
+                        "count": count,
+                        "avg": total / count if count else 0.0,
+                        "p50": _quantile(metric.bounds, buckets, count, 0.5),
+                        "p99": _quantile(metric.bounds, buckets, count, 0.99),
+                    }
+        return data
+
+
+class MonitorMetrics:
+    """
+    监控流水线的内置指标：日志行 → 解析 → update_track → 写盘
+    只在开启时创建；各处持有 None 时热路径上不做任何事
+    线程：行数、字节数、解析与 update_track 只由监控线程更新（多来源也只有一个监控线程），不加锁；
+    写盘耗时与落盘延迟会被各后台写线程和主循环（confirm_pending 同步写盘）同时更新，使用 SharedHistogram
+    """
+
+    def __init__(self):
+        r = self.registry = Registry()
+        self.lines = r.counter("amll_log_lines_total", "读取的日志行数")
+        self.bytes = r.counter("amll_log_bytes_total", "读取的日志字节数")
+        self.parse = r.histogram("amll_parse_seconds", "单行日志分类耗时（抽样）", PARSE_BUCKETS)
+        self.update = r.histogram("amll_update_track_seconds", "update_track 耗时（不含后台写入）",
+                                  LATENCY_BUCKETS)
+        self.counted = r.counter("amll_tracks_total", "曲目切换次数", {"result": "counted"})
+        self.uncounted = r.counter("amll_tracks_total", "曲目切换次数", {"result": "uncounted"})
+        self.persist = r.histogram("amll_persist_latency_seconds", "检测到曲目到播放日志写盘完成",
+                                   LATENCY_BUCKETS, shared=True)
+        self.write = {target: r.histogram("amll_write_seconds", "各文件单次写入耗时",
+                                          LATENCY_BUCKETS, {"file": target}, shared=True)
+                      for target in WRITE_TARGETS}
+        self._writers = []
+        self.started = time.time()
+
+    def timed_classify(self, classify: Callable, sample: int = PARSE_SAMPLE) -> Callable:
+        """
+        给逐行分类函数套上计数与计时；未开启指标时调用方直接用原函数
+        行数逐行累计，耗时每 sample 行（2 的幂）抽样一次，两次 perf_counter() 不必摊到每一行
+        """
+        perf = time.perf_counter
+        observe = self.parse.observe
+        lines = self.lines
+        mask = sample - 1
+
+        def timed(line):
+            n = lines.value = lines.value + 1
+            if n & mask:
+                return classify(line)
+            started = perf()
+            event = classify(line)
+            observe(perf() - started)
+            return event
+
+        return timed
+
+    def watch_writer(self, writer):
+        """后台写入器的队列深度作为瞬时值导出（多来源时为各写入器之和）"""
+        if not self._writers:
+            self.registry.gauge("amll_write_queue_depth", "后台写入队列深度",
+                                lambda: sum(w.queue_depth() for w in self._writers))
+        self._writers.append(writer)
+
+    def render_prometheus(self) -> str:
+        return self.registry.render_prometheus()
+
+    def snapshot(self) -> Dict:
+        return dict(self.registry.snapshot(), uptime=round(time.time() - self.started, 1))
+
+
+class MetricsDumper:
+    """每隔 interval 秒把指标快照原子写入 JSON 文件，并附上与上一次相比的行 / 字节速率"""
+
+    def __init__(self, metrics: MonitorMetrics, path: str, interval: float = 10.0,
+                 echo: Callable[[str], None] = print):
+        self.metrics = metrics
+        self.echo = echo
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._last = (time.monotonic(), 0, 0)
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        m = self.metrics
+        now, lines, size = time.monotonic(), m.lines.value, m.bytes.value
+        then, last_lines, last_size = self._last
+        elapsed = max(now - then, 1e-9)
+        self._last = (now, lines, size)
+        data = m.snapshot()
+        data["lines_per_second"] = round((lines - last_lines) / elapsed, 1)
+        data["bytes_per_second"] = round((size - last_size) / elapsed, 1)
+        try:
+            atomic_write_json(self.path, data, fsync=False, indent=2)
+        except OSError as e:
+            self.echo(f"写入指标文件失败: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.dump()
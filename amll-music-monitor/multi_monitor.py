@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+多来源日志监控：一个线程同时跟踪 N 个 AMLL 日志
+
+用法：
+    python multi_monitor.py [日志路径 ...]     # 不给路径时使用 Config.LOG_PATHS
+"""
+
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from checkpoint import LogCheckpoint
+from log_parser import classify_line
+from log_reader import DEFAULT_CHUNK_SIZE
+from log_source import LogSource, start_observer
+
+
+def source_name_for(path: str) -> str:
+    """由日志路径生成稳定且唯一的来源名：文件名 + 绝对路径摘要，可直接用作目录名"""
+    abspath = os.path.abspath(path)
+    stem = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(abspath))[0]) or "log"
+    digest = hashlib.sha1(os.path.normcase(abspath).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+class MultiLogMonitor:
+    """
+    多来源 AMLL 日志监控器
+    - 所有来源共用一个监控线程和一个 watchdog Observer（同目录只注册一次）
+    - 通知后端只检查被标记的来源，兜底扫描按 fallback_interval 进行；轮询后端每轮只做一次 stat
+    - 读取缓冲只在单线程里按需分配，同一时刻只有一个块驻留内存
+    - 每个来源是一个 LogSource（与 AMLLLogMonitor 相同的读取、解析与断点），回调带上来源名，由调用方按来源分流
+    """
+
+    def __init__(self, backend: str = "auto", poll_interval: float = 0.5,
+                 fallback_interval: float = 2.0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 backlog_batch_size: int = 500, max_errors: int = 5, verbose: bool = True,
+                 metrics=None, echo: Callable[[str], None] = print):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.fallback_interval = fallback_interval
+        self.chunk_size = chunk_size
+        self.backlog_batch_size = backlog_batch_size
+        self.max_errors = max_errors
+        self.verbose = verbose
+        self.echo = echo
+
+        self.is_monitoring = False
+        self.monitor_thread = None
+
+        self._sources: Dict[str, LogSource] = {}
+        self._observer = None
+        self._wakeup = threading.Event()
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+
+        # 可选的 MonitorMetrics：所有来源共用一组指标
+        self.metrics = metrics
+        self._classify = classify_line if metrics is None else metrics.timed_classify(classify_line)
+
+    # -------------- 来源 --------------
+    def add_source(self, path: str, name: Optional[str] = None,
+                   checkpoint: Optional[LogCheckpoint] = None) -> str:
+        """登记一个日志来源（须在 start_monitoring 之前），返回来源名"""
+        if self.is_monitoring:
+            raise RuntimeError("监控运行中不能添加来源")
+        name = name or source_name_for(path)
+        if name in self._sources:
+            raise ValueError(f"来源名重复: {name}")
+        self._sources[name] = LogSource(path, name, self.chunk_size, checkpoint, self.backlog_batch_size,
+                                        self._classify, self.metrics, self.echo, self.verbose)
+        return name
+
+    @property
+    def sources(self) -> List[str]:
+        return list(self._sources)
+
+    def session_of(self, name: str) -> Optional[str]:
+        return self._sources[name].session
+
+    def position_of(self, name: str) -> int:
+        """某个来源已处理到的字节偏移"""
+        return self._sources[name].offset
+
+    # -------------- 启停 --------------
+    def start_monitoring(self, callback: Callable, batch_callback: Optional[Callable] = None,
+                         session_callback: Optional[Callable] = None) -> bool:
+        """
+        开始监控
+        callback(source, artist, title)：实时检测到的曲目
+        batch_callback(source, [(artist, title, played_at), ...])：断点补录的积压曲目；未提供时逐条走 callback
+        session_callback(source, kind, at)：AMLL 会话切换（"enter" / "leave"），补录时 at 为日志行时间
+        找不到的日志会被跳过；一个可用来源都没有时返回 False
+        """
+        opened = 0
+        for name, source in self._sources.items():
+            # 各来源的回调绑定来源名
+            source.on_track = callback and functools.partial(callback, name)
+            source.on_backlog = batch_callback and functools.partial(batch_callback, name)
+            source.on_session = session_callback and functools.partial(session_callback, name)
+            if not source.open():
+                self.echo(f"⚠️ [{name}] 找不到日志文件 {source.path}，跳过")
+                source.disabled = True
+                continue
+            opened += 1
+        if not opened:
+            self.echo("❌ 错误: 没有可监控的日志文件")
+            return False
+
+        self.is_monitoring = True
+        self._wakeup.clear()
+        paths = {name: source.path for name, source in self._sources.items() if not source.disabled}
+        self._observer = start_observer(self.backend, paths, self._mark_dirty, self.echo)
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, name="multi-log-monitor",
+                                               daemon=True)
+        self.monitor_thread.start()
+        self.echo(f"🎵 开始实时监控 {opened} 个 AMLL Player 日志（{self.active_backend}）...")
+        return True
+
+    def stop_monitoring(self, drain: Optional[Callable[[], None]] = None, timeout: float = 5.0) -> bool:
+        """
+        停止监控：写出各来源断点并关闭句柄
+        drain、timeout 与 AMLLLogMonitor.stop_monitoring 相同：只有监控线程退出后才调用 drain 并写断点
+        """
+        self.is_monitoring = False
+        for source in self._sources.values():
+            source.stopping = True
+        self._wakeup.set()
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            self.monitor_thread.join(timeout)
+        self._stop_backend()
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            self.echo(f"⚠️ 监控线程未在 {timeout:g} 秒内退出，跳过最终断点，下次启动从上一个断点续读")
+            return False
+        if drain is not None:
+            drain()
+        for source in self._sources.values():
+            source.close()
+        self.echo("🛑 多来源监控已停止")
+        return True
+
+    # -------------- 监控后端 --------------
+    def _stop_backend(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+
+    @property
+    def active_backend(self) -> str:
+        return "watchdog" if self._observer is not None else "polling"
+
+    def _mark_dirty(self, name: str):
+        with self._dirty_lock:
+            self._dirty.add(name)
+        self._wakeup.set()
+
+    def _take_dirty(self) -> List[LogSource]:
+        with self._dirty_lock:
+            names, self._dirty = self._dirty, set()
+        return [self._sources[name] for name in names]
+
+    # -------------- 监控循环 --------------
+    def _monitor_loop(self):
+        """第一轮全量检查时各来源先补录断点之后的积压；出错只影响当前来源"""
+        next_sweep = 0.0
+        while self.is_monitoring:
+            now = time.monotonic()
+            if self._observer is None or now >= next_sweep:
+                # 轮询后端每轮全量检查；通知后端按兜底间隔全量检查一次
+                self._take_dirty()
+                targets = self._sources.values()
+                next_sweep = now + self.fallback_interval
+            else:
+                targets = self._take_dirty()
+
+            for source in targets:
+                if not self.is_monitoring:
+                    break
+                if not source.disabled:
+                    source.poll(self.max_errors)
+
+            if self._observer is None:
+                timeout = self.poll_interval
+            else:
+                timeout = max(0.0, next_sweep - time.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+
+class SourceTrackers:
+    """
+    按来源划分命名空间的 MusicTracker
+    每个来源的历史、次数、播放日志放在 base_dir/<来源名>/ 下；首次出现曲目时才创建，空闲来源不占内存
+    开启 write_behind 时所有来源共用一个后台写线程，写入按来源的文件区分，线程数不随来源数增长
+    """
+
+    def __init__(self, base_dir: str, write_behind: bool = False, flush_interval: float = 1.0,
+                 fsync_policy: str = "interval", max_queue: int = 1024, **tracker_kwargs):
+        self.base_dir = base_dir
+        self.tracker_kwargs = dict(tracker_kwargs, fsync_policy=fsync_policy)
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        if write_behind:
+            from persistence import WriteBehindWriter
+
+            self._writer = WriteBehindWriter(
+                flush_interval=flush_interval, max_queue=max_queue, fsync_policy=fsync_policy,
+                metrics=tracker_kwargs.get("metrics"), echo=tracker_kwargs.get("echo", print))
+
+    def source_dir(self, name: str) -> str:
+        path = os.path.join(self.base_dir, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def checkpoint_for(self, name: str, flush_interval: float = 5.0) -> LogCheckpoint:
+        return LogCheckpoint(os.path.join(self.source_dir(name), "monitor_checkpoint.json"), flush_interval)
+
+    def get(self, name: str):
+        with self._lock:
+            tracker = self._trackers.get(name)
+            if tracker is None:
+                from music_tracker import MusicTracker
+
+                directory = self.source_dir(name)
+                tracker = MusicTracker(
+                    history_file=os.path.join(directory, "amll_music_history.json"),
+                    log_file=os.path.join(directory, "music_playback.log"),
+                    db_file=os.path.join(directory, "amll_plays.db"),
+                    count_file=os.path.join(directory, "play_count.json"),
+                    listening_file=os.path.join(directory, "listening_intervals.bin"),
+                    writer=self._writer, source=name, **self.tracker_kwargs)
+                self._trackers[name] = tracker
+            return tracker
+
+    def on_track(self, name: str, artist: str, title: str):
+        self.get(name).update_track(artist, title)
+
+    def on_session(self, name: str, kind: str, at=None):
+        self.get(name).session_event(kind, at)
+
+    def on_backlog(self, name: str, tracks):
+        tracker = self.get(name)
+        with tracker.batch():
+            for artist, title, played_at in tracks:
+                tracker.update_track(artist, title, played_at)
+
+    def confirm_pending(self):
+        """确认各来源已听满最短收听时长的挂起曲目（主循环定期调用）"""
+        with self._lock:
+            trackers = list(self._trackers.values())
+        for tracker in trackers:
+            tracker.confirm_pending()
+
+    def close(self):
+        with self._lock:
+            trackers, self._trackers = self._trackers, {}
+        for tracker in trackers.values():
+            tracker.close()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main(argv=None):
+    import argparse
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="同时监控多个 AMLL Player 日志")
+    parser.add_argument("paths", nargs="*", help="日志路径（默认 Config.LOG_PATHS）")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or Config.LOG_PATHS
+    if not paths:
+        print("❌ 错误: 没有发现 AMLL Player 日志，请在命令行或 Config.LOG_PATHS 中指定")
+        return 1
+
+    metrics, dumper = None, None
+    if Config.METRICS:
+        from metrics import MetricsDumper, MonitorMetrics
+        metrics = MonitorMetrics()
+        if Config.METRICS_FILE:
+            dumper = MetricsDumper(metrics, Config.METRICS_FILE, Config.METRICS_INTERVAL)
+
+    trackers = SourceTrackers(
+        Config.SOURCES_DIR,
+        history_backend=Config.HISTORY_BACKEND,
+        write_behind=Config.WRITE_BEHIND,
+        flush_interval=Config.FLUSH_INTERVAL,
+        fsync_policy=Config.FSYNC_POLICY,
+        max_queue=Config.WRITE_QUEUE_SIZE,
+        dedup_window=Config.DEDUP_WINDOW,
+        min_dwell=Config.MIN_DWELL,
+        metrics=metrics,
+    )
+    monitor = MultiLogMonitor(
+        backend=Config.MONITOR_BACKEND,
+        poll_interval=Config.POLL_INTERVAL,
+        fallback_interval=Config.WATCHDOG_FALLBACK_INTERVAL,
+        chunk_size=Config.READ_CHUNK_SIZE,
+        metrics=metrics,
+    )
+    for path in paths:
+        name = source_name_for(path)
+        checkpoint = None
+        if Config.CHECKPOINT_FILE:
+            checkpoint = trackers.checkpoint_for(name, Config.CHECKPOINT_INTERVAL)
+        monitor.add_source(path, name, checkpoint)
+        print(f"📁 [{name}] {path}")
+
+    if not monitor.start_monitoring(trackers.on_track, trackers.on_backlog, trackers.on_session):
+        return 1
+    print("按 Ctrl+C 停止监控...\n")
+    try:
+        while monitor.is_monitoring:
+            time.sleep(1)
+            trackers.confirm_pending()
+    except KeyboardInterrupt:
+        print("\n🛑 接收到停止信号...")
+    finally:
+        monitor.stop_monitoring(drain=trackers.close)
+        if dumper is not None:
+            dumper.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,111 +1,331 @@
-import json
-import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from collections import Counter
-from typing import Dict, Optional, List
+from collections import Counter, deque
+from typing import Callable, Dict, Optional, List
+
+from count_store import CountStore
+from dedup import PlayGate
+from event_bus import EventBus
+from history_store import create_history_store
+from listening import ListeningRecorder
+from live_stats import LiveStats
+from persistence import WriteBehindWriter
+from play_record import Play, SymbolTable
 
 class MusicTracker:
     def __init__(self, history_file: str = "amll_music_history.json",
-                 log_file: str = "music_playback.log"):
+                 log_file: str = "music_playback.log",
+                 history_backend: str = "json", db_file: Optional[str] = None,
+                 write_behind: bool = False, flush_interval: float = 1.0,
+                 fsync_policy: str = "interval", max_queue: int = 1024,
+                 live_stats: bool = False, count_file: str = "play_count.json",
+                 history_buffer: int = 200, listening_file: Optional[str] = None,
+                 max_dwell: float = 1200.0, session_gap: float = 1800.0,
+                 dedup_window: float = 0.0, min_dwell: float = 0.0, dedup_max_entries: int = 4096,
+                 metrics=None, writer: Optional[WriteBehindWriter] = None, source: Optional[str] = None,
+                 echo: Callable[[str], None] = print):
         self.history_file = history_file
         self.log_file = log_file
         self.current_track = None
-        self.history = self._load_history()
+        # 历史存储："json" 为旧的整表 JSON，"jsonl" 为追加式 JSON Lines，"sqlite" 为 SQLite 播放库
+        self._history_store = create_history_store(history_backend, history_file, db_file, log_file, echo)
         self.last_logged_track = None
+        # 可选的 MonitorMetrics；为 None 时不计时
+        self._metrics = metrics
+        # 运行中的状态消息（已记录、写入失败）经 echo 输出，可交给控制台渲染器
+        self.echo = echo
+
+        # 最近播放的环形缓冲：内存里只保留 history_buffer 条紧凑记录，更早的只在历史存储（磁盘）中
+        # 歌手 / 歌曲字符串经驻留表共享，长期运行时内存只随曲库大小增长，而不随播放次数增长
+        self._symbols = SymbolTable()
+        self._recent = deque(
+            (Play.from_dict(r, self._symbols) for r in self._history_store.recent(history_buffer)),
+            maxlen=history_buffer)
 
         # 持久化计数器
-        self._count_file = "play_count.json"
-        self._play_counter = self._load_counts()
+        # SQLite 存储自带播放次数（由 plays 表聚合），不再读写 play_count.json
+        self._count_file = count_file
+        self._counts_in_store = getattr(self._history_store, "owns_counts", False)
+        if self._counts_in_store:
+            self._play_counter = self._history_store.load_counts()
+        else:
+            self._count_store = CountStore(self._count_file, fsync=fsync_policy != "never", echo=echo)
+            self._play_counter = self._load_counts()
+
+        # 本次运行计数的播放数（补录据此统计导入数；开启最短收听时确认可能晚于切歌）
+        self.committed = 0
+
+        # 批量模式：补录积压时推迟落盘，退出批量时统一写一次
+        self._batch_depth = 0
+        self._pending_log_entries: List[str] = []
+        self._pending_history: List[Dict] = []
+
+        # 后台写入：update_track 只入队，由写线程合并落盘，避免慢磁盘拖住日志监控线程
+        # writer：多来源共用的写入器，本 tracker 只登记自己的一组文件（source 为来源名），不另起写线程
+        self._writer = None
+        if writer is not None:
+            self._writer = writer.target(self._history_store, self.log_file, self._write_counts,
+                                         listening_file, source)
+        elif write_behind:
+            self._writer = WriteBehindWriter(
+                self._history_store, self.log_file, self._write_counts,
+                flush_interval=flush_interval, max_queue=max_queue, fsync_policy=fsync_policy,
+                metrics=metrics, listening_file=listening_file, echo=echo)
+
+        # 曲目变化事件：控制台、SSE、文件输出等订阅，发布永不阻塞
+        self.events = EventBus(echo)
+
+        # 收听时长：由曲目 / 会话切换推算每次播放的实际时长，写成定长区间记录
+        self.listening = None
+        if listening_file:
+            # 开启后台写入时区间也交给写线程，监控线程不再为每次切歌打开文件
+            submit = self._writer.submit_listening if self._writer is not None else None
+            self.listening = ListeningRecorder(listening_file, max_dwell, session_gap, echo, submit)
+
+        # 计数闸门：window 秒内重复出现的曲目、听不满 min_dwell 秒就切走的曲目不计数
+        # 曲目显示与收听区间照常跟随每一次切歌，只有计数、历史和播放日志经过闸门
+        self._gate = PlayGate(dedup_window, min_dwell, dedup_max_entries)
+        # update_track 在监控线程调用，confirm_pending 在主循环调用
+        self._lock = threading.Lock()
+
+        # 内存统计：启动时从历史加载一次，之后随 update_track 增量更新，供统计接口读取
+        self.live_stats = None
+        if live_stats:
+            self.live_stats = LiveStats()
+            self.live_stats.seed(self._history_store)
 
     # -------------- 持久化相关 --------------
     def _load_counts(self) -> Counter:
-        if os.path.exists(self._count_file):
-            try:
-                with open(self._count_file, "r", encoding="utf-8") as f:
-                    return Counter(json.load(f))
-            except Exception as e:
-                print(f"读取计数文件失败: {e}")
+        try:
+            return self._count_store.load()
+        except Exception as e:
+            self.echo(f"读取计数文件失败: {e}")
         return Counter()
 
     def _save_counts(self):
+        if self._counts_in_store:
+            return
+        if self._writer is not None:
+            self._writer.submit_counts(dict(self._play_counter))
+            return
         try:
-            with open(self._count_file, "w", encoding="utf-8") as f:
-                json.dump(dict(self._play_counter), f, ensure_ascii=False, indent=2)
+            self._write_counts(dict(self._play_counter))
         except Exception as e:
-            print(f"保存计数文件失败: {e}")
+            self.echo(f"保存计数文件失败: {e}")
+
+    def _write_counts(self, counts: Dict):
+        """写计数快照；失败时抛出（后台写入器据此在下一轮重试）"""
+        started = time.perf_counter()
+        self._count_store.save(counts)
+        if self._metrics is not None:
+            self._metrics.write["counts"].observe(time.perf_counter() - started)
 
     # -------------- 原有功能 --------------
-    def _load_history(self) -> List[Dict]:
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"加载历史记录失败: {e}")
-        return []
+    def _save_history(self, record: Dict):
+        if self._batch_depth:
+            self._pending_history.append(record)
+            return
+        self._write_history([record])
 
-    def _save_history(self):
+    def _write_history(self, records: List[Dict]):
+        if self._writer is not None:
+            self._writer.submit_history(records)
+            return
+        started = time.perf_counter()
         try:
-            with open(self.history_file, "w", encoding="utf-8") as f:
-                json.dump(self.history[-100:], f, ensure_ascii=False, indent=2)
+            self._history_store.extend(records)
         except Exception as e:
-            print(f"保存历史记录失败: {e}")
+            self.echo(f"保存历史记录失败: {e}")
+            return
+        if self._metrics is not None:
+            self._metrics.write["history"].observe(time.perf_counter() - started)
 
     # -------------- 日志写入（含作者） --------------
-    def _save_to_playback_log(self, artist: str, title: str, play_count: int):
+    def _save_to_playback_log(self, artist: str, title: str, play_count: int,
+                              played_at: Optional[datetime] = None, detected: Optional[float] = None):
+        timestamp = (played_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        # ★★★ 把作者加进来 ★★★
+        log_entry = f"[{timestamp}] {artist} - {title} (第 {play_count} 次)\n"
+        if self._batch_depth:
+            self._pending_log_entries.append(log_entry)
+            return
+        if self._append_playback_log([log_entry], detected):
+            self.echo(f"📝 已记录到播放日志: {artist} - {title} (第 {play_count} 次)")
+
+    def _append_playback_log(self, entries: List[str], detected: Optional[float] = None) -> bool:
+        """detected：检测到曲目时的 perf_counter()，开启指标时用于记录检测到写盘的延迟"""
+        if self._writer is not None:
+            self._writer.submit_log(entries, detected)
+            return True
+        started = time.perf_counter()
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # ★★★ 把作者加进来 ★★★
-            log_entry = f"[{timestamp}] {artist} - {title} (第 {play_count} 次)\n"
             with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(log_entry)
-            print(f"📝 已记录到播放日志: {artist} - {title} (第 {play_count} 次)")
+                f.writelines(entries)
         except Exception as e:
-            print(f"保存播放日志失败: {e}")
+            self.echo(f"保存播放日志失败: {e}")
+            return False
+        m = self._metrics
+        if m is not None:
+            done = time.perf_counter()
+            m.write["playback_log"].observe(done - started)
+            if detected is not None:
+                m.persist.observe(done - detected)
+        return True
+
+    # -------------- 批量模式 --------------
+    @contextmanager
+    def batch(self):
+        """
+        批量更新：期间 update_track 不打印、不逐条落盘
+        退出时历史、播放日志、计数各写一次
+        """
+        self._batch_depth += 1
+        if self.listening is not None:
+            self.listening.hold()
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_batch()
+            if self.listening is not None:
+                self.listening.release()
+
+    def _flush_batch(self):
+        entries, self._pending_log_entries = self._pending_log_entries, []
+        records, self._pending_history = self._pending_history, []
+        if not entries:
+            return
+        self._write_history(records)
+        self._append_playback_log(entries)
+        self._save_counts()
 
     # -------------- 核心更新 --------------
-    def update_track(self, artist: str, title: str):
+    def update_track(self, artist: str, title: str, played_at: Optional[datetime] = None):
+        """处理一次曲目切换；返回这首的播放次数，未计数（重复 / 挂起中）时返回 0"""
         if artist == "未知歌手" and title == "未知歌曲":
             return 0
         if not artist and not title:
             return 0
 
-        track_key = f"{artist}|{title}"
+        m = self._metrics
+        started = time.perf_counter() if m is not None else None
+        with self._lock:
+            if (self.current_track and
+                self.current_track.artist == artist and
+                self.current_track.title == title):
+                return 0
 
-        if (self.current_track and
-            self.current_track.get("artist") == artist and
-            self.current_track.get("title") == title):
-            return 0
+            # Play 只读，当前曲目与最近播放、事件记录共用同一个对象，无需复制
+            play = Play.create(artist, title, played_at, self._symbols)
+            self.current_track = play
+            # 换到了另一首：之前记录过的曲目再出现就是真正的重播，是否重复由闸门的时间窗口判断
+            self.last_logged_track = None
+            if self.listening is not None:
+                self.listening.track_started(played_at)
+            # 当前曲目跟随每一次切歌，重复 / 挂起中的曲目同样显示；计数只在通过闸门后增加
+            if self.live_stats is not None:
+                self.live_stats.set_current(play.to_dict())
 
-        if (self.last_logged_track and
-            self.last_logged_track.get("key") == track_key):
-            return 0
+            ready = self._gate.offer(play)
+            committed = self._commit(ready, started)
+            play_count = committed if ready is play else 0
 
-        self._play_counter[track_key] += 1
-        play_count = self._play_counter[track_key]
+        # backlog：补录积压时的事件，控制台可以忽略；counted 为 False 时只是切歌，没有计数
+        self.events.publish("track", dict(play.to_dict(),
+                                          play_count=play_count or self._play_counter[play.key],
+                                          counted=bool(play_count),
+                                          backlog=bool(self._batch_depth)))
+        if m is not None:
+            m.update.observe(time.perf_counter() - started)
+            (m.counted if play_count else m.uncounted).inc()
+        return play_count
 
-        self.current_track = {
-            "artist": artist,
-            "title": title,
-            "timestamp": datetime.now().isoformat(),
-            "software": "AMLL Player",
-            "key": track_key,
-        }
+    def _commit(self, play: Optional[Play], detected: Optional[float] = None) -> int:
+        """把通过闸门的播放计数并写入历史、播放日志"""
+        if play is None:
+            return 0
+        if self.last_logged_track and self.last_logged_track.key == play.key:
+            return 0
 
-        self.history.append(self.current_track.copy())
-        self._save_history()
-        self._save_to_playback_log(artist, title, play_count)
-        self._save_counts()
-        self.last_logged_track = self.current_track.copy()
+        self._play_counter[play.key] += 1
+        self.committed += 1
+        play_count = self._play_counter[play.key]
+        self._recent.append(play)
 
+        record = play.to_dict()
+        if self.live_stats is not None:
+            self.live_stats.record(record)
+        self._save_history(record)
+        when = datetime.fromtimestamp(play.played_at)
+        self._save_to_playback_log(play.artist, play.title, play_count, when, detected)
+        if not self._batch_depth:
+            self._save_counts()
+        self.last_logged_track = play
         return play_count
 
+    def confirm_pending(self, now: Optional[datetime] = None) -> int:
+        """
+        确认已经听满 min_dwell 秒的挂起曲目（由主循环定期调用）
+        未开启 min_dwell 时什么也不做；返回确认的这首的播放次数
+        """
+        if self._gate.pending is None:
+            return 0
+        detected = time.perf_counter() if self._metrics is not None else None
+        with self._lock:
+            return self._commit(self._gate.poll((now or datetime.now()).timestamp()), detected)
+
+    def session_event(self, kind: str, at: Optional[datetime] = None):
+        """
+        AMLL 会话切换："leave" 视为暂停，结束当前曲目的收听片段；"enter" 恢复
+        at 为日志行时间（补录时），实时检测时为 None 表示现在
+        """
+        if self.listening is not None:
+            if kind == "leave":
+                self.listening.session_left(at)
+            elif kind == "enter":
+                self.listening.session_entered(at)
+        self.events.publish("session", {"state": kind, "backlog": bool(self._batch_depth)})
+
+    def reset_current(self):
+        """忘掉当前曲目：下一次 update_track 不再按“与上一首相同”过滤（补录跳过重复播放时使用）"""
+        self.current_track = None
+        self.last_logged_track = None
+        self._gate.discard()
+
     # -------------- 查询接口 --------------
-    def get_current_track(self) -> Optional[Dict]:
+    def get_current_track(self) -> Optional[Play]:
         return self.current_track
 
-    def get_recent_history(self, limit: int = 10) -> List[Dict]:
-        return self.history[-limit:]
+    def get_recent_history(self, limit: int = 10) -> List[Play]:
+        """最近 limit 条播放（旧 → 新）；环形缓冲装得下时不读磁盘"""
+        if limit <= 0:
+            return []
+        if limit <= len(self._recent) or len(self._recent) < self._recent.maxlen:
+            return list(self._recent)[-limit:]
+        return [Play.from_dict(r, self._symbols) for r in self._history_store.recent(limit)]
+
+    @property
+    def play_store(self):
+        """底层历史存储；SQLite 存储额外提供 top_artists / daily_counts 等统计查询"""
+        return self._history_store
+
+    def persistence_metrics(self) -> Optional[Dict]:
+        """后台写入器的队列深度、刷新耗时等指标；未启用后台写入时为 None"""
+        return self._writer.metrics() if self._writer is not None else None
+
+    def close(self):
+        """写完后台队列并关闭历史存储持有的文件句柄"""
+        self.confirm_pending()
+        if self.listening is not None:
+            self.listening.close()
+        if self._writer is not None:
+            self._writer.close()
+        self._history_store.close()
+        if not self._counts_in_store:
+            self._count_store.close()
 
     def format_track_info(self, track_info: Dict) -> str:
         if not track_info:
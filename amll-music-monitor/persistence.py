@@ -0,0 +1,374 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# 写入操作类型
+_HISTORY = "history"
+_LOG = "log"
+_COUNTS = "counts"
+_LISTENING = "listening"
+_FLUSH = "flush"
+
+FSYNC_POLICIES = ("never", "interval", "always")
+
+
+def _close_quietly(handle):
+    if handle is not None:
+        try:
+            handle.close()
+        except OSError:
+            pass
+
+
+class WriteTarget:
+    """
+    一组写入目标：一个来源的历史存储、播放日志、计数快照、收听区间，以及写线程里尚未写出的内容
+    submit_* 只入队，待写内容与文件句柄只由写线程访问
+    """
+
+    def __init__(self, writer: "WriteBehindWriter", history_store, log_file: str,
+                 write_counts: Callable[[Dict], None], listening_file: Optional[str] = None,
+                 name: Optional[str] = None):
+        self.writer = writer
+        self.history_store = history_store
+        self.log_file = log_file
+        self.write_counts = write_counts
+        self.listening_file = listening_file
+        self.label = f"[{name}] " if name else ""
+        self.log_handle = None
+        self.listening_handle = None
+        # 待写内容（写线程内）
+        self.history: List[Dict] = []
+        self.entries: List[str] = []
+        self.stamps: List[float] = []
+        self.intervals: List[bytes] = []
+        self.counts: Optional[Dict] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self.history) + len(self.entries) + len(self.intervals) + (self.counts is not None)
+
+    # -------------- 入队 --------------
+    def submit_history(self, records: List[Dict]):
+        if records:
+            self.writer._put((_HISTORY, self, records))
+
+    def submit_log(self, entries: List[str], detected: Optional[float] = None):
+        """detected：检测到曲目时的 perf_counter()，写盘完成后据此记录延迟"""
+        if entries:
+            self.writer._put((_LOG, self, (entries, detected)))
+
+    def submit_counts(self, snapshot: Dict):
+        self.writer._put((_COUNTS, self, snapshot))
+
+    def submit_listening(self, data: bytes):
+        """收听区间的定长记录（ListeningRecorder 的输出），追加到 listening_file"""
+        if data:
+            self.writer._put((_LISTENING, self, data))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.writer.flush(timeout)
+
+    def metrics(self) -> Dict:
+        return self.writer.metrics()
+
+    def close(self, timeout: float = 10.0):
+        """共享写入器由创建者关闭；这里只等本来源已入队的内容写完"""
+        if not self.writer.closed:
+            self.flush(timeout)
+
+    # -------------- 写线程 --------------
+    def write(self, failed: List[str], metrics=None):
+        """写出待写内容；各目标互不影响，没写成功的部分留在本对象里，下一轮重试"""
+        m = metrics
+        if self.history:
+            started = time.perf_counter()
+            try:
+                self.history_store.extend(self.history)
+                if m is not None:
+                    m.write["history"].observe(time.perf_counter() - started)
+                self.history = []
+            except Exception as e:
+                failed.append(f"{self.label}历史记录: {e}")
+        if self.entries:
+            started = time.perf_counter()
+            try:
+                if self.log_handle is None:
+                    self.log_handle = open(self.log_file, "a", encoding="utf-8")
+                self.log_handle.writelines(self.entries)
+                self.log_handle.flush()
+                if m is not None:
+                    done = time.perf_counter()
+                    m.write["playback_log"].observe(done - started)
+                    for detected in self.stamps:
+                        m.persist.observe(done - detected)
+                self.entries, self.stamps = [], []
+            except Exception as e:
+                # 句柄可能已失效（文件被删、磁盘拔出），下一轮重新打开
+                _close_quietly(self.log_handle)
+                self.log_handle = None
+                failed.append(f"{self.label}播放日志: {e}")
+        if self.counts is not None:
+            try:
+                self.write_counts(self.counts)
+                self.counts = None
+            except Exception as e:
+                failed.append(f"{self.label}计数: {e}")
+        if self.intervals:
+            try:
+                self._append_intervals(b"".join(self.intervals))
+                self.intervals = []
+            except Exception as e:
+                failed.append(f"{self.label}收听区间: {e}")
+
+    def _append_intervals(self, data: bytes):
+        if self.listening_handle is None:
+            self.listening_handle = open(self.listening_file, "ab")
+        handle = self.listening_handle
+        start = handle.tell()
+        try:
+            handle.write(data)
+            handle.flush()
+        except Exception:
+            # 截回写入前的长度：重试时整批重写，不会留下半条或重复的定长记录
+            _close_quietly(handle)
+            self.listening_handle = None
+            try:
+                os.truncate(self.listening_file, start)
+            except OSError:
+                pass
+            raise
+
+    def sync(self):
+        for handle in (self.log_handle, self.listening_handle):
+            if handle is not None:
+                os.fsync(handle.fileno())
+        sync = getattr(self.history_store, "sync", None)
+        if sync is not None:
+            sync()
+
+    def close_handles(self):
+        _close_quietly(self.log_handle)
+        _close_quietly(self.listening_handle)
+        self.log_handle = self.listening_handle = None
+
+
+class WriteBehindWriter:
+    """
+    后台写入器：调用方只入队，单个写线程负责落盘
+    - 有界队列，队列满时调用方阻塞（背压），不会丢数据
+    - 同一轮内的写入合并：历史 / 播放日志批量追加，计数快照只写最新一份
+    - 播放日志、收听区间句柄常驻，按 flush_interval 或关闭时刷新
+    - 历史、播放日志、计数、收听区间分别写入，某一个失败时只有它的内容留到下一轮重试
+    - fsync 策略："never" 交给操作系统；"interval" 最多每 fsync_interval 秒一次；"always" 每轮刷新都 fsync
+    - 多个来源可共用一个写线程：target() 为每个来源登记一组写入目标，队列里的内容按目标区分
+      构造时给出 history_store 等参数则登记一个默认目标，writer.submit_* 写入它
+    """
+
+    def __init__(self, history_store=None, log_file: Optional[str] = None,
+                 write_counts: Optional[Callable[[Dict], None]] = None,
+                 flush_interval: float = 1.0, max_queue: int = 1024,
+                 fsync_policy: str = "interval", fsync_interval: float = 5.0, metrics=None,
+                 listening_file: Optional[str] = None, echo: Callable[[str], None] = print):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"未知的 fsync 策略: {fsync_policy}")
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.echo = echo
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._targets: List[WriteTarget] = []
+        self._last_fsync = time.monotonic()
+        self._closed = False
+
+        # 指标
+        self._metrics_lock = threading.Lock()
+        self._flushes = 0
+        self._items_written = 0
+        self._blocked_puts = 0
+        self._max_depth = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._errors = 0
+        # 可选的 MonitorMetrics：各文件写入耗时、检测到写盘的延迟
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.watch_writer(self)
+
+        self._default = None
+        if history_store is not None:
+            self._default = self.target(history_store, log_file, write_counts, listening_file)
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def target(self, history_store, log_file: str, write_counts: Callable[[Dict], None],
+               listening_file: Optional[str] = None, name: Optional[str] = None) -> WriteTarget:
+        """登记一组写入目标（多来源时每个来源一组），返回它的入队接口"""
+        target = WriteTarget(self, history_store, log_file, write_counts, listening_file, name)
+        with self._metrics_lock:
+            self._targets.append(target)
+        return target
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # -------------- 入队 --------------
+    def submit_history(self, records: List[Dict]):
+        self._default.submit_history(records)
+
+    def submit_log(self, entries: List[str], detected: Optional[float] = None):
+        self._default.submit_log(entries, detected)
+
+    def submit_counts(self, snapshot: Dict):
+        self._default.submit_counts(snapshot)
+
+    def submit_listening(self, data: bytes):
+        self._default.submit_listening(data)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """请求立即刷新并等待完成"""
+        done = threading.Event()
+        self._put((_FLUSH, None, done))
+        return done.wait(timeout)
+
+    def _put(self, item):
+        if self._closed:
+            raise RuntimeError("写入器已关闭")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._metrics_lock:
+                self._blocked_puts += 1
+            self._queue.put(item)
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+    # -------------- 写线程 --------------
+    def _run(self):
+        dirty: Dict[WriteTarget, None] = {}   # 有待写内容的目标（按入队先后）
+        waiters = []
+        stop = False
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, target, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+
+            if kind == _HISTORY:
+                target.history.extend(payload)
+            elif kind == _LOG:
+                target.entries.extend(payload[0])
+                if payload[1] is not None:
+                    target.stamps.append(payload[1])
+            elif kind == _COUNTS:
+                target.counts = payload  # 只保留最新快照
+            elif kind == _LISTENING:
+                target.intervals.append(payload)
+            elif kind == _FLUSH:
+                if payload is None:
+                    stop = True
+                else:
+                    waiters.append(payload)
+            if target is not None:
+                dirty[target] = None
+
+            if dirty and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if waiters or stop or due:
+                if dirty:
+                    # 没写成功的部分留在各目标里，下一轮刷新时重试
+                    self._write(list(dirty))
+                    dirty = {t: None for t in dirty if t.pending}
+                deadline = None
+                left = sum(t.pending for t in dirty)
+                if left and stop:
+                    self.echo(f"❌ 关闭时仍有 {left} 项内容未能写入")
+                elif left:
+                    deadline = time.monotonic() + self.flush_interval
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+                if stop:
+                    break
+
+    def _write(self, targets: List[WriteTarget]):
+        """依次写出各目标的待写内容，一个目标或文件失败不会丢掉其他的内容"""
+        started = time.perf_counter()
+        total = sum(t.pending for t in targets)
+        failed: List[str] = []
+        for target in targets:
+            target.write(failed, self._metrics)
+        try:
+            self._maybe_fsync()
+        except Exception as e:
+            failed.append(f"fsync: {e}")
+        if failed:
+            self._errors += 1
+            self.echo(f"后台写入失败，下一轮重试: {'; '.join(failed)}")
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self._flushes += 1
+            self._items_written += total - sum(t.pending for t in targets)
+            self._last_flush_ms = elapsed
+            self._total_flush_ms += elapsed
+            self._max_flush_ms = max(self._max_flush_ms, elapsed)
+
+    def _maybe_fsync(self, force: bool = False):
+        if self.fsync_policy == "never" and not force:
+            return
+        now = time.monotonic()
+        if self.fsync_policy == "interval" and not force and now - self._last_fsync < self.fsync_interval:
+            return
+        with self._metrics_lock:
+            targets = list(self._targets)
+        for target in targets:
+            target.sync()
+        self._last_fsync = now
+
+    # -------------- 关闭 / 指标 --------------
+    def close(self, timeout: float = 10.0):
+        """写完队列里的全部内容后退出写线程"""
+        if self._closed:
+            return
+        self._put((_FLUSH, None, None))
+        self._closed = True
+        self._thread.join(timeout)
+        try:
+            if self.fsync_policy != "never":
+                self._maybe_fsync(force=True)
+        except OSError:
+            pass
+        for target in self._targets:
+            target.close_handles()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> Dict:
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "blocked_puts": self._blocked_puts,
+                "flushes": self._flushes,
+                "items_written": self._items_written,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "errors": self._errors,
+                "fsync_policy": self.fsync_policy,
+                "targets": len(self._targets),
+            }
@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_SOFTWARE = "AMLL Player"
+
+
+class SymbolTable:
+    """
+    字符串驻留表：同名歌手 / 歌曲只保留一份字符串对象
+    长期运行时播放记录大多是重复的歌手和曲目，共享后每条记录只多几个指针
+    """
+
+    __slots__ = ("_table",)
+
+    def __init__(self):
+        self._table: Dict[str, str] = {}
+
+    def intern(self, value: str) -> str:
+        return self._table.setdefault(value, value)
+
+    def __len__(self):
+        return len(self._table)
+
+
+class Play:
+    """
+    一次播放的紧凑记录：__slots__ + 驻留字符串 + epoch 秒
+    - key（"歌手|歌曲"）与 ISO 时间字符串按需生成，不常驻内存
+    - 只读；保留 dict 风格的 get() / [] 访问，旧代码可以原样使用
+    - 写入存储、发布事件时用 to_dict() 转成与旧格式相同的字典
+    """
+
+    __slots__ = ("artist", "title", "played_at", "software")
+
+    _FIELDS = ("artist", "title", "timestamp", "software", "key")
+
+    def __init__(self, artist: str, title: str, played_at: float, software: str = DEFAULT_SOFTWARE):
+        self.artist = artist
+        self.title = title
+        self.played_at = played_at
+        self.software = software
+
+    @classmethod
+    def create(cls, artist: str, title: str, played_at: Optional[datetime] = None,
+               symbols: Optional[SymbolTable] = None) -> "Play":
+        when = (played_at or datetime.now()).timestamp()
+        if symbols is not None:
+            artist, title = symbols.intern(artist), symbols.intern(title)
+        return cls(artist, title, when)
+
+    @classmethod
+    def from_dict(cls, record: Dict, symbols: Optional[SymbolTable] = None) -> "Play":
+        """由历史存储中的字典还原；时间戳无法解析时记为 0"""
+        try:
+            when = datetime.fromisoformat(record["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            when = 0.0
+        artist, title = record.get("artist", ""), record.get("title", "")
+        software = record.get("software", DEFAULT_SOFTWARE)
+        if symbols is not None:
+            artist, title, software = symbols.intern(artist), symbols.intern(title), symbols.intern(software)
+        return cls(artist, title, when, software)
+
+    @property
+    def key(self) -> str:
+        return f"{self.artist}|{self.title}"
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.played_at).isoformat()
+
+    # -------------- dict 兼容 --------------
+    def get(self, name: str, default: Any = None) -> Any:
+        if name in self._FIELDS:
+            return getattr(self, name)
+        return default
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._FIELDS
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._FIELDS)
+
+    def to_dict(self, **extra) -> Dict:
+        record = {
+            "artist": self.artist,
+            "title": self.title,
+            "timestamp": self.timestamp,
+            "software": self.software,
+            "key": self.key,
+        }
+        record.update(extra)
+        return record
+
+    def __eq__(self, other):
+        if not isinstance(other, Play):
+            return NotImplemented
+        return (self.artist, self.title, self.played_at, self.software) == \
+               (other.artist, other.title, other.played_at, other.software)
+
+    def __hash__(self):
+        return hash((self.artist, self.title, self.played_at))
+
+    def __repr__(self):
+        return f"Play({self.artist!r}, {self.title!r}, {self.timestamp!r})"
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+端到端回放基准：日志生成器（子进程）→ AMLLLogMonitor → MusicTracker → 磁盘
+
+生成器按给定速率写合成日志，并记下每个曲目行 flush 的时刻（monotonic，跨进程可比）；
+本进程用真实的监控器与记录器处理这份日志，update_track 返回时记为检测完成，
+两者之差即端到端检测延迟。报告延迟分位数、吞吐量，以及本进程（不含生成器）的 CPU 与 RSS。
+
+用法：
+    python replay_bench.py --rate 2000 --duration 20
+    python replay_bench.py --rate 0 --lines 2000000 --backend polling
+    python replay_bench.py --rotate-mb 2 --truncate-every 50000 --save run.json
+    python replay_bench.py --compare run.json      # 再跑一次并与保存的结果对比
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+from log_monitor import AMLLLogMonitor
+from metrics import MonitorMetrics
+from music_tracker import MusicTracker
+
+GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_generator.py")
+
+# 对比时越小越好的指标；其余（吞吐量）越大越好
+_LOWER_IS_BETTER = ("latency_p50_ms", "latency_p90_ms", "latency_p99_ms", "latency_max_ms",
+                    "cpu_percent", "cpu_us_per_line", "peak_rss_mb", "missed")
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """本进程的峰值 RSS；没有 resource 模块（Windows）时为 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _read_manifest(path: str) -> Dict[str, float]:
+    written = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            at, _, title = line.rstrip("\n").split("\t")
+            written[title] = float(at)
+    return written
+
+
+def _wait_settled(detected: Dict, expected: int, settle: float, timeout: float):
+    """生成器写完后等检测追上：全部对上，或连续 settle 秒没有新的检测"""
+    deadline = time.monotonic() + timeout
+    last_count, last_change = -1, time.monotonic()
+    while time.monotonic() < deadline and len(detected) < expected:
+        if len(detected) != last_count:
+            last_count, last_change = len(detected), time.monotonic()
+        elif time.monotonic() - last_change >= settle:
+            return
+        time.sleep(0.05)
+
+
+def run(args) -> Dict:
+    with tempfile.TemporaryDirectory() as root:
+        log_path = os.path.join(root, "amll.log")
+        manifest = os.path.join(root, "manifest.tsv")
+        open(log_path, "w").close()
+
+        metrics = MonitorMetrics()
+        tracker = MusicTracker(
+            history_file=os.path.join(root, "amll_music_history.jsonl"),
+            log_file=os.path.join(root, "music_playback.log"),
+            history_backend=args.history_backend,
+            db_file=os.path.join(root, "amll_plays.db"),
+            count_file=os.path.join(root, "play_count.json"),
+            write_behind=args.write_behind,
+            fsync_policy=args.fsync,
+            listening_file=os.path.join(root, "listening_intervals.bin"),
+            metrics=metrics,
+        )
+        detected: Dict[str, float] = {}
+
+        def on_track(artist, title):
+            tracker.update_track(artist, title)
+            detected[title] = time.monotonic()
+
+        monitor = AMLLLogMonitor(log_path, backend=args.backend, poll_interval=args.poll_interval,
+                                 metrics=metrics)
+        command = [sys.executable, GENERATOR, log_path, "--rate", str(args.rate),
+                   "--manifest", manifest, "--seed", str(args.seed),
+                   "--rotate-mb", str(args.rotate_mb), "--truncate-every", str(args.truncate_every)]
+        command += ["--lines", str(args.lines)] if args.lines else ["--duration", str(args.duration)]
+
+        # 监控与记录器的逐首打印不计入测量，输出丢到 devnull
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            monitor.start_monitoring(on_track, None, tracker.session_event)
+            backend = monitor.active_backend
+            cpu_started, wall_started = time.process_time(), time.monotonic()
+            subprocess.run(command, check=True)
+            expected = len(_read_manifest(manifest))
+            _wait_settled(detected, expected, args.settle, args.timeout)
+            cpu = time.process_time() - cpu_started
+            wall = time.monotonic() - wall_started
+            monitor.stop_monitoring()
+            tracker.close()
+
+        written = _read_manifest(manifest)
+
+    latencies = sorted((detected[title] - at) * 1000 for title, at in written.items() if title in detected)
+    lines = metrics.lines.value
+    result = {
+        "backend": backend,
+        "rate": args.rate,
+        "lines": lines,
+        "bytes": metrics.bytes.value,
+        "tracks_written": len(written),
+        "tracks_detected": len(latencies),
+        "missed": len(written) - len(latencies),
+        "wall_seconds": round(wall, 3),
+        "lines_per_second": round(lines / wall, 1) if wall else 0.0,
+        "tracks_per_second": round(len(latencies) / wall, 1) if wall else 0.0,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / wall * 100, 1) if wall else 0.0,
+        "cpu_us_per_line": round(cpu / lines * 1e6, 3) if lines else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if len(latencies) >= 2:
+        q = statistics.quantiles(latencies, n=100)
+        result.update(latency_p50_ms=round(q[49], 3), latency_p90_ms=round(q[89], 3),
+                      latency_p99_ms=round(q[98], 3), latency_max_ms=round(latencies[-1], 3))
+    return result
+
+
+def print_report(result: Dict, baseline: Optional[Dict] = None):
+    rate = f"{result['rate']:g} 行/秒" if result["rate"] else "不限速"
+    print(f"📊 回放结果（{result['backend']} 后端，目标速率 {rate}）")
+    for key, value in result.items():
+        if key in ("backend", "rate") or value is None:
+            continue
+        line = f"  {key:<20} {value:>14,}" if isinstance(value, int) else f"  {key:<20} {value:>14,.3f}"
+        old = (baseline or {}).get(key)
+        if isinstance(old, (int, float)) and old and isinstance(value, (int, float)):
+            change = (value - old) / old
+            worse = change > 0 if key in _LOWER_IS_BETTER else change < 0
+            mark = "⚠️" if worse and abs(change) >= 0.1 else "  "
+            line += f"   {mark} {change:+.1%}（之前 {old:,}）"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成 AMLL 日志的端到端回放基准")
+    parser.add_argument("--rate", type=float, default=2000.0, help="生成速率（行/秒），0 表示不限速")
+    parser.add_argument("--duration", type=float, default=10.0, help="生成时长（秒）")
+    parser.add_argument("--lines", type=int, default=0, help="改为按行数生成")
+    parser.add_argument("--rotate-mb", type=float, default=0.0, help="日志超过该大小时轮转")
+    parser.add_argument("--truncate-every", type=int, default=0, help="每写这么多行截断一次日志")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("auto", "watchdog", "polling"), default="auto")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--history-backend", choices=("json", "jsonl", "sqlite"), default="jsonl")
+    parser.add_argument("--no-write-behind", dest="write_behind", action="store_false",
+                        help="关闭后台写入，update_track 同步落盘")
+    parser.add_argument("--fsync", choices=("never", "interval", "always"), default="interval")
+    parser.add_argument("--settle", type=float, default=2.0, help="写完后多少秒没有新检测即结束")
+    parser.add_argument("--timeout", type=float, default=30.0, help="写完后最多等待的秒数")
+    parser.add_argument("--save", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前 --save 的结果对比，变差超过 10%% 的指标会标出")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    result = run(args)
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
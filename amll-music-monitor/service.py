@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+AMLL Player 音乐检测器 - 服务模式
+
+无界面运行，适合交给 systemd / NSSM 等服务管理器：
+- SIGTERM / SIGINT（Windows 上另有 SIGBREAK）触发正常退出，不再依赖 Ctrl+C
+- 日志为每行一个 JSON 对象（时间、级别、事件与字段），写到 stderr 或 SERVICE_LOG_FILE
+- 退出时按顺序停止：监控线程 → 记录器一次性写完全部挂起状态 → 最终断点 → 其余线程
+  最终断点在记录器写完之后才写，正常退出与重启不丢播放；监控线程卡住时不写最终断点，但记录器照样写完
+  运行中的断点每 CHECKPOINT_INTERVAL 秒落盘，与后台写入互不等待：进程被强杀时，
+  断点之前、还在写入队列里（最多 FLUSH_INTERVAL 秒）的播放会丢失
+
+用法：
+    python service.py
+    python service.py --log-file amll_service.log --log-level debug
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from typing import Optional
+
+from checkpoint import LogCheckpoint
+from config import Config
+from event_bus import EventFileSink
+from log_monitor import AMLLLogMonitor
+from music_tracker import MusicTracker
+
+logger = logging.getLogger("amll.service")
+
+# 状态消息开头的图标 -> 日志级别；其余为 INFO
+# 逐首的“检测到音乐信息”“已记录到播放日志”与 track 事件重复，只在 debug 级别输出
+_ICON_LEVELS = {"❌": logging.ERROR, "⚠": logging.WARNING, "🎵": logging.DEBUG, "📝": logging.DEBUG}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """每条日志一行 JSON：time / level / event / message，加上 extra={"fields": {...}} 给出的字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": getattr(record, "event", "message"),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(path: Optional[str] = None, level: str = "INFO") -> logging.Handler:
+    """把 amll.* 日志以 JSON 行写到 path（None 时为 stderr）"""
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonLogFormatter())
+    root = logging.getLogger("amll")
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    root.propagate = False
+    return handler
+
+
+def log_event(level: int, event: str, message: str, **fields):
+    logger.log(level, message, extra={"event": event, "fields": fields})
+
+
+def echo_to_log(text: str):
+    """各模块的状态消息（“⚠️ 未安装 watchdog…”）去掉图标后按开头图标定级写入日志"""
+    text = text.strip()
+    level = logging.INFO
+    for icon, icon_level in _ICON_LEVELS.items():
+        if text.startswith(icon):
+            level = icon_level
+    if not logger.isEnabledFor(level):
+        return
+    start = 0
+    while start < len(text) and (unicodedata.category(text[start])[0] in "SMZ"):
+        start += 1
+    log_event(level, "status", text[start:])
+
+
+class AMLLService:
+    """无界面的监控服务：与 main.py 相同的监控与记录，输出改为结构化日志"""
+
+    def __init__(self, log_path: str = Config.LOG_PATH, confirm_interval: float = 1.0):
+        self.log_path = log_path
+        self.confirm_interval = confirm_interval
+        self._stop = threading.Event()
+        self._stop_reason = None
+
+        self.metrics = None
+        if Config.METRICS:
+            from metrics import MonitorMetrics
+            self.metrics = MonitorMetrics()
+
+        self.tracker = MusicTracker(
+            history_file=Config.HISTORY_FILE,
+            log_file=Config.PLAYBACK_LOG_FILE,
+            history_backend=Config.HISTORY_BACKEND,
+            db_file=Config.SQLITE_DB_FILE,
+            write_behind=Config.WRITE_BEHIND,
+            flush_interval=Config.FLUSH_INTERVAL,
+            fsync_policy=Config.FSYNC_POLICY,
+            max_queue=Config.WRITE_QUEUE_SIZE,
+            live_stats=Config.STATS_SERVER,
+            history_buffer=Config.HISTORY_BUFFER_SIZE,
+            listening_file=Config.LISTENING_FILE,
+            max_dwell=Config.MAX_DWELL,
+            session_gap=Config.SESSION_GAP,
+            dedup_window=Config.DEDUP_WINDOW,
+            min_dwell=Config.MIN_DWELL,
+            metrics=self.metrics,
+            echo=echo_to_log
+        )
+
+        checkpoint = None
+        if Config.CHECKPOINT_FILE:
+            checkpoint = LogCheckpoint(Config.CHECKPOINT_FILE, Config.CHECKPOINT_INTERVAL, echo_to_log)
+        self.monitor = AMLLLogMonitor(
+            log_path,
+            backend=Config.MONITOR_BACKEND,
+            poll_interval=Config.POLL_INTERVAL,
+            fallback_interval=Config.WATCHDOG_FALLBACK_INTERVAL,
+            chunk_size=Config.READ_CHUNK_SIZE,
+            checkpoint=checkpoint,
+            metrics=self.metrics,
+            echo=echo_to_log
+        )
+
+        self._events = None
+        self._event_thread = None
+        self.stats_server = None
+        self.now_playing_sink = None
+        self.metrics_dumper = None
+        self.started = None
+        self.tracks = 0
+
+    # -------------- 回调 --------------
+    def on_backlog(self, tracks):
+        with self.tracker.batch():
+            for artist, title, played_at in tracks:
+                self.tracker.update_track(artist, title, played_at)
+
+    def _log_events(self):
+        """曲目 / 会话事件写成结构化日志；订阅关闭后写完积压的事件再退出"""
+        events = self._events
+        while True:
+            batch = events.get()
+            if not batch and events.closed:
+                return
+            for event in batch:
+                data = event.data
+                if event.topic == "track":
+                    self.tracks += 1
+                    # 补录的曲目可能成千上万，只在 debug 级别逐首记录（补录完成时另有汇总）
+                    level = logging.DEBUG if data.get("backlog") else logging.INFO
+                    log_event(level, "track", f"{data.get('artist')} - {data.get('title')}",
+                              artist=data.get("artist"), title=data.get("title"),
+                              play_count=data.get("play_count"), counted=data.get("counted"),
+                              backlog=data.get("backlog"))
+                else:
+                    log_event(logging.INFO, "session", data.get("state"),
+                              state=data.get("state"), backlog=data.get("backlog"))
+
+    # -------------- 生命周期 --------------
+    def request_stop(self, reason: str = "request"):
+        """请求退出（可在信号处理函数或其他线程中调用）"""
+        if self._stop_reason is None:
+            self._stop_reason = reason
+        self._stop.set()
+
+    def _on_signal(self, signum, frame):
+        self.request_stop(signal.Signals(signum).name)
+
+    def install_signal_handlers(self):
+        for name in ("SIGTERM", "SIGINT", "SIGHUP", "SIGBREAK"):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                signal.signal(signum, self._on_signal)
+
+    def start(self) -> bool:
+        self.started = time.monotonic()
+        # 记录事件的订阅在监控开始前建立，补录的曲目也会写进日志
+        self._events = self.tracker.events.subscribe("service-log", topics=["track", "session"],
+                                                     maxsize=4096)
+        self._event_thread = threading.Thread(target=self._log_events, name="service-log", daemon=True)
+        self._event_thread.start()
+
+        if not self.monitor.start_monitoring(self.tracker.update_track, self.on_backlog,
+                                             self.tracker.session_event):
+            self._events.close()
+            self._event_thread.join(timeout=2)
+            return False
+
+        if Config.NOW_PLAYING_FILE:
+            self.now_playing_sink = EventFileSink(self.tracker.events, Config.NOW_PLAYING_FILE)
+        if self.tracker.live_stats is not None:
+            from stats_server import StatsServer
+            self.stats_server = StatsServer(self.tracker.live_stats,
+                                            Config.STATS_SERVER_HOST, Config.STATS_SERVER_PORT,
+                                            event_bus=self.tracker.events, metrics=self.metrics,
+                                            echo=echo_to_log, allow_origin=Config.STATS_SERVER_ALLOW_ORIGIN)
+            if not self.stats_server.start():
+                self.stats_server = None
+        if self.metrics is not None and Config.METRICS_FILE:
+            from metrics import MetricsDumper
+            self.metrics_dumper = MetricsDumper(self.metrics, Config.METRICS_FILE, Config.METRICS_INTERVAL,
+                                                echo_to_log)
+
+        log_event(logging.INFO, "started", "服务已启动", log_path=self.log_path,
+                  backend=self.monitor.active_backend, pid=os.getpid())
+        return True
+
+    def run_forever(self):
+        """阻塞到收到退出请求；期间只做挂起曲目的确认，没有额外的定期写盘"""
+        while not self._stop.wait(self.confirm_interval):
+            self.tracker.confirm_pending()
+
+    def shutdown(self):
+        """按依赖顺序停止并等待每个线程退出；记录器的全部挂起状态只在这里写一次"""
+        log_event(logging.INFO, "stopping", "正在停止", reason=self._stop_reason)
+        started = time.perf_counter()
+
+        # ① 停止监控线程（不再产生新的播放），写完记录器后才写最终断点
+        # 监控线程没有按时退出时 stop_monitoring 不调用 drain、不写断点，记录器仍要关闭，写完后台队列
+        drained = False
+        try:
+            drained = self.monitor.stop_monitoring(drain=self.tracker.close)
+        finally:
+            if not drained:
+                self.tracker.close()
+        # ② 记录器关闭后不会再有事件，写完积压的事件日志
+        self._events.close()
+        self._event_thread.join(timeout=5)
+        # ③ 其余读取状态的线程
+        if self.stats_server is not None:
+            self.stats_server.stop()
+        if self.now_playing_sink is not None:
+            self.now_playing_sink.close()
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.close()
+
+        leftover = [t.name for t in threading.enumerate()
+                    if t is not threading.current_thread() and t.is_alive()]
+        if leftover:
+            log_event(logging.WARNING, "threads", "仍有线程未退出", threads=leftover)
+        log_event(logging.INFO, "stopped", "服务已停止", reason=self._stop_reason,
+                  tracks=self.tracks, uptime=round(time.monotonic() - self.started, 1),
+                  shutdown_ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def run(self) -> int:
+        self.install_signal_handlers()
+        if not self.start():
+            log_event(logging.ERROR, "start_failed", "服务启动失败", log_path=self.log_path)
+            self.tracker.close()
+            return 1
+        try:
+            self.run_forever()
+        finally:
+            self.shutdown()
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AMLL Player 音乐检测器（服务模式）")
+    parser.add_argument("--log", default=Config.LOG_PATH, help="AMLL Player 日志路径")
+    parser.add_argument("--log-file", default=Config.SERVICE_LOG_FILE,
+                        help="JSON 日志写入的文件；默认 stderr（交给 journald 等收集）")
+    parser.add_argument("--log-level", default=Config.SERVICE_LOG_LEVEL,
+                        choices=("debug", "info", "warning", "error"), type=str.lower)
+    args = parser.parse_args(argv)
+
+    handler = setup_logging(args.log_file, args.log_level)
+    try:
+        return AMLLService(args.log).run()
+    finally:
+        handler.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
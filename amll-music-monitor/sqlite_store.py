@@ -0,0 +1,233 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    id       INTEGER PRIMARY KEY,
+    artist   TEXT NOT NULL,
+    title    TEXT NOT NULL,
+    ts       TEXT NOT NULL,          -- 本地时间 ISO 格式，字典序即时间序
+    software TEXT NOT NULL DEFAULT 'AMLL Player'
+);
+CREATE INDEX IF NOT EXISTS idx_plays_ts ON plays (ts);
+CREATE INDEX IF NOT EXISTS idx_plays_artist_title ON plays (artist, title);
+
+-- 汇总表由触发器随 plays 同步维护，统计查询只扫描汇总行，与播放总量无关
+CREATE TABLE IF NOT EXISTS song_counts (
+    artist TEXT NOT NULL,
+    title  TEXT NOT NULL,
+    n      INTEGER NOT NULL,
+    PRIMARY KEY (artist, title)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS day_hour_counts (
+    day  TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    n    INTEGER NOT NULL,
+    PRIMARY KEY (day, hour)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_plays_insert AFTER INSERT ON plays BEGIN
+    INSERT INTO song_counts (artist, title, n) VALUES (NEW.artist, NEW.title, 1)
+        ON CONFLICT (artist, title) DO UPDATE SET n = n + 1;
+    INSERT INTO day_hour_counts (day, hour, n)
+        VALUES (substr(NEW.ts, 1, 10), CAST(substr(NEW.ts, 12, 2) AS INTEGER), 1)
+        ON CONFLICT (day, hour) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_plays_delete AFTER DELETE ON plays BEGIN
+    UPDATE song_counts SET n = n - 1 WHERE artist = OLD.artist AND title = OLD.title;
+    UPDATE day_hour_counts SET n = n - 1
+        WHERE day = substr(OLD.ts, 1, 10) AND hour = CAST(substr(OLD.ts, 12, 2) AS INTEGER);
+END;
+"""
+
+# music_playback.log 的行格式：[时间] 作者 - 歌名 (第 N 次)
+_PLAYBACK_LINE_RE = re.compile(r"\[(?P<time>.+?)\] (?P<artist>.+?) - (?P<title>.+?) \(第 (?P<count>\d+) 次\)")
+_INSERT = "INSERT INTO plays (artist, title, ts, software) VALUES (?, ?, ?, ?)"
+
+
+class SqlitePlayStore:
+    """
+    SQLite 播放记录存储：一张 plays 表 + ts / (artist, title) 索引
+    - WAL 模式，写入攒批提交（满 commit_every 条或 commit_interval 秒）
+    - 同时承担历史记录与播放次数，次数由 plays 表聚合得到
+    - 提供按索引执行的统计查询（TOP 榜单、按天 / 按小时分布）
+    """
+
+    owns_counts = True
+
+    def __init__(self, path: str, import_log: Optional[str] = None,
+                 commit_every: int = 50, commit_interval: float = 2.0, echo: Callable[[str], None] = print):
+        self.path = path
+        self.echo = echo
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._lock = threading.RLock()
+        # 已插入、尚未提交的行：提交失败且事务被回滚时据此重新插入
+        self._uncommitted: List[Tuple] = []
+        self._timer = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        if import_log and self._is_empty() and os.path.exists(import_log):
+            self._import_playback_log(import_log)
+
+    def _is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM plays LIMIT 1").fetchone() is None
+
+    def _import_playback_log(self, log_path: str):
+        """首次建库时从 music_playback.log 导入全部播放（它是最完整的播放记录）"""
+        rows = []
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                m = _PLAYBACK_LINE_RE.search(line)
+                if m:
+                    ts = m["time"].replace(" ", "T", 1)
+                    rows.append((m["artist"].strip(), m["title"].strip(), ts, "AMLL Player"))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(_INSERT, rows)
+            self._conn.commit()
+        self.echo(f"📦 已从 {log_path} 导入 {len(rows)} 条播放记录到 {self.path}")
+
+    # -------------- 写入 --------------
+    def append(self, record: Dict):
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict]):
+        rows = [(r["artist"], r["title"], r["timestamp"], r.get("software", "AMLL Player")) for r in records]
+        if not rows:
+            return
+        with self._lock:
+            # 插入失败时抛出，由调用方报告或重试；提交失败只报告，未提交的行随下一次提交写入
+            self._restore_locked()
+            self._conn.executemany(_INSERT, rows)
+            self._uncommitted.extend(rows)
+            if len(self._uncommitted) >= self.commit_every:
+                self._commit_locked()
+            else:
+                self._schedule_locked()
+
+    def _schedule_locked(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.commit_interval, self.commit)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _restore_locked(self):
+        """上一次提交失败时 SQLite 可能已回滚整个事务（磁盘已满、I/O 错误），把未提交的行重新插入"""
+        if self._uncommitted and not self._conn.in_transaction:
+            self._conn.executemany(_INSERT, self._uncommitted)
+
+    def commit(self):
+        with self._lock:
+            self._commit_locked()
+
+    def _commit_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._uncommitted:
+            try:
+                self._restore_locked()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.echo(f"提交播放记录失败，稍后重试: {e}")
+                self._schedule_locked()
+                return
+            self._uncommitted = []
+
+    def sync(self):
+        """立即提交未提交的批次"""
+        self.commit()
+
+    def close(self):
+        with self._lock:
+            self._commit_locked()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._uncommitted:
+                self.echo(f"❌ 关闭时仍有 {len(self._uncommitted)} 条播放记录未能提交")
+            self._conn.close()
+
+    # -------------- 历史 / 次数 --------------
+    def recent(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT artist, title, ts, software FROM plays ORDER BY ts DESC, id DESC LIMIT ?",
+                (limit,)).fetchall()
+        return [
+            {"artist": a, "title": t, "timestamp": ts, "software": sw, "key": f"{a}|{t}"}
+            for a, t, ts, sw in reversed(rows)
+        ]
+
+    def __iter__(self):
+        """按写入顺序遍历全部播放记录，分页读取，不整体加载"""
+        last_id = 0
+        while True:
+            rows = self._query(
+                "SELECT id, artist, title, ts, software FROM plays WHERE id > ? ORDER BY id LIMIT 5000",
+                (last_id,))
+            if not rows:
+                return
+            for _, a, t, ts, sw in rows:
+                yield {"artist": a, "title": t, "timestamp": ts, "software": sw}
+            last_id = rows[-1][0]
+
+    def load_counts(self) -> Counter:
+        rows = self._query("SELECT artist, title, n FROM song_counts WHERE n > 0")
+        return Counter({f"{a}|{t}": n for a, t, n in rows})
+
+    def play_count(self, artist: str, title: str) -> int:
+        row = self._query("SELECT n FROM song_counts WHERE artist = ? AND title = ?", (artist, title))
+        return row[0][0] if row else 0
+
+    # -------------- 统计查询 --------------
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def top_artists(self, n: int = 10) -> List[Tuple[str, int]]:
+        return self._query(
+            "SELECT artist, SUM(n) AS c FROM song_counts GROUP BY artist "
+            "HAVING c > 0 ORDER BY c DESC, artist LIMIT ?", (n,))
+
+    def top_songs(self, n: int = 10) -> List[Tuple[str, int]]:
+        rows = self._query(
+            "SELECT artist, title, n FROM song_counts WHERE n > 0 "
+            "ORDER BY n DESC, artist, title LIMIT ?", (n,))
+        return [(f"{a} - {t}", c) for a, t, c in rows]
+
+    def daily_counts(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, int]]:
+        """按天计数；start / end 为 'YYYY-MM-DD'（含端点），走 day_hour_counts 主键做范围扫描"""
+        return self._query(
+            "SELECT day, SUM(n) AS c FROM day_hour_counts WHERE day >= ? AND day <= ? "
+            "GROUP BY day HAVING c > 0 ORDER BY day", (start or "", end or "9999-12-31"))
+
+    def hourly_counts(self, start: Optional[str] = None, end: Optional[str] = None) -> List[int]:
+        """24 小时分布，返回长度为 24 的列表"""
+        hours = [0] * 24
+        for hour, count in self._query(
+                "SELECT hour, SUM(n) FROM day_hour_counts WHERE day >= ? AND day <= ? GROUP BY hour",
+                (start or "", end or "9999-12-31")):
+            hours[hour] = count
+        return hours
+
+    def plays_between(self, start_ts: str, end_ts: str) -> List[Dict]:
+        """按 ts 索引取时间段内的原始播放记录"""
+        rows = self._query(
+            "SELECT artist, title, ts, software FROM plays WHERE ts >= ? AND ts < ? ORDER BY ts",
+            (start_ts, end_ts))
+        return [{"artist": a, "title": t, "timestamp": ts, "software": sw} for a, t, ts, sw in rows]
+
+    def total_plays(self) -> int:
+        return self._query("SELECT COALESCE(SUM(n), 0) FROM song_counts")[0][0]
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from event_bus import EventBus
+from live_stats import LiveStats
+
+# 单个请求头部的上限，超过直接断开
+_MAX_HEADER_BYTES = 16 * 1024
+# SSE 心跳间隔（秒），防止代理或浏览器因空闲断开
+_SSE_HEARTBEAT = 15.0
+# 每个 SSE 客户端最多积压的事件数，超出丢弃最旧的
+_SSE_BACKLOG = 256
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed"}
+
+
+class StatsServer:
+    """
+    实时统计 HTTP 接口（仅用标准库 asyncio）
+    - 在独立线程里运行自己的事件循环，不影响日志监控线程
+    - GET /api/<视图>：current / recent / top / series / summary，返回 JSON
+    - 支持 If-None-Match → 304 与 keep-alive，每秒轮询的仪表盘只产生内存读取
+    - GET /events：Server-Sent Events，订阅事件总线，曲目变化时推送；慢客户端只丢自己的积压
+    - GET /metrics：开启运行指标时以 Prometheus 文本格式导出
+    """
+
+    def __init__(self, live_stats: LiveStats, host: str = "127.0.0.1", port: int = 8765,
+                 event_bus: Optional[EventBus] = None, metrics=None, echo: Callable[[str], None] = print,
+                 allow_origin: Optional[str] = None, start_timeout: float = 5.0):
+        self.live_stats = live_stats
+        # 跨域访问默认关闭；给出来源（例如 "http://localhost:3000" 或 "*"）时才带 Access-Control-Allow-Origin
+        self.allow_origin = allow_origin
+        self.start_timeout = start_timeout
+        self.echo = echo
+        self.event_bus = event_bus
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    # -------------- 启停 --------------
+    def start(self) -> bool:
+        self._thread = threading.Thread(target=self._run, name="stats-server", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(self.start_timeout):
+            self.echo(f"⚠️ 统计接口启动超时（{self.start_timeout:g} 秒）")
+            return False
+        if self._error is not None:
+            self.echo(f"⚠️ 统计接口启动失败: {self._error}")
+            return False
+        self.echo(f"📡 统计接口: http://{self.host}:{self.port}/api/summary")
+        return True
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]  # port=0 时取实际端口
+        except Exception as e:
+            # 地址被占用、端口越界（OverflowError）等：报告给 start()，不让它一直等下去
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    def stop(self, timeout: float = 2.0):
+        if self._loop is None or self._thread is None or not self._thread.is_alive():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+    # -------------- HTTP --------------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                if len(head) > _MAX_HEADER_BYTES:
+                    break
+                keep_alive = self._respond(head, writer)
+                await writer.drain()
+                if keep_alive == "events":
+                    await self._stream_events(writer)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # 客户端断开，或关闭服务时取消仍在推送的 SSE 连接
+        finally:
+            writer.close()
+
+    def _respond(self, head: bytes, writer: asyncio.StreamWriter):
+        """处理一个请求，返回是否保持连接；SSE 请求返回 "events"，由调用方接管连接"""
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3:
+            self._write(writer, 400, close=True)
+            return False
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+        if method not in ("GET", "HEAD"):
+            # 不读取请求体，直接断开，避免同一连接上的后续请求错位
+            self._write(writer, 405, close=True, extra={"Allow": "GET, HEAD"})
+            return False
+
+        path = urlsplit(target).path.rstrip("/")
+        if path == "/events" and method == "GET" and self.event_bus is not None:
+            return "events"
+        if path == "/metrics" and self.metrics is not None:
+            body = self.metrics.render_prometheus().encode("utf-8")
+            self._write(writer, 200, body if method == "GET" else b"", close=not keep_alive,
+                        extra={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+                        length=len(body))
+            return keep_alive
+        rendered = None
+        if path.startswith("/api/"):
+            rendered = self.live_stats.render(path[len("/api/"):])
+        if rendered is None:
+            self._write(writer, 404, close=not keep_alive)
+            return keep_alive
+
+        etag, body = rendered
+        if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            self._write(writer, 304, close=not keep_alive, extra={"ETag": etag})
+        else:
+            self._write(writer, 200, body if method == "GET" else b"", close=not keep_alive,
+                        extra={"ETag": etag, "Content-Type": "application/json; charset=utf-8"},
+                        length=len(body))
+        return keep_alive
+
+    def _write(self, writer: asyncio.StreamWriter, status: int, body: bytes = b"", close: bool = False,
+               extra: Optional[dict] = None, length: Optional[int] = None):
+        headers = {
+            "Cache-Control": "no-cache",
+            "Connection": "close" if close else "keep-alive",
+        }
+        if self.allow_origin:
+            headers["Access-Control-Allow-Origin"] = self.allow_origin
+        if status != 304:
+            headers["Content-Length"] = str(len(body) if length is None else length)
+        headers.update(extra or {})
+        head = f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+
+    # -------------- Server-Sent Events --------------
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def on_ready():
+            # 在发布方线程里调用：只投递一个唤醒，事件循环已关闭时忽略
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+        peer = writer.get_extra_info("peername")
+        sub = self.event_bus.subscribe(f"sse {peer}", maxsize=_SSE_BACKLOG, policy="drop",
+                                       on_ready=on_ready)
+        try:
+            cors = f"Access-Control-Allow-Origin: {self.allow_origin}\r\n" if self.allow_origin else ""
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         + cors.encode("latin-1")
+                         + b"Connection: keep-alive\r\n\r\n")
+            current = self.live_stats.current
+            if current is not None:
+                writer.write(self._sse("track", current))
+            await writer.drain()
+            while not sub.closed:
+                try:
+                    await asyncio.wait_for(wake.wait(), _SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                wake.clear()
+                for event in sub.drain():
+                    writer.write(self._sse(event.topic, event.data, event.seq))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            sub.close()
+
+    @staticmethod
+    def _sse(topic: str, data, seq: Optional[int] = None) -> bytes:
+        lines = [f"event: {topic}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+        if seq is not None:
+            lines.insert(0, f"id: {seq}")
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
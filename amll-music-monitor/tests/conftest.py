@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+# 模块都平铺在 amll-music-monitor/ 下，按脚本方式导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_generator import SESSION_ENTER, session_leave_body, stamp, track_body  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def amll_line(body: str, at: datetime = None) -> str:
+    """一行 AMLL 日志（含行尾换行）"""
+    return f"{stamp(at or datetime.now(timezone.utc))}  {body}\n"
+
+
+def track_line(artist: str, title: str, at: datetime = None) -> str:
+    return amll_line(track_body(artist, title), at)
+
+
+def enter_line(at: datetime = None) -> str:
+    return amll_line(SESSION_ENTER, at)
+
+
+def leave_line(target: str = "Spotify.exe", at: datetime = None) -> str:
+    return amll_line(session_leave_body(target), at)
+
+
+def append(path: str, *lines: str):
+    with open(path, "a", encoding="utf-8", newline="\n") as f:
+        f.writelines(lines)
+
+
+def wait_until(predicate, timeout: float = 5.0, interval: float = 0.02) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
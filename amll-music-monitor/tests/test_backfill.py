@@ -0,0 +1,31 @@
+import json
+import os
+
+import pytest
+
+from backfill import backfill
+from conftest import FIXTURES
+from music_tracker import MusicTracker
+from test_music_tracker import replay
+
+
+@pytest.mark.parametrize("fixture, gate", [
+    ("bounce.log", {"dedup_window": 180}),
+    ("min_dwell_drop.log", {"min_dwell": 10}),
+    ("window_expiry.log", {"dedup_window": 180}),
+])
+def test_backfill_counts_like_live_monitoring(tmp_path, fixture, gate):
+    (tmp_path / "live").mkdir()
+    (tmp_path / "backfill").mkdir()
+    live, _ = replay(fixture, tmp_path / "live", **gate)
+
+    count_file = tmp_path / "backfill" / "play_count.json"
+    tracker = MusicTracker(history_file=str(tmp_path / "backfill" / "history.json"),
+                           log_file=str(tmp_path / "backfill" / "playback.log"),
+                           count_file=str(count_file), echo=lambda text: None, **gate)
+    stats = backfill(tracker, [os.path.join(FIXTURES, fixture)], window=5.0)
+    tracker.close()
+
+    with open(count_file, encoding="utf-8") as f:
+        assert json.load(f) == live
+    assert stats.imported == sum(live.values())
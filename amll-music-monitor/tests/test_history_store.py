@@ -0,0 +1,103 @@
+import json
+import sqlite3
+
+import pytest
+
+from history_store import JsonlHistoryStore
+
+
+def _record(i: int) -> dict:
+    return {"artist": "X", "title": f"歌曲{i}", "key": f"X|歌曲{i}"}
+
+
+def test_compact_drops_damaged_lines_and_keeps_appending(tmp_path):
+    path = tmp_path / "history.jsonl"
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps(_record(0)) + "\n{损坏的行\n" + json.dumps(_record(1)) + "\n")
+
+    messages = []
+    store = JsonlHistoryStore(str(path), echo=messages.append)
+    store.compact()
+    store.append(_record(2))
+    store.close()
+
+    reopened = JsonlHistoryStore(str(path))
+    assert [r["title"] for r in reopened] == ["歌曲0", "歌曲1", "歌曲2"]
+    reopened.close()
+    assert any("丢弃 1 条" in m for m in messages)
+    assert not (tmp_path / "history.jsonl.tmp").exists()
+
+
+def test_damage_found_by_reader_is_compacted_on_next_write(tmp_path):
+    path = tmp_path / "history.jsonl"
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps(_record(0)) + "\n{损坏的行\n")
+
+    messages = []
+    store = JsonlHistoryStore(str(path), echo=messages.append)
+    assert [r["title"] for r in store.recent(10)] == ["歌曲0"]
+    store.append(_record(1))
+    store.close()
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["歌曲0", "歌曲1"]
+    assert any("丢弃 1 条" in m for m in messages)
+
+
+def test_failed_write_is_rolled_back_before_retry(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = JsonlHistoryStore(str(path), echo=lambda text: None)
+    store.append(_record(0))
+
+    # 只写出一部分就失败（例如磁盘写满）
+    write = store._file.write
+
+    def partial_write(data):
+        write(data[:len(data) // 2])
+        store._file.flush()
+        raise OSError("磁盘已满")
+
+    store._file.write = partial_write
+    batch = [_record(1), _record(2)]
+    with pytest.raises(OSError):
+        store.extend(batch)
+    store.extend(batch)
+    store.close()
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["歌曲0", "歌曲1", "歌曲2"]
+
+
+class RollbackOnCommit:
+    """第一次 commit 时回滚整个事务并报错的连接（模拟磁盘已满）"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.failed = False
+
+    def commit(self):
+        if not self.failed:
+            self.failed = True
+            self._conn.rollback()
+            raise sqlite3.OperationalError("database or disk is full")
+        self._conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_sqlite_rows_survive_rolled_back_commit(tmp_path):
+    from sqlite_store import SqlitePlayStore
+
+    messages = []
+    store = SqlitePlayStore(str(tmp_path / "plays.db"), commit_every=2, echo=messages.append)
+    store._conn = RollbackOnCommit(store._conn)
+    records = [dict(_record(i), timestamp=f"2025-01-01T12:00:0{i}") for i in range(3)]
+    store.extend(records[:2])
+    assert any("提交播放记录失败" in m for m in messages)
+    store.extend(records[2:])
+    store.close()
+
+    reopened = SqlitePlayStore(str(tmp_path / "plays.db"))
+    assert sorted(r["title"] for r in reopened) == ["歌曲0", "歌曲1", "歌曲2"]
+    reopened.close()
@@ -0,0 +1,207 @@
+import os
+import time
+
+import pytest
+
+from conftest import append, enter_line, track_line, wait_until
+from log_monitor import AMLLLogMonitor
+from log_source import _load_observer
+
+BACKENDS = [
+    pytest.param("watchdog", marks=pytest.mark.skipif(_load_observer() is None, reason="未安装 watchdog")),
+    "polling",
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def monitor(request, tmp_path):
+    """从空日志末尾开始监控的 AMLLLogMonitor，两种后端跑同一组用例"""
+    path = str(tmp_path / "amll.log")
+    open(path, "w").close()
+    messages = []
+    monitor = AMLLLogMonitor(path, backend=request.param, poll_interval=0.05,
+                             fallback_interval=0.5, echo=messages.append)
+    monitor.tracks = []
+    monitor.messages = messages
+    assert monitor.start_monitoring(lambda artist, title: monitor.tracks.append((artist, title)))
+    assert monitor.active_backend == request.param
+    yield monitor
+    monitor.stop_monitoring()
+
+
+def test_append(monitor):
+    append(monitor.log_path, enter_line(), track_line("犬儒乐队", "皮囊"))
+    assert wait_until(lambda: monitor.tracks == [("犬儒乐队", "皮囊")])
+
+    append(monitor.log_path, track_line("Beyond", "长城"))
+    assert wait_until(lambda: len(monitor.tracks) == 2)
+    assert monitor.tracks[1] == ("Beyond", "长城")
+
+
+def test_partial_line_waits_for_newline(monitor):
+    line = enter_line() + track_line("犬儒乐队", "皮囊")
+    append(monitor.log_path, line[:-10])
+    assert not wait_until(lambda: monitor.tracks, timeout=0.5)
+    append(monitor.log_path, line[-10:])
+    assert wait_until(lambda: monitor.tracks == [("犬儒乐队", "皮囊")])
+
+
+def test_rotation_by_inode(monitor):
+    path = monitor.log_path
+    append(path, enter_line(), track_line("A", "旧文件"))
+    assert wait_until(lambda: len(monitor.tracks) == 1)
+
+    # 旧文件最后半行在轮转时补齐交付，随后切到新文件从头读
+    append(path, track_line("A", "轮转前")[:-1])
+    os.replace(path, path + ".1")
+    append(path, enter_line(), track_line("B", "新文件"))
+    assert wait_until(lambda: len(monitor.tracks) == 3)
+    assert monitor.tracks[1:] == [("A", "轮转前"), ("B", "新文件")]
+    assert any("轮转" in m for m in monitor.messages)
+
+
+def test_truncation_restarts_from_zero(monitor):
+    path = monitor.log_path
+    append(path, enter_line(), *(track_line("A", f"截断前 {i}") for i in range(5)))
+    assert wait_until(lambda: len(monitor.tracks) == 5)
+
+    # 原地截断后写入的内容比之前短：从文件开头重新读
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(enter_line() + track_line("B", "截断后"))
+    assert wait_until(lambda: len(monitor.tracks) == 6)
+    assert monitor.tracks[-1] == ("B", "截断后")
+    assert any("重置" in m for m in monitor.messages)
+
+
+def test_catch_up_error_does_not_kill_monitor(tmp_path):
+    from checkpoint import LogCheckpoint
+
+    path = str(tmp_path / "amll.log")
+    append(path, enter_line())
+    checkpoint = LogCheckpoint(str(tmp_path / "checkpoint.json"), flush_interval=0)
+    first = AMLLLogMonitor(path, backend="polling", checkpoint=checkpoint, echo=lambda text: None)
+    assert first.start_monitoring(lambda artist, title: None)
+    first.stop_monitoring()
+
+    # 停机期间写入的积压，补录回调第一次抛异常
+    append(path, track_line("A", "积压"))
+    calls, messages = [], []
+
+    def on_backlog(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("写入失败")
+
+    monitor = AMLLLogMonitor(path, backend="polling", poll_interval=0.05, checkpoint=checkpoint,
+                             echo=messages.append)
+    monitor.tracks = []
+    monitor.start_monitoring(lambda artist, title: monitor.tracks.append((artist, title)), on_backlog)
+    try:
+        assert wait_until(lambda: any("监控错误 (1/5)" in m for m in messages), timeout=3)
+        # 下一轮重试补录成功后转入实时监控
+        assert wait_until(lambda: not monitor.source.resume_pending, timeout=5)
+        append(path, track_line("B", "实时"))
+        assert wait_until(lambda: monitor.tracks == [("B", "实时")], timeout=5), (monitor.tracks, messages, calls)
+        assert monitor.monitor_thread.is_alive() and monitor.is_monitoring
+    finally:
+        monitor.stop_monitoring()
+
+
+def _resume_with_backlog(tmp_path, tracks: int):
+    """写出断点后追加 tracks 首积压，返回 (日志路径, 断点)"""
+    from checkpoint import LogCheckpoint
+
+    path = str(tmp_path / "amll.log")
+    append(path, enter_line())
+    checkpoint = LogCheckpoint(str(tmp_path / "checkpoint.json"), flush_interval=0)
+    first = AMLLLogMonitor(path, backend="polling", checkpoint=checkpoint, echo=lambda text: None)
+    assert first.start_monitoring(lambda artist, title: None)
+    first.stop_monitoring()
+    append(path, *(track_line("A", f"积压 {i}") for i in range(tracks)))
+    return path, checkpoint
+
+
+def test_stop_interrupts_catch_up_and_resumes(tmp_path):
+    import threading
+
+    path, checkpoint = _resume_with_backlog(tmp_path, 20_000)
+    delivered, first_batch = [], threading.Event()
+
+    def slow_backlog(batch):
+        delivered.extend(batch)
+        first_batch.set()
+        time.sleep(0.01)
+
+    monitor = AMLLLogMonitor(path, backend="polling", chunk_size=4096, checkpoint=checkpoint,
+                             backlog_batch_size=50, echo=lambda text: None)
+    monitor.start_monitoring(lambda artist, title: None, slow_backlog)
+    assert first_batch.wait(5)
+    drained = []
+    assert monitor.stop_monitoring(drain=lambda: drained.append(len(delivered)), timeout=2)
+    assert drained and 0 < len(delivered) < 20_000
+
+    # 断点停在已交付的积压之后，再次启动补录剩余部分，不重不漏
+    monitor = AMLLLogMonitor(path, backend="polling", checkpoint=checkpoint, echo=lambda text: None)
+    monitor.start_monitoring(lambda artist, title: None, delivered.extend)
+    try:
+        assert wait_until(lambda: len(delivered) >= 20_000, timeout=10)
+        assert [title for _, title, _ in delivered] == [f"积压 {i}" for i in range(20_000)]
+    finally:
+        monitor.stop_monitoring()
+
+
+def test_stop_skips_checkpoint_while_thread_is_stuck(tmp_path):
+    import threading
+
+    path, checkpoint = _resume_with_backlog(tmp_path, 1)
+    offset = checkpoint.resolve_offset(path)[0]
+    entered, release = threading.Event(), threading.Event()
+
+    def stuck_backlog(batch):
+        entered.set()
+        release.wait(5)
+
+    messages, drained = [], []
+    monitor = AMLLLogMonitor(path, backend="polling", checkpoint=checkpoint, echo=messages.append)
+    monitor.start_monitoring(lambda artist, title: None, stuck_backlog)
+    try:
+        assert entered.wait(5)
+        assert not monitor.stop_monitoring(drain=lambda: drained.append(True), timeout=0.2)
+        assert not drained and any("跳过最终断点" in m for m in messages)
+        assert checkpoint.resolve_offset(path)[0] == offset
+    finally:
+        release.set()
+        monitor.monitor_thread.join(5)
+
+
+def test_callback_error_mid_chunk_retries_from_failed_line(tmp_path):
+    from checkpoint import LogCheckpoint
+    from log_source import LogSource
+
+    path = str(tmp_path / "amll.log")
+    open(path, "w").close()
+    checkpoint = LogCheckpoint(str(tmp_path / "checkpoint.json"), flush_interval=0)
+    source = LogSource(path, checkpoint=checkpoint, echo=lambda text: None, verbose=False)
+    tracks, failures = [], []
+
+    def on_track(artist, title):
+        if title == "T2" and not failures:
+            failures.append(title)
+            raise RuntimeError("回调失败")
+        tracks.append((artist, title))
+
+    source.on_track = on_track
+    assert source.open()
+    # 五行在同一个块里读出，回调在第二行抛出
+    append(path, enter_line(), *(track_line("A", f"T{i}") for i in range(1, 6)))
+    source.poll()
+    assert source.errors == 1 and tracks == [("A", "T1")]
+    source.save_checkpoint()
+    assert checkpoint.resolve_offset(path)[0] == source.offset < os.path.getsize(path)
+
+    # 下一轮从出错的那一行重读，块里剩下的行不丢，offset 与文件位置一致
+    source.poll()
+    assert [title for _, title in tracks] == ["T1", "T2", "T3", "T4", "T5"]
+    assert source.offset == os.path.getsize(path)
+    source.close()
+    assert checkpoint.resolve_offset(path)[0] == os.path.getsize(path)
@@ -0,0 +1,22 @@
+import os
+
+from lyrics_index import LyricsIndex
+
+
+def test_refresh_picks_up_rewritten_file_in_unchanged_dir(tmp_path):
+    lrc = tmp_path / "song.lrc"
+    lrc.write_text("[ar:X]\n[ti:旧名]\n[00:01.00]第一行\n", encoding="utf-8")
+    index = LyricsIndex(str(tmp_path))
+    index.refresh()
+    assert index.find("X", "旧名") == str(lrc)
+
+    # 原地改写文件：目录 mtime 不变，文件 mtime 变化
+    dir_mtime = os.stat(tmp_path).st_mtime_ns
+    lrc.write_text("[ar:X]\n[ti:新名]\n[00:01.00]第一行\n", encoding="utf-8")
+    stat = os.stat(lrc)
+    os.utime(lrc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    os.utime(tmp_path, ns=(dir_mtime, dir_mtime))
+
+    assert index.refresh()
+    assert index.find("X", "新名") == str(lrc)
+    assert index.find("X", "旧名") is None
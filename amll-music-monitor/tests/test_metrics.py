@@ -0,0 +1,24 @@
+import threading
+
+from metrics import LATENCY_BUCKETS, MonitorMetrics, SharedHistogram
+
+
+def test_write_histograms_survive_concurrent_writers():
+    metrics = MonitorMetrics()
+    histogram = metrics.write["history"]
+    assert isinstance(histogram, SharedHistogram)
+
+    def observe():
+        for i in range(20_000):
+            histogram.observe(LATENCY_BUCKETS[i % len(LATENCY_BUCKETS)])
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    buckets, count, _ = histogram.read()
+    assert count == sum(buckets) == 80_000
+    assert metrics.snapshot()['amll_write_seconds{file="history"}']["count"] == 80_000
+    assert 'amll_write_seconds_count{file="history"} 80000' in metrics.render_prometheus()
@@ -0,0 +1,65 @@
+from conftest import append, enter_line, leave_line, track_line, wait_until
+from multi_monitor import MultiLogMonitor
+
+
+def test_tracks_routed_by_source(tmp_path):
+    paths = [str(tmp_path / f"amll{i}.log") for i in range(2)]
+    for path in paths:
+        open(path, "w").close()
+    monitor = MultiLogMonitor(backend="polling", poll_interval=0.05, echo=lambda text: None)
+    names = [monitor.add_source(path, f"src{i}") for i, path in enumerate(paths)]
+    tracks, sessions = [], []
+    assert monitor.start_monitoring(lambda *args: tracks.append(args),
+                                    session_callback=lambda name, kind, at: sessions.append((name, kind)))
+    try:
+        append(paths[0], enter_line(), track_line("A", "一"))
+        append(paths[1], enter_line(), track_line("B", "二"), leave_line())
+        assert wait_until(lambda: len(tracks) == 2 and len(sessions) == 3)
+        assert sorted(tracks) == [("src0", "A", "一"), ("src1", "B", "二")]
+        assert monitor.session_of(names[0]) == "amll" and monitor.session_of(names[1]) is None
+    finally:
+        monitor.stop_monitoring()
+
+
+def test_missing_source_is_skipped_and_backlog_keeps_name(tmp_path):
+    from checkpoint import LogCheckpoint
+
+    path = str(tmp_path / "amll.log")
+    append(path, enter_line())
+    checkpoint = LogCheckpoint(str(tmp_path / "checkpoint.json"), flush_interval=0)
+    first = MultiLogMonitor(backend="polling", echo=lambda text: None)
+    first.add_source(path, "live", checkpoint)
+    assert first.start_monitoring(lambda *args: None)
+    first.stop_monitoring()
+
+    append(path, track_line("A", "积压"))
+    messages, batches = [], []
+    monitor = MultiLogMonitor(backend="polling", poll_interval=0.05, echo=messages.append)
+    monitor.add_source(path, "live", checkpoint)
+    monitor.add_source(str(tmp_path / "missing.log"), "gone")
+    assert monitor.start_monitoring(lambda *args: None, lambda name, batch: batches.append((name, batch)))
+    try:
+        assert wait_until(lambda: batches)
+        assert [(name, [t[:2] for t in batch]) for name, batch in batches] == [("live", [("A", "积压")])]
+        assert any("[gone]" in m and "跳过" in m for m in messages)
+    finally:
+        monitor.stop_monitoring()
+
+
+def test_source_trackers_share_one_writer_thread(tmp_path):
+    import threading
+
+    from multi_monitor import SourceTrackers
+
+    before = set(threading.enumerate())
+    trackers = SourceTrackers(str(tmp_path / "sources"), write_behind=True, flush_interval=60,
+                              fsync_policy="never", echo=lambda text: None)
+    for i in range(3):
+        trackers.on_track(f"src{i}", "A", f"歌曲{i}")
+    writers = [t for t in threading.enumerate() if t not in before and t.name == "write-behind"]
+    assert len(writers) == 1
+    trackers.close()
+
+    for i in range(3):
+        log = (tmp_path / "sources" / f"src{i}" / "music_playback.log").read_text(encoding="utf-8")
+        assert log.endswith(f"A - 歌曲{i} (第 1 次)\n")
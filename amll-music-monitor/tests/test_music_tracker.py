@@ -0,0 +1,98 @@
+import json
+import os
+import re
+
+import pytest
+
+from conftest import FIXTURES
+from log_parser import SessionEnter, SessionLeave, classify_line, parse_line_time
+from music_tracker import MusicTracker
+
+
+def replay(name: str, tmp_path, **gate):
+    """按日志行时间把录制的 AMLL 日志喂给 MusicTracker（与补录相同的路径），返回 (播放次数, 播放日志)"""
+    tracker = MusicTracker(history_file=str(tmp_path / "history.json"),
+                           log_file=str(tmp_path / "playback.log"),
+                           count_file=str(tmp_path / "play_count.json"),
+                           echo=lambda text: None, **gate)
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        with tracker.batch():
+            for line in f:
+                event = classify_line(line)
+                if isinstance(event, SessionEnter):
+                    tracker.session_event("enter", parse_line_time(line))
+                elif isinstance(event, SessionLeave):
+                    tracker.session_event("leave", parse_line_time(line))
+                elif event is not None:
+                    tracker.update_track(event.artist, event.title, parse_line_time(line))
+    # 关闭时确认最后一首挂起的播放（录制时间早已过去，听满了最短时长）
+    tracker.close()
+
+    with open(tmp_path / "play_count.json", encoding="utf-8") as f:
+        counts = json.load(f)
+    with open(tmp_path / "playback.log", encoding="utf-8") as f:
+        entries = [re.sub(r"^\[[^]]+\] ", "", line.rstrip("\n")) for line in f]
+    return counts, entries
+
+
+def test_bounce_counted_once_within_window(tmp_path):
+    counts, entries = replay("bounce.log", tmp_path, dedup_window=180)
+    assert counts == {"犬儒乐队|皮囊": 1, "Beyond|长城": 1, "陈绮贞|旅行的意义": 1}
+    assert entries == ["犬儒乐队 - 皮囊 (第 1 次)", "Beyond - 长城 (第 1 次)", "陈绮贞 - 旅行的意义 (第 1 次)"]
+
+
+def test_bounce_without_gate_counts_every_switch(tmp_path):
+    counts, _ = replay("bounce.log", tmp_path)
+    assert counts == {"犬儒乐队|皮囊": 2, "Beyond|长城": 2, "陈绮贞|旅行的意义": 1}
+
+
+@pytest.mark.parametrize("window, expected", [
+    (0, {"X|A": 2, "X|B": 1}),
+    (180, {"X|A": 1, "X|B": 1}),
+])
+def test_a_b_a(tmp_path, window, expected):
+    counts, entries = replay("aba.log", tmp_path, dedup_window=window)
+    assert counts == expected
+    assert entries[-1] == ("X - A (第 2 次)" if window == 0 else "X - B (第 1 次)")
+
+
+def test_min_dwell_drop_does_not_block_replay(tmp_path):
+    # B 只听了 5 秒被丢弃；之后重播的 A 听满 300 秒，应当再计一次
+    counts, entries = replay("min_dwell_drop.log", tmp_path, min_dwell=10)
+    assert counts == {"X|A": 2, "X|C": 1}
+    assert entries == ["X - A (第 1 次)", "X - A (第 2 次)", "X - C (第 1 次)"]
+
+
+def test_min_dwell_with_window(tmp_path):
+    # 重播的 A 距上一次计数 3605 秒，远超窗口，照常计数
+    counts, _ = replay("min_dwell_drop.log", tmp_path, min_dwell=10, dedup_window=180)
+    assert counts == {"X|A": 2, "X|C": 1}
+
+
+def test_window_expiry(tmp_path):
+    # A 在 200 秒重播（窗口 180 秒已过）计数；B 在 230 秒重播距上次 170 秒，仍在窗口内
+    counts, entries = replay("window_expiry.log", tmp_path, dedup_window=180)
+    assert counts == {"X|A": 2, "X|B": 1}
+    assert entries == ["X - A (第 1 次)", "X - B (第 1 次)", "X - A (第 2 次)"]
+
+
+def test_live_current_follows_uncounted_switches(tmp_path):
+    from datetime import datetime, timedelta
+
+    tracker = MusicTracker(history_file=str(tmp_path / "history.json"),
+                           log_file=str(tmp_path / "playback.log"),
+                           count_file=str(tmp_path / "play_count.json"),
+                           live_stats=True, dedup_window=180, min_dwell=10, echo=lambda text: None)
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    tracker.update_track("Y", "B", start)
+    tracker.update_track("X", "A", start + timedelta(seconds=60))
+    # B 在窗口内重播：不计数，但当前曲目照样切换
+    assert tracker.update_track("Y", "B", start + timedelta(seconds=120)) == 0
+    assert (tracker.live_stats.current["artist"], tracker.live_stats.current["title"]) == ("Y", "B")
+
+    # 挂起中的 A 听满后确认：计数增加，当前曲目不回退
+    tracker.update_track("X", "A", start + timedelta(seconds=400))
+    assert tracker.live_stats.current["title"] == "A"
+    assert tracker.confirm_pending(start + timedelta(seconds=420)) == 2
+    assert tracker.live_stats.current["title"] == "A"
+    tracker.close()
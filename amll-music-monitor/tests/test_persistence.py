@@ -0,0 +1,72 @@
+from persistence import WriteBehindWriter
+
+
+class FlakyHistory:
+    """前 failures 次 extend 抛异常的历史存储"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.records = []
+
+    def extend(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("磁盘已满")
+        self.records.extend(records)
+
+
+def test_failed_target_is_retried_without_losing_others(tmp_path):
+    log_file = tmp_path / "playback.log"
+    history, counts, messages = FlakyHistory(failures=1), [], []
+    writer = WriteBehindWriter(history, str(log_file), counts.append, flush_interval=60,
+                               fsync_policy="never", echo=messages.append)
+    try:
+        writer.submit_history([{"title": "一"}])
+        writer.submit_log(["一\n"])
+        writer.submit_counts({"X|一": 1})
+        assert writer.flush(5)
+        # 历史写入失败不影响播放日志和计数
+        assert history.records == []
+        assert log_file.read_text(encoding="utf-8") == "一\n"
+        assert counts == [{"X|一": 1}]
+        assert any("历史记录: 磁盘已满" in m for m in messages)
+
+        writer.submit_history([{"title": "二"}])
+        assert writer.flush(5)
+        assert history.records == [{"title": "一"}, {"title": "二"}]
+    finally:
+        writer.close()
+    assert writer.metrics()["items_written"] == 4
+
+
+def test_unwritten_items_are_retried_on_close(tmp_path):
+    history = FlakyHistory(failures=1)
+    writer = WriteBehindWriter(history, str(tmp_path / "playback.log"), lambda counts: None,
+                               flush_interval=60, fsync_policy="never", echo=lambda text: None)
+    writer.submit_history([{"title": "一"}])
+    assert writer.flush(5)
+    writer.close()
+    assert history.records == [{"title": "一"}]
+
+
+def test_listening_intervals_go_through_writer(tmp_path):
+    from datetime import datetime, timedelta
+
+    from listening import RECORD
+    from music_tracker import MusicTracker
+
+    listening_file = tmp_path / "listening.bin"
+    tracker = MusicTracker(history_file=str(tmp_path / "history.json"),
+                           log_file=str(tmp_path / "playback.log"),
+                           count_file=str(tmp_path / "play_count.json"),
+                           write_behind=True, flush_interval=60, fsync_policy="never",
+                           listening_file=str(listening_file), echo=lambda text: None)
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    tracker.update_track("X", "A", start)
+    tracker.update_track("X", "B", start + timedelta(seconds=200))
+    # 区间只入队，监控线程不写文件
+    assert not listening_file.exists()
+    assert tracker._writer.flush(5)
+    assert listening_file.stat().st_size == RECORD.size
+    tracker.close()
+    assert listening_file.stat().st_size == 2 * RECORD.size
@@ -0,0 +1,32 @@
+import time
+import urllib.request
+
+import pytest
+
+from live_stats import LiveStats
+from stats_server import StatsServer
+
+
+@pytest.fixture
+def messages():
+    return []
+
+
+def test_invalid_port_fails_fast(messages):
+    server = StatsServer(LiveStats(), port=70000, echo=messages.append)
+    started = time.monotonic()
+    assert not server.start()
+    assert time.monotonic() - started < 2
+    assert any("启动失败" in m for m in messages)
+
+
+@pytest.mark.parametrize("allow_origin", [None, "http://localhost:3000"])
+def test_cors_header_follows_config(messages, allow_origin):
+    server = StatsServer(LiveStats(), port=0, echo=messages.append, allow_origin=allow_origin)
+    assert server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/api/summary", timeout=5) as resp:
+            assert resp.status == 200
+            assert resp.headers.get("Access-Control-Allow-Origin") == allow_origin
+    finally:
+        server.stop()